@@ -0,0 +1,381 @@
+"""Background threshold alerts for every crop and nutrient.
+
+    python alerts.py [--interval 60] [--horizon 96] [--db alerts.db] [--once]
+
+Each pass checks all series against `config.thresholds` at once, using the
+newest reading and the simulated probability of dropping below the threshold
+within `horizon` steps (see depletion.py). A breach is raised when a value
+drops below its threshold and cleared only once it is back above
+threshold * (1 + HYSTERESIS); a predicted breach is raised at ALERT_PROBABILITY
+and cleared below ALERT_PROBABILITY - PROBABILITY_HYSTERESIS. A level change
+has to hold for RAISE_AFTER (or CLEAR_AFTER) consecutive passes before it is
+committed.
+Committed transitions are appended to the `alert_log` table and the current
+level of every series is kept in `alert_state`, so a restart resumes where
+it left off and other processes (the dashboard) can read it. `since` is the
+time of the reading that caused the last transition, not when it was
+evaluated.
+
+Passes run every `interval` seconds. In the dashboard process they also run
+as soon as the live ingest flushes new readings (`AlertEvaluator.notify`);
+readings appended by other processes are picked up by the next timed pass.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import nutrients, thresholds
+from service import ForecastService
+from tracing import span
+
+# Alert levels
+OK, PREDICTED, BREACHED = 0, 1, 2
+LEVEL_NAMES = {OK: "ok", PREDICTED: "predicted", BREACHED: "breached"}
+
+DB_PATH = os.environ.get("PCS_ALERT_DB", "alerts.db")
+DEFAULT_HORIZON = int(os.environ.get("PCS_ALERT_HORIZON", "96"))
+DEFAULT_INTERVAL = float(os.environ.get("PCS_ALERT_INTERVAL", "30"))
+# Fraction of the threshold a value must recover by before its alert clears
+HYSTERESIS = 0.05
+# Chance of dropping below threshold within the horizon that raises a predicted breach,
+# and how far it must fall back before the alert clears
+ALERT_PROBABILITY = 0.5
+PROBABILITY_HYSTERESIS = 0.1
+# Consecutive passes a new level must hold before it is committed
+RAISE_AFTER = 2
+CLEAR_AFTER = 3
+# Seconds to wait for one crop's forecasts during a pass
+FORECAST_TIMEOUT = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_state (
+    crop TEXT NOT NULL,
+    nutrient TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    pending INTEGER NOT NULL,
+    streak INTEGER NOT NULL,
+    since TEXT NOT NULL,
+    value REAL,
+    forecast_min REAL,
+    threshold REAL NOT NULL,
+    evaluated_at TEXT NOT NULL,
+    breach_probability REAL,
+    horizon INTEGER,
+    PRIMARY KEY (crop, nutrient)
+);
+CREATE TABLE IF NOT EXISTS alert_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    at TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    nutrient TEXT NOT NULL,
+    previous INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    value REAL,
+    forecast_min REAL,
+    threshold REAL NOT NULL,
+    data_time TEXT,
+    breach_probability REAL,
+    horizon INTEGER
+);
+"""
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+
+def step(levels: np.ndarray, pending: np.ndarray, streaks: np.ndarray, known: np.ndarray, values: np.ndarray,
+         risks: np.ndarray, limits: np.ndarray, hysteresis: float = HYSTERESIS,
+         raise_after: int = RAISE_AFTER, clear_after: int = CLEAR_AFTER, probability: float = ALERT_PROBABILITY,
+         probability_hysteresis: float = PROBABILITY_HYSTERESIS) -> np.ndarray:
+    """Advance every series by one pass, in place; returns the indices whose level changed.
+
+    `levels` are the committed levels, `pending`/`streaks` the level each
+    series is moving towards and for how many passes. A series not `known`
+    yet takes its first level without debouncing. Series whose inputs are
+    NaN (no data or no model this pass) keep their state.
+    """
+    margin = limits * hysteresis
+    # A condition that already holds needs the margin to be recovered before it is dropped
+    now_limit = limits + margin * (levels == BREACHED)
+    risk_limit = probability - probability_hysteresis * (levels >= PREDICTED)
+    target = np.where(values < now_limit, BREACHED, np.where(risks >= risk_limit, PREDICTED, OK))
+    missing = np.isnan(values)
+    target = np.where(missing, levels, target)
+
+    moving = target != levels
+    continuing = moving & (target == pending)
+    streaks[:] = np.where(missing, streaks, np.where(continuing, streaks + 1, np.where(moving, 1, 0)))
+    pending[:] = np.where(missing, pending, np.where(moving, target, levels))
+
+    needed = np.where(known, np.where(target > levels, raise_after, clear_after), 1)
+    changed = np.flatnonzero(moving & (streaks >= needed))
+    levels[changed] = target[changed]
+    streaks[changed] = 0
+    known |= ~missing
+    return changed
+
+
+class AlertEvaluator:
+    """Evaluates all series on a schedule, or as soon as `notify` is called"""
+
+    def __init__(self, service: ForecastService = None, db_path: str = DB_PATH, horizon: int = DEFAULT_HORIZON,
+                 interval: float = DEFAULT_INTERVAL, hysteresis: float = HYSTERESIS,
+                 raise_after: int = RAISE_AFTER, clear_after: int = CLEAR_AFTER,
+                 probability: float = ALERT_PROBABILITY):
+        self.service = service or ForecastService()
+        self.db_path = db_path
+        self.horizon = horizon
+        self.interval = interval
+        self.hysteresis = hysteresis
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.probability = probability
+
+        self.series = [(crop, nutrient) for crop in self.service.crops() for nutrient in nutrients]
+        self.limits = np.array([thresholds[crop][nutrient] for crop, nutrient in self.series], dtype=float)
+        n = len(self.series)
+        self.levels = np.zeros(n, dtype=np.int8)
+        self.pending = np.zeros(n, dtype=np.int8)
+        self.streaks = np.zeros(n, dtype=np.int32)
+        self.known = np.zeros(n, dtype=bool)
+        self.since = [None] * n
+        self.errors = {}
+        self.passes = 0
+        self._high_water = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.ready = threading.Event()
+        self._restore()
+
+    def _restore(self):
+        with connect(self.db_path) as conn:
+            rows = conn.execute("SELECT crop, nutrient, level, pending, streak, since FROM alert_state").fetchall()
+        index = {key: i for i, key in enumerate(self.series)}
+        for crop, nutrient, level, pending, streak, since in rows:
+            i = index.get((crop, nutrient))
+            if i is not None:
+                self.levels[i], self.pending[i], self.streaks[i] = level, pending, streak
+                self.known[i] = True
+                self.since[i] = since
+
+    def _inputs(self, crops: list):
+        """Newest values, forecast minima and breach probabilities for every series (NaN where unavailable)"""
+        values = np.full(len(self.series), np.nan)
+        forecast_mins = np.full(len(self.series), np.nan)
+        risks = np.full(len(self.series), np.nan)
+        data_times = {}
+        jobs = {}
+        for crop in crops:
+            try:
+                df = self.service.series.frame(crop)
+                # The simulations share the forecast jobs submitted just before them
+                forecasts = self.service.submit_forecasts(crop, self.horizon, df)
+                depletions = {n: self.service.submit_depletion(crop, n, self.horizon, df) for n in nutrients}
+                jobs[crop] = df, forecasts, depletions
+            except Exception as e:
+                self.errors[crop] = f"{type(e).__name__}: {e}"
+
+        for i, (crop, nutrient) in enumerate(self.series):
+            if crop not in jobs:
+                continue
+            df, forecasts, depletions = jobs[crop]
+            try:
+                result = forecasts[nutrient].result(FORECAST_TIMEOUT)
+                outlook = depletions[nutrient].result(FORECAST_TIMEOUT)
+            except Exception as e:
+                self.errors[(crop, nutrient)] = f"{type(e).__name__}: {e}"
+                continue
+            self.errors.pop((crop, nutrient), None)
+            if result is None:
+                continue
+            values[i] = df[nutrient].iloc[-1]
+            forecast_mins[i] = result.values.min() if result.horizon else np.nan
+            risks[i] = outlook.risk
+            data_times[crop] = df["Timestamp"].iloc[-1]
+        for crop in jobs:
+            self.errors.pop(crop, None)
+        return values, forecast_mins, risks, data_times
+
+    def evaluate(self, force: bool = False) -> list:
+        """One pass over all series; returns the committed transitions as dicts.
+
+        Series with no new readings since they were last evaluated are
+        skipped unless `force`, so debouncing counts readings rather than
+        wall-clock time. A series whose inputs failed, or whose pass could
+        not be stored, is retried on the next pass.
+        """
+        with self._lock, span("alerts.evaluate"):
+            high_waters = {}
+            for crop in self.service.crops():
+                try:
+                    high_water = self.service.series.frame(crop)["Timestamp"].iloc[-1]
+                except Exception as e:
+                    self.errors[crop] = f"{type(e).__name__}: {e}"
+                    continue
+                if force or any(self._high_water.get(key) != high_water for key in self.series if key[0] == crop):
+                    high_waters[crop] = high_water
+            if not high_waters:
+                return []
+
+            crops = list(high_waters)
+            values, forecast_mins, risks, data_times = self._inputs(crops)
+            if not force:
+                # Series of a retried crop that were already evaluated at these readings keep their state
+                for i, key in enumerate(self.series):
+                    if self._high_water.get(key) == high_waters.get(key[0]):
+                        values[i] = forecast_mins[i] = risks[i] = np.nan
+
+            saved = self.levels.copy(), self.pending.copy(), self.streaks.copy(), self.known.copy(), list(self.since)
+            changed = step(self.levels, self.pending, self.streaks, self.known, values, risks, self.limits,
+                           self.hysteresis, self.raise_after, self.clear_after, self.probability)
+            try:
+                transitions = self._persist(crops, changed, saved[0], values, forecast_mins, risks, data_times)
+            except Exception:
+                # Not stored: roll back so the retry doesn't count these readings twice
+                self.levels[:], self.pending[:], self.streaks[:], self.known[:] = saved[:4]
+                self.since = saved[4]
+                raise
+            self.passes += 1
+            for key in self.series:
+                if key[0] in high_waters and key[0] not in self.errors and key not in self.errors:
+                    self._high_water[key] = high_waters[key[0]]
+            return transitions
+
+    def _persist(self, crops, changed, previous, values, forecast_mins, risks, data_times) -> list:
+        now = datetime.now().isoformat(timespec="seconds")
+        data_times = {crop: data_time.isoformat() for crop, data_time in data_times.items()}
+        transitions = []
+        for i in changed:
+            crop, nutrient = self.series[i]
+            data_time = data_times.get(crop)
+            self.since[i] = data_time or now
+            transitions.append({
+                "at": now,
+                "crop": crop,
+                "nutrient": nutrient,
+                "previous": LEVEL_NAMES[int(previous[i])],
+                "level": LEVEL_NAMES[int(self.levels[i])],
+                "value": _optional(values[i]),
+                "forecast_min": _optional(forecast_mins[i]),
+                "breach_probability": _optional(risks[i]),
+                "threshold": float(self.limits[i]),
+                "data_time": data_time,
+                "horizon": self.horizon,
+            })
+
+        evaluated = set(crops)
+        states = []
+        for i, (crop, nutrient) in enumerate(self.series):
+            if crop not in evaluated or np.isnan(values[i]):
+                continue
+            self.since[i] = self.since[i] or data_times[crop]
+            states.append((
+                crop, nutrient, int(self.levels[i]), int(self.pending[i]), int(self.streaks[i]), self.since[i],
+                _optional(values[i]), _optional(forecast_mins[i]), float(self.limits[i]), now, _optional(risks[i]),
+                self.horizon,
+            ))
+        with connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT INTO alert_log (at, crop, nutrient, previous, level, value, forecast_min, threshold, data_time,"
+                " breach_probability, horizon) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(t["at"], t["crop"], t["nutrient"], int(previous[i]), int(self.levels[i]), t["value"],
+                  t["forecast_min"], t["threshold"], t["data_time"], t["breach_probability"], t["horizon"])
+                 for i, t in zip(changed, transitions)],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO alert_state (crop, nutrient, level, pending, streak, since, value, forecast_min,"
+                " threshold, evaluated_at, breach_probability, horizon) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                states,
+            )
+        return transitions
+
+    def notify(self):
+        """Evaluate now instead of at the next interval; hooked to LiveStore.flush_listeners"""
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.evaluate()
+            except Exception as e:
+                self.errors["evaluate"] = f"{type(e).__name__}: {e}"
+            self.ready.set()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> "AlertEvaluator":
+        self._thread = threading.Thread(target=self.run, name="alert-evaluator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def read_alert_state(db_path: str = DB_PATH, crop: str = None) -> pd.DataFrame:
+    """Current alert level of every evaluated series (or one crop's), as written by the evaluator"""
+    query = "SELECT * FROM alert_state"
+    params = ()
+    if crop is not None:
+        query += " WHERE crop = ?"
+        params = (crop,)
+    with connect(db_path) as conn:
+        state = pd.read_sql_query(query, conn, params=params)
+    state["level_name"] = state["level"].map(LEVEL_NAMES)
+    return state
+
+
+def read_alert_log(db_path: str = DB_PATH, limit: int = 100) -> pd.DataFrame:
+    """The most recent committed transitions, newest first"""
+    with connect(db_path) as conn:
+        log = pd.read_sql_query("SELECT * FROM alert_log ORDER BY id DESC LIMIT ?", conn, params=(limit,))
+    for column in ("previous", "level"):
+        log[column] = log[column].map(LEVEL_NAMES)
+    return log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate threshold alerts for every crop and nutrient")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="forecast steps of 15 minutes")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between passes")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args(argv)
+
+    evaluator = AlertEvaluator(db_path=args.db, horizon=args.horizon, interval=args.interval)
+    while True:
+        start = time.perf_counter()
+        transitions = evaluator.evaluate(force=args.once)
+        for t in transitions:
+            print(f"{t['at']} {t['crop']}/{t['nutrient']}: {t['previous']} -> {t['level']} "
+                  f"(value {t['value']}, forecast min {t['forecast_min']}, "
+                  f"breach probability {t['breach_probability']}, threshold {t['threshold']})")
+        for key, error in evaluator.errors.items():
+            print(f"error {key}: {error}", file=sys.stderr)
+        if args.once:
+            return 0
+        time.sleep(max(0.0, args.interval - (time.perf_counter() - start)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""JSON API over the forecast service, for controllers and gateways.
+
+    python api.py [--host 127.0.0.1] [--port 8750]
+
+    GET /health
+    GET /crops
+    GET /crops/<crop>/latest
+    GET /crops/<crop>/window?hours=24          (or ?start=...&end=..., ISO 8601)
+    GET /crops/<crop>/window?plot=a&plot=b&hours=24   (sensor plots of a partitioned crop)
+    GET /crops/<crop>/rollups/<hourly|daily>?start=...&end=...
+    GET /crops/<crop>/forecast/<nutrient>?horizon=96
+    GET /crops/<crop>/depletion/<nutrient>?horizon=96&paths=2000   (breach probabilities, quantile bands)
+    GET /crops/<crop>/breaches?horizon=96
+    GET /crossings?horizon=1344                (time to threshold of every crop and nutrient, most urgent first)
+
+Horizons are in 15-minute steps. Identical requests that arrive while one
+is being computed share its result, and all data and model work runs off
+the event loop in a thread pool. A request that times out leaves the
+forecast running for anyone else waiting on it.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from config import nutrients, thresholds
+from crossing import DEFAULT_HORIZON as CROSSING_HORIZON
+from depletion import DEFAULT_PATHS
+from rollups import RESOLUTIONS
+from service import ForecastService, UnknownSeries, breach
+from workers import MAX_WORKERS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+DEFAULT_HORIZON = 96
+MAX_HORIZON = 672 * 4
+# Seconds a request may wait for a forecast before it fails with 504
+FORECAST_TIMEOUT = 120
+MAX_TARGET = 2048
+MAX_PATHS = 20000
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _float(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _int_param(query: dict, name: str, default: int, low: int, high: int) -> int:
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _time_param(query: dict, name: str):
+    if name not in query:
+        return None
+    try:
+        return pd.Timestamp(query[name][0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an ISO 8601 timestamp")
+
+
+def frame_payload(crop: str, df: pd.DataFrame) -> dict:
+    columns = {"Timestamp": [ts.isoformat() for ts in df["Timestamp"]]}
+    for name in df.columns.drop("Timestamp"):
+        columns[name] = [_float(v) for v in df[name].to_numpy()]
+    return {"crop": crop, "rows": len(df), "columns": columns}
+
+
+def forecast_payload(crop: str, nutrient: str, result) -> dict:
+    threshold = thresholds[crop][nutrient]
+    if result is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No model for {crop}/{nutrient}")
+    return {
+        "crop": crop,
+        "nutrient": nutrient,
+        "horizon": result.horizon,
+        "last_time": result.last_time.isoformat(),
+        "last_value": _float(result.last_value),
+        "timestamps": [ts.isoformat() for ts in result.timestamps],
+        "values": [_float(v) for v in result.values],
+        "lower": [_float(v) for v in result.lower],
+        "upper": [_float(v) for v in result.upper],
+        **breach(result, threshold),
+    }
+
+
+def depletion_payload(crop: str, nutrient: str, outlook) -> dict:
+    if outlook is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No model for {crop}/{nutrient}")
+    return {
+        "crop": crop,
+        "nutrient": nutrient,
+        "threshold": outlook.threshold,
+        "paths": outlook.paths,
+        "risk": outlook.risk,
+        "timestamps": [ts.isoformat() for ts in outlook.timestamps],
+        "probability": [_float(v) for v in outlook.probability],
+        "cumulative": [_float(v) for v in outlook.cumulative],
+        "quantiles": {f"{level:g}": [_float(v) for v in outlook.quantile(level)] for level in outlook.levels},
+    }
+
+
+def crossing_payload(crossing) -> dict:
+    def iso(when):
+        return None if when is None else when.isoformat()
+    return {
+        "crop": crossing.crop,
+        "nutrient": crossing.nutrient,
+        "status": crossing.status,
+        "threshold": crossing.threshold,
+        "last_time": crossing.last_time.isoformat(),
+        "last_value": _float(crossing.last_value),
+        "forecast_min": _float(crossing.forecast_min),
+        "expected": iso(crossing.expected),
+        "earliest": iso(crossing.earliest),
+        "latest": iso(crossing.latest),
+        "hours_to_crossing": crossing.hours_until(crossing.expected),
+    }
+
+
+class ForecastAPI:
+    """Routes requests to a ForecastService, coalescing identical in-flight requests"""
+
+    def __init__(self, service: ForecastService = None, workers: int = MAX_WORKERS):
+        self.service = service or ForecastService()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def handle(self, target: str):
+        """(status, payload) for a GET of `target`; identical concurrent targets are computed once"""
+        future = self._inflight.get(target)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling() or not future.cancelled():
+                    raise
+            # The request computing it was cancelled (client gone): take over
+            return await self.handle(target)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[target] = future
+        try:
+            result = await self._dispatch(target)
+        except asyncio.CancelledError:
+            # Waiters would otherwise hang on a future nobody resolves
+            future.cancel()
+            raise
+        except HTTPError as e:
+            result = e.status, {"error": str(e)}
+        except UnknownSeries as e:
+            result = HTTPStatus.NOT_FOUND, {"error": e.args[0]}
+        except TimeoutError:
+            result = HTTPStatus.GATEWAY_TIMEOUT, {"error": "Forecast timed out"}
+        except Exception as e:
+            result = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            del self._inflight[target]
+        future.set_result(result)
+        return result
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _wait(self, submit, *args):
+        """Result of the future `submit(*args)` returns, or TimeoutError after FORECAST_TIMEOUT.
+
+        Submitting can load data and models, so it runs on the pool too. The
+        job may be shared with other callers through the forecast cache, so
+        a timeout only abandons this request: the shield keeps the job running.
+        """
+        job = await self._run(submit, *args)
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job)), FORECAST_TIMEOUT)
+
+    async def _dispatch(self, target: str):
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+
+        if parts == ["health"]:
+            return HTTPStatus.OK, {"status": "ok"}
+        if parts == ["crops"]:
+            return HTTPStatus.OK, {
+                "crops": self.service.crops(),
+                "nutrients": nutrients,
+                "thresholds": thresholds,
+            }
+        if parts == ["crossings"]:
+            horizon = _int_param(query, "horizon", CROSSING_HORIZON, 1, MAX_HORIZON)
+            found, errors = await self._run(self.service.crossings, horizon, FORECAST_TIMEOUT)
+            return HTTPStatus.OK, {
+                "horizon": horizon,
+                "crossings": [crossing_payload(c) for c in found],
+                "errors": [{"crop": crop, "nutrient": nutrient, "error": str(e)} for (crop, nutrient), e in errors.items()],
+            }
+        if len(parts) < 3 or parts[0] != "crops":
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {url.path}")
+
+        crop, action = parts[1], parts[2]
+        self.service.check(crop)
+        if action == "latest" and len(parts) == 3:
+            latest = await self._run(self.service.latest, crop)
+            reading = {name: value if name == "Timestamp" else _float(value) for name, value in latest.items()}
+            return HTTPStatus.OK, {"crop": crop, "reading": reading}
+        if action == "window" and len(parts) == 3:
+            return HTTPStatus.OK, await self._run(self._window, crop, query)
+        if action == "rollups" and len(parts) == 4:
+            resolution = parts[3]
+            if resolution not in RESOLUTIONS:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown resolution: {resolution}")
+            start, end = _time_param(query, "start"), _time_param(query, "end")
+            df = await self._run(self.service.rollup, crop, resolution, start, end)
+            return HTTPStatus.OK, frame_payload(crop, df.rename(columns={"bucket": "Timestamp"}))
+        if action == "forecast" and len(parts) == 4:
+            nutrient = parts[3]
+            self.service.check(crop, nutrient)
+            horizon = _int_param(query, "horizon", DEFAULT_HORIZON, 1, MAX_HORIZON)
+            result = await self._wait(self.service.submit_forecast, crop, nutrient, horizon)
+            return HTTPStatus.OK, forecast_payload(crop, nutrient, result)
+        if action == "depletion" and len(parts) == 4:
+            nutrient = parts[3]
+            self.service.check(crop, nutrient)
+            horizon = _int_param(query, "horizon", DEFAULT_HORIZON, 1, MAX_HORIZON)
+            paths = _int_param(query, "paths", DEFAULT_PATHS, 100, MAX_PATHS)
+            result = await self._wait(self.service.submit_depletion, crop, nutrient, horizon, None, paths)
+            return HTTPStatus.OK, depletion_payload(crop, nutrient, result)
+        if action == "breaches" and len(parts) == 3:
+            horizon = _int_param(query, "horizon", DEFAULT_HORIZON, 1, MAX_HORIZON)
+            status = await self._run(self.service.breach_status, crop, horizon, FORECAST_TIMEOUT)
+            return HTTPStatus.OK, {"crop": crop, "horizon": horizon, "nutrients": status}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {url.path}")
+
+    def _window(self, crop: str, query: dict) -> dict:
+        if "plot" in query:
+            duration = timedelta(hours=_int_param(query, "hours", 24, 1, 24 * 366)) if "hours" in query else None
+            df = self.service.plot_window(crop, query["plot"], _time_param(query, "start"), _time_param(query, "end"),
+                                          duration)
+            payload = frame_payload(crop, df.drop(columns="Plot", errors="ignore"))
+            if "Plot" in df:
+                payload["columns"]["Plot"] = df["Plot"].tolist()
+            return dict(payload, plots=query["plot"])
+        if "hours" in query:
+            hours = _int_param(query, "hours", 24, 1, 24 * 366)
+            df = self.service.last(crop, timedelta(hours=hours))
+        else:
+            df = self.service.window(crop, _time_param(query, "start"), _time_param(query, "end"))
+        return frame_payload(crop, df)
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 with keep-alive; GET only"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                try:
+                    method, target, version = request_line.split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    return
+                if len(target) > MAX_TARGET or headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+                    # No endpoint takes a body, so don't try to skip one to keep the connection
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Unsupported request"}, False)
+                    return
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+                if method != "GET":
+                    status, payload = HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Only GET is supported"}
+                else:
+                    status, payload = await self.handle(target)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict, keep_alive: bool):
+        body = json.dumps(payload, default=_json_default).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON API for readings, forecasts and threshold breaches")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="threads for data and model work")
+    args = parser.parse_args(argv)
+
+    api = ForecastAPI(workers=args.workers)
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Rolling-origin backtest of the nutrient models over each crop's history.
+
+    python backtest.py [--horizon 12] [--stride 4] [--workers 4] [--out backtest.json]
+    python backtest.py --seasonal-period 24 --dtype float32   # accuracy/speed trade-offs
+
+Each series is filtered once through its whole history with the stored
+parameters (no refitting). At every origin, every `stride` readings, the
+filtered state is projected `horizon` steps ahead with the environment held
+at its value at the origin, the same future exog the dashboard uses. The
+projections of a batch of origins are one matrix product per step.
+
+Reported per series and per step ahead: MAE, RMSE and threshold-breach
+precision/recall, plus the time per forecast of the batched projection and
+of the dashboard's `get_forecast` path. `check_max_abs_diff` compares the
+last origin's batched forecast against `get_forecast`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config import crop_name, nutrients, thresholds
+from features import held_features
+from forecasting import build_exog_matrix, forecast_nutrient, system_matrix, system_vector
+from model_registry import ModelRegistry
+from partitions import load_crop_frame
+
+DEFAULT_HORIZON = 12
+DEFAULT_STRIDE = 4
+# Readings filtered before the first origin, so the state has settled
+DEFAULT_WARMUP = 192
+# Origins projected together; bounds the (origins, horizon, exog) block
+BATCH = 1024
+# get_forecast calls timed per series for the latency comparison
+LATENCY_SAMPLES = 20
+
+# Per worker process, so each process loads its models once
+_registry = None
+
+
+def _worker_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def filtered(model, df: pd.DataFrame, nutrient: str, seasonal_period: int = None):
+    """The stored model's parameters run through all of `df`, optionally with another seasonal period"""
+    exog_names = model.model.exog_names or []
+    endog = df[nutrient].astype(float).reset_index(drop=True)
+    exog = build_exog_matrix(df, exog_names).reset_index(drop=True) if exog_names else None
+    kwargs = {}
+    if seasonal_period is not None and model.model.seasonal_order[3] > 1:
+        kwargs["seasonal_order"] = tuple(model.model.seasonal_order[:3]) + (seasonal_period,)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fresh = model.model.clone(endog, exog=exog, **kwargs)
+        return fresh.filter(model.params.to_numpy(), cov_type="none")
+
+
+def project(results, df: pd.DataFrame, origins: np.ndarray, horizon: int, dtype=np.float64) -> np.ndarray:
+    """Mean forecasts (origins, horizon) from each origin's filtered state"""
+    ssm = results.model.ssm
+    design = system_matrix(ssm, "design").astype(dtype)[0]
+    transition = system_matrix(ssm, "transition").astype(dtype)
+    state_intercept = system_vector(ssm, "state_intercept").astype(dtype)
+    exog_names = results.model.exog_names or []
+    if results.model.k_trend:
+        raise ValueError("Models with a trend term are not supported; use a const exog column")
+
+    out = np.empty((len(origins), horizon), dtype=dtype)
+    predicted = results.predicted_state
+    params = pd.Series(np.asarray(results.params), index=results.model.param_names)
+    beta = params[exog_names].to_numpy(dtype=dtype) if exog_names else None
+    for lo in range(0, len(origins), BATCH):
+        batch = origins[lo:lo + BATCH]
+        # State for reading t + 1 given readings up to t
+        state = predicted[:, batch + 1].T.astype(dtype)
+        intercept = held_features(df, exog_names, batch, horizon).astype(dtype) @ beta if exog_names else 0.0
+        for j in range(horizon):
+            out[lo:lo + len(batch), j] = state @ design
+            state = state @ transition.T + state_intercept
+        out[lo:lo + len(batch)] += intercept
+    return out
+
+
+def scores(predicted: np.ndarray, actual: np.ndarray, threshold: float) -> dict:
+    """Per step ahead: MAE, RMSE and breach precision/recall (None where undefined)"""
+    errors = predicted - actual
+    predicted_breach = predicted < threshold
+    actual_breach = actual < threshold
+    hits = (predicted_breach & actual_breach).sum(axis=0)
+    flagged = predicted_breach.sum(axis=0)
+    breaches = actual_breach.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(flagged > 0, hits / flagged, np.nan)
+        recall = np.where(breaches > 0, hits / breaches, np.nan)
+
+    def listed(values):
+        return [None if np.isnan(v) else round(float(v), 6) for v in values]
+
+    return {
+        "mae": listed(np.abs(errors).mean(axis=0)),
+        "rmse": listed(np.sqrt((errors ** 2).mean(axis=0))),
+        "breach_precision": listed(precision),
+        "breach_recall": listed(recall),
+        "actual_breaches": breaches.tolist(),
+        "predicted_breaches": flagged.tolist(),
+    }
+
+
+def backtest_series(crop: str, nutrient: str, horizon: int, stride: int, warmup: int,
+                    seasonal_period: int = None, dtype: str = "float64") -> dict:
+    """Backtest one series; runs in a worker process"""
+    out = {"crop": crop, "nutrient": nutrient}
+    model = _worker_registry().get(crop, nutrient)
+    if model is None:
+        return dict(out, error="no model")
+    df = load_crop_frame(crop)
+    origins = np.arange(warmup, len(df) - horizon, stride)
+    if not len(origins):
+        return dict(out, error=f"only {len(df)} readings")
+
+    start = time.perf_counter()
+    results = filtered(model, df, nutrient, seasonal_period)
+    filter_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predicted = project(results, df, origins, horizon, np.dtype(dtype))
+    project_seconds = time.perf_counter() - start
+
+    values = df[nutrient].to_numpy(dtype=float)
+    actual = values[origins[:, None] + np.arange(1, horizon + 1)]
+    out.update(scores(predicted.astype(float), actual, thresholds[crop][nutrient]))
+
+    # The dashboard's path: get_forecast from a model filtered up to the origin
+    last = int(origins[-1])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        at_origin = filtered(model, df.iloc[:last + 1], nutrient, seasonal_period)
+        latencies = []
+        for _ in range(LATENCY_SAMPLES):
+            tick = time.perf_counter()
+            reference = forecast_nutrient(at_origin, df.iloc[:last + 1], nutrient, horizon)
+            latencies.append(time.perf_counter() - tick)
+
+    out.update(
+        origins=len(origins),
+        rows=len(df),
+        order=list(model.model.order),
+        seasonal_order=list(results.model.seasonal_order),
+        filter_seconds=round(filter_seconds, 4),
+        batched_ms_per_forecast=round(project_seconds / len(origins) * 1e3, 5),
+        get_forecast_ms_p50=round(float(np.median(latencies)) * 1e3, 3),
+        get_forecast_ms_p99=round(float(np.quantile(latencies, 0.99)) * 1e3, 3),
+        check_max_abs_diff=float(np.abs(predicted[-1] - reference.values).max()),
+    )
+    return out
+
+
+def run(crops: list, nutrient_list: list, horizon: int, stride: int, warmup: int, workers: int,
+        seasonal_period: int = None, dtype: str = "float64") -> list:
+    tasks = [(crop, nutrient) for crop in crops for nutrient in nutrient_list]
+    reports = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(backtest_series, crop, nutrient, horizon, stride, warmup, seasonal_period, dtype):
+                (crop, nutrient)
+            for crop, nutrient in tasks
+        }
+        for future in as_completed(futures):
+            crop, nutrient = futures[future]
+            try:
+                reports.append(future.result())
+            except Exception as e:
+                reports.append({"crop": crop, "nutrient": nutrient, "error": f"{type(e).__name__}: {e}"})
+    order = {task: i for i, task in enumerate(tasks)}
+    return sorted(reports, key=lambda r: order[(r["crop"], r["nutrient"])])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the nutrient models")
+    parser.add_argument("--crops", nargs="*", default=[key for _, key, _ in crop_name])
+    parser.add_argument("--nutrients", nargs="*", default=nutrients)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="steps of 15 minutes")
+    parser.add_argument("--stride", type=int, default=DEFAULT_STRIDE, help="readings between origins")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="readings before the first origin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seasonal-period", type=int, default=None, help="override the models' seasonal period")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64", help="projection precision")
+    parser.add_argument("--out", default="backtest.json")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reports = run(args.crops, args.nutrients, args.horizon, args.stride, args.warmup, args.workers,
+                  args.seasonal_period, args.dtype)
+    report = {
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+        "seconds": round(time.perf_counter() - start, 3),
+        "series": reports,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'series':<16} {'origins':>7} {'MAE@1':>8} {'MAE@h':>8} {'RMSE@h':>8} {'prec@h':>7} {'rec@h':>7} "
+          f"{'batch ms':>9} {'get_fc ms':>9}")
+    for r in reports:
+        name = f"{r['crop']}/{r['nutrient']}"
+        if "error" in r:
+            print(f"{name:<16} {r['error']}")
+            continue
+
+        def fmt(value, width, digits):
+            return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+        print(f"{name:<16} {r['origins']:>7} {fmt(r['mae'][0], 8, 3)} {fmt(r['mae'][-1], 8, 3)} "
+              f"{fmt(r['rmse'][-1], 8, 3)} {fmt(r['breach_precision'][-1], 7, 2)} {fmt(r['breach_recall'][-1], 7, 2)} "
+              f"{r['batched_ms_per_forecast']:>9.4f} {r['get_forecast_ms_p50']:>9.3f}")
+    print(f"Wrote {args.out} in {report['seconds']}s", file=sys.stderr)
+    return 1 if any("error" in r for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Headless forecast job for every crop and nutrient.
+
+    python batch_forecast.py [--horizon 96] [--workers 4] [--store forecasts] [--force]
+
+Crops whose data high-water mark, horizon and model files are unchanged
+since the last run are skipped, so the job is safe to run from cron.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from config import crop_name, nutrients, thresholds
+from forecast_store import STORE_DIR, read_crop_forecasts, write_crop_forecasts
+from forecasting import forecast_nutrient
+from model_registry import ModelRegistry
+from model_state import ModelStateStore
+from partitions import load_crop_frame
+
+DEFAULT_HORIZON = 96
+
+# Per worker process, so each process compacts and caches its models once
+_registry = None
+
+
+def _worker_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def forecast_crop(crop: str, horizon: int) -> dict:
+    """Forecast every nutrient of one crop; runs in a worker process"""
+    df = load_crop_frame(crop)
+    registry = _worker_registry()
+    state_store = ModelStateStore()
+
+    results, errors, missing = {}, {}, []
+    for nutrient in nutrients:
+        try:
+            model = registry.get(crop, nutrient)
+            if model is None:
+                missing.append(nutrient)
+                continue
+            model = state_store.update(crop, nutrient, model, df)
+            results[nutrient] = forecast_nutrient(model, df, nutrient, horizon=horizon)
+        except Exception as e:
+            errors[nutrient] = str(e)
+
+    return {
+        "crop": crop,
+        "high_water": df["Timestamp"].iloc[-1],
+        "results": results,
+        "errors": errors,
+        "missing": missing,
+    }
+
+
+def is_current(crop: str, high_water, horizon: int, versions: dict, store_dir: str) -> bool:
+    # Errors are retried on the next run; a nutrient without a model is not, until one shows up in `versions`
+    stored = read_crop_forecasts(crop, store_dir)
+    if stored is None:
+        return False
+    meta = stored[0]
+    return (
+        pd.Timestamp(meta["high_water"]) == high_water
+        and meta["horizon"] >= horizon
+        and meta["models"] == versions
+        and not meta["errors"]
+    )
+
+
+def run(crops: list, horizon: int, workers: int, store_dir: str, force: bool = False) -> dict:
+    registry = ModelRegistry()
+    summary = {"forecast": [], "skipped": [], "errors": {}, "missing": {}}
+    versions = {}
+
+    to_run = []
+    for crop in crops:
+        try:
+            high_water = load_crop_frame(crop)["Timestamp"].iloc[-1]
+        except (OSError, KeyError, ValueError) as e:
+            summary["errors"][crop] = f"cannot read data: {e}"
+            continue
+        versions[crop] = {n: v for n in nutrients if (v := registry.version(crop, n))}
+        if not force and is_current(crop, high_water, horizon, versions[crop], store_dir):
+            summary["skipped"].append(crop)
+        else:
+            to_run.append(crop)
+
+    series = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(forecast_crop, crop, horizon): crop for crop in to_run}
+        for future in as_completed(futures):
+            crop = futures[future]
+            try:
+                out = future.result()
+                series += _store_crop(out, horizon, versions[crop], store_dir)
+            except Exception as e:
+                # One crop's data or model failing must not lose the crops that finished
+                summary["errors"][crop] = f"{type(e).__name__}: {e}"
+                continue
+            summary["forecast"].append(crop)
+            if out["errors"]:
+                summary["errors"][crop] = out["errors"]
+            if out["missing"]:
+                summary["missing"][crop] = out["missing"]
+
+    elapsed = time.perf_counter() - start
+    summary.update(
+        series=series,
+        seconds=round(elapsed, 3),
+        series_per_sec=round(series / elapsed, 2) if series else 0.0,
+    )
+    return summary
+
+
+def _store_crop(out: dict, horizon: int, versions: dict, store_dir: str) -> int:
+    """Write one crop's forecasts to the store; returns the number of series written"""
+    crop = out["crop"]
+    meta = {
+        "crop": crop,
+        "high_water": out["high_water"].isoformat(),
+        "horizon": horizon,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "models": versions,
+        "breaches": {
+            n: r.below(thresholds[crop][n]) for n, r in out["results"].items()
+        },
+        "errors": out["errors"],
+        "missing": out["missing"],
+    }
+    write_crop_forecasts(crop, meta, out["results"], store_dir)
+    return len(out["results"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast every crop/nutrient into the forecast store")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="steps of 15 minutes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--crops", nargs="*", default=[key for _, key, _ in crop_name])
+    parser.add_argument("--force", action="store_true", help="recompute even if nothing changed")
+    args = parser.parse_args(argv)
+
+    summary = run(args.crops, args.horizon, args.workers, args.store, args.force)
+    print(json.dumps(summary, indent=2, default=str))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
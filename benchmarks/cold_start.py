@@ -0,0 +1,99 @@
+"""Cold-start benchmark: imports and first render in fresh interpreters.
+
+    python benchmarks/cold_start.py [--repeat 5] [--out cold_start.json]
+
+Every sample is a new Python process with an empty data cache, which is
+what the first request after a scale-from-zero sees. Results use the same
+format as run.py, so two runs can be compared with benchmarks/compare.py.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from common import REPO_ROOT, SOURCE_FILES, environment, install_models, make_workspace, timed
+from synthetic import generate
+
+from data_cache import CACHE_DIR, read_csv_typed
+
+RENDER = '''
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({main!r}, default_timeout=600)
+app.session_state['current_page'] = {page!r}
+app.session_state['selected_crop'] = {crop!r}
+app.run()
+if app.exception:
+    raise SystemExit(app.exception[0].value)
+'''
+
+
+def scenarios(crop: str) -> dict:
+    main_path = os.path.join(REPO_ROOT, 'main.py')
+    return {
+        'import_home': ('-', 'import streamlit, home'),
+        'import_dashboard': ('-', 'import streamlit, dashboard'),
+        'render_home': ('-', RENDER.format(main=main_path, page='Home', crop=None)),
+        'render_crop_selection': ('-', RENDER.format(main=main_path, page='Dashboard', crop=None)),
+        'render_dashboard': (crop, RENDER.format(main=main_path, page='Dashboard', crop=crop)),
+    }
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, *options, '-c', code], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'cold-start sample failed:\n{result.stderr[-2000:]}')
+    return result
+
+
+def slowest_imports(code: str, top: int) -> list:
+    """Modules with the largest cumulative import time (microseconds), from -X importtime"""
+    rows = []
+    for line in run_python(code, '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(), 'cumulative_us': int(cumulative)})
+    return sorted(rows, key=lambda row: row['cumulative_us'], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--crop', default='coffee', choices=sorted(SOURCE_FILES))
+    parser.add_argument('--out', default='cold_start.json')
+    parser.add_argument('--workspace', default=None, help='scratch directory (default: a temp dir)')
+    args = parser.parse_args(argv)
+    out_path = os.path.abspath(args.out)
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix='pcs-cold-')
+    make_workspace(workspace)
+    os.chdir(workspace)
+    frames = {crop: read_csv_typed(os.path.join(REPO_ROOT, source)) for crop, source in SOURCE_FILES.items()}
+    rows = generate('data', 1)
+    model_sources = install_models(workspace, frames)
+
+    def cold():
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    report = {'environment': environment(), 'models': model_sources, 'results': []}
+    cases = scenarios(args.crop)
+    for name, (crop, code) in cases.items():
+        print(f'cold start: {name}', file=sys.stderr)
+        entry = {'group': 'cold_start', 'benchmark': name, 'crop': crop, 'scale': 1, 'rows': rows.get(crop)}
+        entry.update(timed(lambda: run_python(code), args.repeat, setup=cold))
+        report['results'].append(entry)
+
+    cold()
+    report['slowest_imports'] = slowest_imports(cases['render_dashboard'][1], top=20)
+
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {len(report["results"])} results to {out_path}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from config import crop_name, env_features, nutrients  # noqa: E402
+from forecasting import build_exog_matrix  # noqa: E402
+
+# Source CSV for each dashboard crop key
+SOURCE_FILES = {
+    'coffee': 'data/coffee.csv',
+    'blackpepper': 'data/BlackPepper.csv',
+    'durian': 'data/durian.csv',
+}
+
+STANDIN_ROWS = 1500
+
+
+def timed(fn, repeat: int = 5, setup=None) -> dict:
+    """Run `fn` `repeat` times (calling `setup` untimed before each) and summarise seconds"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'repeat': repeat,
+        'mean': statistics.fmean(samples),
+        'median': statistics.median(samples),
+        'min': samples[0],
+        'max': samples[-1],
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def make_workspace(path: str):
+    """A scratch copy of the app's relative layout (data/, model/, assets/) to benchmark in"""
+    shutil.rmtree(path, ignore_errors=True)
+    for sub in ('data', 'model'):
+        os.makedirs(os.path.join(path, sub))
+    shutil.copytree(os.path.join(REPO_ROOT, 'assets'), os.path.join(path, 'assets'))
+
+
+def model_loadable(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            pickle.load(f)
+        return True
+    except Exception:
+        # Typically a Git LFS pointer that was never fetched
+        return False
+
+
+def fit_standin(df, nutrient: str):
+    """A small SARIMAX with the same const/_lag_1/_lag_12 exog layout as the real models"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    train = df.iloc[:STANDIN_ROWS]
+    exog_names = ['const'] + [f'{feat}_lag_{lag}' for feat in env_features for lag in (1, 12)]
+    exog = build_exog_matrix(train, exog_names)
+    model = SARIMAX(train[nutrient].astype(float), exog=exog, order=(1, 1, 1))
+    return model.fit(disp=False, maxiter=50)
+
+
+def install_models(workspace: str, frames: dict) -> dict:
+    """Copy loadable repo models into the workspace, fitting stand-ins for the rest.
+
+    Returns {crop: {nutrient: 'repo' | 'standin'}}.
+    """
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(os.path.join(REPO_ROOT, 'model'))
+    sources = {}
+    for _, crop, _ in crop_name:
+        sources[crop] = {}
+        for nutrient in nutrients:
+            target = os.path.join(workspace, 'model', f'best_sarima_model_{crop}_{nutrient}.pkl')
+            entry = registry.entries().get((crop, nutrient))
+            source = os.path.join(registry.model_dir, entry['file']) if entry else None
+            if source and source.endswith('.pkl') and model_loadable(source):
+                shutil.copyfile(source, target)
+                sources[crop][nutrient] = 'repo'
+                continue
+            with open(target, 'wb') as f:
+                pickle.dump(fit_standin(frames[crop], nutrient), f)
+            sources[crop][nutrient] = 'standin'
+    return sources
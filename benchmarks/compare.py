@@ -0,0 +1,50 @@
+"""Compare two benchmark result files and flag slowdowns.
+
+    python benchmarks/compare.py before.json after.json [--threshold 1.2] [--fail]
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    return {
+        (r['group'], r['benchmark'], r['crop'], r['scale']): r
+        for r in report['results'] if 'median' in r
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=1.2, help='ratio of medians counted as a regression')
+    parser.add_argument('--fail', action='store_true', help='exit non-zero on any regression')
+    args = parser.parse_args(argv)
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    print(f'{"benchmark":<40} {"crop":<12} {"scale":>5} {"before":>10} {"after":>10} {"ratio":>7}')
+    for key in sorted(before.keys() & after.keys()):
+        group, name, crop, scale = key
+        old, new = before[key]['median'], after[key]['median']
+        ratio = new / old if old else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  SLOWER'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = '  faster'
+        print(f'{name:<40} {crop:<12} {scale:>5} {old * 1e3:>9.2f}ms {new * 1e3:>9.2f}ms {ratio:>6.2f}x{flag}')
+
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f'only in {"before" if key in before else "after"}: {key}')
+
+    print(f'{regressions} regression(s) above {args.threshold}x')
+    return 1 if args.fail and regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
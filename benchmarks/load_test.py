@@ -0,0 +1,184 @@
+"""Load test for the JSON API: throughput and tail latency per endpoint.
+
+    python benchmarks/load_test.py [--concurrency 32] [--duration 20] [--out load_test.json]
+    python benchmarks/load_test.py --url http://host:8750 --crop coffee
+
+Without --url an api.py server is started in a scratch workspace (scaled
+crop CSVs, stand-in models where model/ cannot be loaded). Each client
+keeps one connection open and cycles through the endpoint mix. Results use
+the same format as run.py, with the median latency as `median`, so runs
+can be compared with benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from common import REPO_ROOT, SOURCE_FILES, environment, install_models, make_workspace
+from synthetic import generate
+
+from config import nutrients
+from data_cache import read_csv_typed
+
+
+def endpoints(crop: str, horizon: int) -> dict:
+    return {
+        'health': '/health',
+        'latest': f'/crops/{crop}/latest',
+        'window_24h': f'/crops/{crop}/window?hours=24',
+        'forecast': f'/crops/{crop}/forecast/{nutrients[0]}?horizon={horizon}',
+        'breaches': f'/crops/{crop}/breaches?horizon={horizon}',
+    }
+
+
+async def request(reader, writer, host: str, path: str) -> int:
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    length = next(int(line.split(':', 1)[1]) for line in lines if line.lower().startswith('content-length:'))
+    await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+async def client(host: str, port: int, paths: list, offset: int, deadline: float, samples: dict, errors: dict):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        i = offset
+        while time.perf_counter() < deadline:
+            name, path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            status = await request(reader, writer, host, path)
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                samples[name].append(elapsed)
+            else:
+                errors[name] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(url: str, paths: dict, concurrency: int, duration: float) -> tuple:
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    samples = {name: [] for name in paths}
+    errors = {name: 0 for name in paths}
+
+    # One untimed pass so model loading and the first forecasts are not counted
+    reader, writer = await asyncio.open_connection(host, port)
+    for path in paths.values():
+        await request(reader, writer, host, path)
+    writer.close()
+
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    items = list(paths.items())
+    await asyncio.gather(*(
+        client(host, port, items, i, deadline, samples, errors) for i in range(concurrency)
+    ))
+    return samples, errors, time.perf_counter() - start
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarise(samples: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(samples)
+    summary = {'requests': len(ordered), 'errors': errors, 'requests_per_s': len(ordered) / elapsed}
+    if ordered:
+        summary.update({
+            'mean': statistics.fmean(ordered),
+            'median': statistics.median(ordered),
+            'p90': percentile(ordered, 0.90),
+            'p99': percentile(ordered, 0.99),
+            'min': ordered[0],
+            'max': ordered[-1],
+        })
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workspace: str, scale: int) -> tuple:
+    make_workspace(workspace)
+    os.chdir(workspace)
+    frames = {crop: read_csv_typed(os.path.join(REPO_ROOT, source)) for crop, source in SOURCE_FILES.items()}
+    rows = generate('data', scale)
+    models = install_models(workspace, frames)
+
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'api.py'), '--port', str(port)], cwd=workspace, env=env,
+    )
+    for _ in range(300):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('api.py exited during startup')
+            time.sleep(0.1)
+    return server, f'http://127.0.0.1:{port}', rows, models
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=None, help='an already running server (default: start one)')
+    parser.add_argument('--crop', default='coffee', choices=sorted(SOURCE_FILES))
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    parser.add_argument('--horizon', type=int, default=96)
+    parser.add_argument('--scale', type=int, default=1, help='size of the generated data when starting a server')
+    parser.add_argument('--out', default='load_test.json')
+    parser.add_argument('--workspace', default=None, help='scratch directory (default: a temp dir)')
+    args = parser.parse_args(argv)
+    out_path = os.path.abspath(args.out)
+
+    server, rows, models = None, {}, None
+    url = args.url
+    if url is None:
+        server, url, rows, models = start_server(args.workspace or tempfile.mkdtemp(prefix='pcs-load-'), args.scale)
+
+    try:
+        paths = endpoints(args.crop, args.horizon)
+        print(f'load: {args.concurrency} clients for {args.duration:g}s against {url}', file=sys.stderr)
+        samples, errors, elapsed = asyncio.run(run_load(url, paths, args.concurrency, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {'environment': environment(), 'models': models, 'results': []}
+    total = sum(len(s) for s in samples.values())
+    report['environment'].update({'url': url, 'concurrency': args.concurrency, 'duration': elapsed})
+    for name in paths:
+        entry = {'group': 'load', 'benchmark': name, 'crop': args.crop, 'scale': args.scale, 'rows': rows.get(args.crop)}
+        entry.update(summarise(samples[name], errors[name], elapsed))
+        report['results'].append(entry)
+        if entry['requests']:
+            print(f'{name:<12} {entry["requests_per_s"]:>9.1f} req/s  p50 {entry["median"] * 1e3:>8.2f}ms  '
+                  f'p90 {entry["p90"] * 1e3:>8.2f}ms  p99 {entry["p99"] * 1e3:>8.2f}ms  errors {entry["errors"]}',
+                  file=sys.stderr)
+    print(f'total {total / elapsed:.1f} req/s', file=sys.stderr)
+
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {len(report["results"])} results to {out_path}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Benchmarks for data loading, exog construction, forecasting and page render.
+
+    python benchmarks/run.py [--scales 1 10 100] [--out results.json] [--skip-render]
+
+Everything runs in a scratch workspace holding scaled copies of the crop
+CSVs. Models that cannot be loaded from model/ (e.g. unfetched LFS
+pointers) are replaced by small locally fitted SARIMAX stand-ins. Compare
+two result files with benchmarks/compare.py.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import timedelta
+
+import pandas as pd
+
+from common import REPO_ROOT, SOURCE_FILES, environment, install_models, make_workspace, timed
+from synthetic import generate
+
+from config import nutrients, thresholds
+from data_cache import CACHE_DIR, read_csv_typed
+from depletion import depletion
+from downsample import downsample
+from features import FeatureStore
+from forecasting import build_future_exog, forecast_nutrient
+
+FORECAST_HORIZONS = (12, 96, 672)
+
+
+def bench_loading(dashboard, crop: str, repeat: int) -> dict:
+    path = f'data/{crop}.csv'
+
+    def cold():
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        dashboard.get_service().reset_feeds()
+
+    return {
+        'csv_parse_inferred': timed(lambda: pd.read_csv(path, parse_dates=['Timestamp']), repeat),
+        'load_crop_data_cold': timed(lambda: dashboard.load_crop_data(crop), repeat, setup=cold),
+        'load_crop_data_bundle': timed(lambda: dashboard.load_crop_data(crop), repeat, setup=dashboard.get_service().reset_feeds),
+        'load_crop_data_warm': timed(lambda: dashboard.load_crop_data(crop), repeat * 10),
+    }
+
+
+def bench_windows(dashboard, crop: str, repeat: int) -> dict:
+    store = dashboard.get_time_series_store()
+    out = {}
+    for label, duration in (('24h', timedelta(days=1)), ('30d', timedelta(days=30))):
+        window = store.last(crop, duration)
+        out[f'window_{label}'] = timed(lambda: store.last(crop, duration), repeat * 10)
+        out[f'downsample_{label}'] = timed(
+            lambda: downsample(window['Timestamp'].to_numpy(), window['N'].to_numpy(), dashboard.chart_width_px),
+            repeat,
+        )
+    return out
+
+
+def bench_forecasting(dashboard, crop: str, repeat: int) -> dict:
+    df = dashboard.load_crop_data(crop)
+    df_env = dashboard.get_time_series_store().last(crop, timedelta(days=1))
+    registry, state_store = dashboard.get_model_registry(), dashboard.get_model_state_store()
+    out = {}
+
+    model = registry.get(crop, nutrients[0])
+    exog_names = model.model.exog_names or []
+    for horizon in FORECAST_HORIZONS:
+        out[f'build_future_exog_h{horizon}'] = timed(lambda: build_future_exog(df_env, exog_names, horizon), repeat * 10)
+
+    features = FeatureStore()
+    n = len(df)
+    out['feature_store_build'] = timed(lambda: features.matrix(crop, df, exog_names), repeat, setup=features.reset)
+    out['feature_store_append_1'] = timed(
+        lambda: features.matrix(crop, df, exog_names), repeat * 10,
+        setup=lambda: features.matrix(crop, df.iloc[:-1], exog_names),
+    )
+    for horizon in FORECAST_HORIZONS:
+        out[f'feature_store_future_h{horizon}'] = timed(
+            lambda: features.matrix(crop, df, exog_names, n, n + horizon), repeat * 10,
+        )
+
+    def cold_models():
+        registry.clear()
+        state_store.reset(crop)
+
+    for nutrient in nutrients:
+        out[f'prepare_model_cold_{nutrient}'] = timed(
+            lambda: dashboard.get_service().prepare_model(crop, nutrient, df), repeat, setup=cold_models,
+        )
+        warm = dashboard.get_service().prepare_model(crop, nutrient, df)
+        for horizon in FORECAST_HORIZONS:
+            out[f'forecast_{nutrient}_h{horizon}'] = timed(lambda: forecast_nutrient(warm, df, nutrient, horizon), repeat)
+            result = forecast_nutrient(warm, df, nutrient, horizon)
+            out[f'depletion_{nutrient}_h{horizon}'] = timed(
+                lambda: depletion(warm, result, thresholds[crop][nutrient]), repeat,
+            )
+
+    cache = dashboard.get_forecast_cache()
+    for horizon in FORECAST_HORIZONS:
+        out[f'submit_forecasts_h{horizon}'] = timed(
+            lambda: [job.result() for job in dashboard.submit_forecasts(crop, df, horizon).values() if job is not None],
+            repeat,
+            setup=cache.clear,
+        )
+    return out
+
+
+def bench_render(crop: str, repeat: int) -> dict:
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    errors = []
+
+    def new_app():
+        app = AppTest.from_file(os.path.join(REPO_ROOT, 'main.py'), default_timeout=600)
+        app.session_state['current_page'] = 'Dashboard'
+        app.session_state['selected_crop'] = crop
+        return app
+
+    def run(app):
+        app.run()
+        errors.extend(e.value for e in app.exception)
+
+    def clear_caches():
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+    cold_app = []
+    out = {
+        'render_cold': timed(lambda: run(cold_app[-1]), repeat,
+                             setup=lambda: (clear_caches(), cold_app.append(new_app()))),
+    }
+    warm_app = new_app()
+    run(warm_app)
+    out['render_warm'] = timed(lambda: run(warm_app), repeat)
+    out['render_exceptions'] = sorted(set(errors))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--workspace', default=None, help='scratch directory (default: a temp dir)')
+    parser.add_argument('--skip-render', action='store_true')
+    args = parser.parse_args(argv)
+    out_path = os.path.abspath(args.out)
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix='pcs-bench-')
+    make_workspace(workspace)
+    os.chdir(workspace)
+
+    frames = {crop: read_csv_typed(os.path.join(REPO_ROOT, source)) for crop, source in SOURCE_FILES.items()}
+    generate('data', 1)
+    model_sources = install_models(workspace, frames)
+
+    # Imported from inside the workspace so its relative paths resolve there
+    import dashboard
+
+    report = {'environment': environment(), 'models': model_sources, 'results': []}
+    for scale in args.scales:
+        rows = generate('data', scale)
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        dashboard.get_service().reset_feeds()
+        dashboard.get_forecast_cache().clear()
+        dashboard.get_model_state_store().reset()
+
+        for crop in SOURCE_FILES:
+            print(f'scale {scale}x, {crop} ({rows[crop]} rows)', file=sys.stderr)
+            groups = [
+                ('loading', bench_loading(dashboard, crop, args.repeat)),
+                ('windows', bench_windows(dashboard, crop, args.repeat)),
+                ('forecasting', bench_forecasting(dashboard, crop, args.repeat)),
+            ]
+            if not args.skip_render:
+                groups.append(('render', bench_render(crop, max(1, args.repeat // 2))))
+
+            for group, results in groups:
+                for name, value in results.items():
+                    entry = {'group': group, 'benchmark': name, 'crop': crop, 'scale': scale, 'rows': rows[crop]}
+                    if isinstance(value, dict):
+                        entry.update(value)
+                    else:
+                        entry['value'] = value
+                    report['results'].append(entry)
+
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {len(report["results"])} results to {out_path}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
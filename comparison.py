@@ -0,0 +1,118 @@
+import streamlit as st
+import pandas as pd
+from datetime import timedelta
+from config import crop_name, env_features, nutrients, thresholds
+from dashboard import get_service, plot_chart
+from styles import apply_page_style
+
+metrics = nutrients + env_features + ['Rainfall (mm)']
+
+comparison_ranges = {
+    '7 days': timedelta(days=7),
+    '30 days': timedelta(days=30),
+    '90 days': timedelta(days=90),
+    'All': None,
+}
+
+resolutions = {'Daily': 'daily', 'Hourly': 'hourly'}
+
+crop_labels = {key: label for label, key, _ in crop_name}
+
+def show_comparison():
+    apply_page_style()
+    col1, col2 = st.columns([1, 4])
+
+    with col1:
+        if st.button("🏠 Back to Home", key="home_btn_comparison"):
+            st.session_state.current_page = "home"
+            st.session_state.page = "home"
+            st.rerun()
+
+    with col2:
+        st.markdown("""
+        <div class="main-header">
+            <h1>📊 Crop Comparison</h1>
+            <p>Hourly and daily aggregates across crops</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    controls = st.columns([3, 2, 2, 3])
+    with controls[0]:
+        crops = st.multiselect("Crops", list(crop_labels), default=list(crop_labels),
+                               format_func=crop_labels.get, key="compare_crops")
+    with controls[1]:
+        metric = st.selectbox("Reading", metrics, key="compare_metric")
+    with controls[2]:
+        resolution = resolutions[st.radio("Resolution", list(resolutions), horizontal=True, key="compare_resolution")]
+    with controls[3]:
+        range_label = st.radio("Range", list(comparison_ranges), index=1, horizontal=True, key="compare_range")
+
+    if not crops:
+        st.info("Select at least one crop to compare")
+        return
+
+    # Rollups, not raw readings: a month of daily buckets is 30 rows per crop
+    service = get_service()
+    frames = {}
+    for crop in crops:
+        try:
+            frames[crop] = service.rollup(crop, resolution)
+        except Exception as e:
+            st.warning(f"⚠️ No data for {crop_labels[crop]}: {e}")
+    frames = {crop: frame for crop, frame in frames.items() if len(frame)}
+    if not frames:
+        return
+
+    # One window for every crop, ending at the newest bucket of any of them
+    end = max(frame['bucket'].iloc[-1] for frame in frames.values())
+    span = comparison_ranges[range_label]
+    if span is not None:
+        start = end - span
+        frames = {crop: frame[frame['bucket'] > start] for crop, frame in frames.items()}
+        outside = [crop_labels[crop] for crop, frame in frames.items() if not len(frame)]
+        if outside:
+            st.info(f"No readings in the last {range_label} up to {end:%Y-%m-%d} for: {', '.join(outside)}")
+        frames = {crop: frame for crop, frame in frames.items() if len(frame)}
+
+    show_comparison_chart(frames, metric, resolution)
+    show_comparison_table(frames, metric)
+    st.caption(f"Built from {sum(len(f) for f in frames.values())} {resolution} rollup rows "
+               f"covering {sum(int(f['count'].sum()) for f in frames.values())} readings")
+
+def show_comparison_chart(frames, metric, resolution):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for crop, frame in frames.items():
+        label = crop_labels[crop]
+        if resolution == 'daily':
+            fig.add_trace(go.Scatter(x=frame['bucket'], y=frame[f'{metric}_max'], mode='lines', line=dict(width=0),
+                                     legendgroup=crop, showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=frame['bucket'], y=frame[f'{metric}_min'], mode='lines', line=dict(width=0),
+                                     fill='tonexty', opacity=0.2, legendgroup=crop, name=f'{label} range'))
+        fig.add_trace(go.Scatter(x=frame['bucket'], y=frame[f'{metric}_mean'], mode='lines', legendgroup=crop,
+                                 name=f'{label} mean'))
+        if metric in nutrients:
+            threshold = thresholds[crop][metric]
+            fig.add_trace(go.Scatter(x=frame['bucket'].iloc[[0, -1]], y=[threshold, threshold], mode='lines',
+                                     line=dict(dash='dot'), legendgroup=crop, name=f'{label} threshold'))
+    fig.update_layout(title=f'{metric} ({resolution} mean)', xaxis_title='Time', yaxis_title=metric)
+    plot_chart(fig)
+
+def show_comparison_table(frames, metric):
+    rows = []
+    for crop, frame in frames.items():
+        counts = frame['count'].to_numpy()
+        row = {
+            'Crop': crop_labels[crop],
+            'Latest': frame[f'{metric}_last'].iloc[-1],
+            'Mean': (frame[f'{metric}_mean'] * counts).sum() / counts.sum(),
+            'Min': frame[f'{metric}_min'].min(),
+            'Max': frame[f'{metric}_max'].max(),
+        }
+        if metric in nutrients:
+            below = frame[f'{metric}_min'] < thresholds[crop][metric]
+            row['Threshold'] = thresholds[crop][metric]
+            row['Buckets below threshold'] = f"{int(below.sum())} / {len(frame)}"
+        rows.append(row)
+    st.dataframe(pd.DataFrame(rows).set_index('Crop'), use_container_width=True)
@@ -0,0 +1,29 @@
+import os
+
+# Crop data
+crop_name = [
+    ('Coffee', 'coffee', 'assets/coffee.png'),
+    ('BlackPepper', 'blackpepper', 'assets/black_pepper.png'),
+    ('Durian', 'durian', 'assets/durian.png')
+]
+
+nutrients = ['N', 'P', 'K']
+env_features = ['Temperature', 'pH', 'Moisture (%)']
+
+thresholds = {
+    'coffee': {'N': 35, 'P': 50, 'K': 45},
+    'durian': {'N': 55, 'P': 28, 'K': 45},
+    'blackpepper': {'N': 33, 'P': 51, 'K': 39},
+}
+
+
+def crop_data_path(crop: str, data_dir: str = "data") -> str:
+    """The crop's legacy single CSV; file names don't follow the keys' casing (BlackPepper.csv)"""
+    name = f"{crop}.csv"
+    try:
+        for entry in os.listdir(data_dir):
+            if entry.lower() == name.lower():
+                return os.path.join(data_dir, entry)
+    except OSError:
+        pass
+    return os.path.join(data_dir, name)
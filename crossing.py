@@ -0,0 +1,119 @@
+"""Time until each nutrient crosses its threshold, days to weeks ahead.
+
+The forecast mean and variance of every 15-minute step are computed in
+closed form from the filtered state: the mean is the design-row powers
+(`depletion.design_loadings`) applied to the state plus the held exog
+effect, and the variance adds up the same responses the depletion
+simulation draws from. Every step of a multi-week horizon is covered, so a
+seasonal dip between coarse grid points can't be missed, at the cost of a
+few matrix products per series rather than a `get_forecast` call.
+
+The expected crossing is the first step whose mean is below the threshold.
+Its range runs from the first step with at least a LOW chance of being
+below to the first with at least HIGH.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from depletion import design_loadings, responses
+from forecasting import STEP, system_vector
+
+DEFAULT_HORIZON = 96 * 14
+LOW, HIGH = 0.1, 0.9
+
+STATUS_ORDER = {"below": 0, "crossing": 1, "watch": 2, "clear": 3}
+
+
+@dataclass(frozen=True)
+class Crossing:
+    """When one nutrient series is expected to drop below its threshold"""
+    crop: str
+    nutrient: str
+    threshold: float
+    last_time: pd.Timestamp
+    last_value: float
+    horizon: int
+    # First time the mean forecast is below threshold
+    expected: Optional[pd.Timestamp]
+    # First times the chance of being below reaches LOW and HIGH
+    earliest: Optional[pd.Timestamp]
+    latest: Optional[pd.Timestamp]
+    # Lowest mean forecast within the horizon
+    forecast_min: float
+
+    @property
+    def status(self) -> str:
+        if self.last_value < self.threshold:
+            return "below"
+        if self.expected is not None:
+            return "crossing"
+        return "watch" if self.earliest is not None else "clear"
+
+    def hours_until(self, when) -> Optional[float]:
+        return None if when is None else (when - self.last_time) / pd.Timedelta(hours=1)
+
+
+def attention_order(crossing: Crossing) -> tuple:
+    """Sort key: series below threshold first, then by how soon they are expected to cross"""
+    soonest = crossing.expected or crossing.earliest
+    return (
+        STATUS_ORDER[crossing.status],
+        crossing.hours_until(soonest) if soonest is not None else np.inf,
+        crossing.last_value / crossing.threshold,
+    )
+
+
+def moments(results, horizon: int, exog: np.ndarray = None):
+    """Mean and standard deviation of every step up to `horizon`, from the last filtered state.
+
+    `exog` holds the future exog rows (horizon, exog names), as the forecasts use.
+    """
+    if results.model.k_trend:
+        raise ValueError("Models with a trend term are not supported; use a const exog column")
+    if np.any(system_vector(results.model.ssm, "state_intercept")):
+        raise ValueError("Models with a state intercept are not supported")
+
+    loadings = design_loadings(results, horizon)
+    mean = loadings @ results.predicted_state[:, -1]
+    exog_names = results.model.exog_names or []
+    if exog_names:
+        params = pd.Series(np.asarray(results.params), index=results.model.param_names)
+        mean += exog @ params[exog_names].to_numpy()
+
+    initial, shocks, noise_sd = responses(results, horizon, loadings)
+    # A shock one step before step j reaches every later step too
+    shock_var = np.concatenate([[0.0], np.cumsum((shocks ** 2).sum(axis=1))[:-1]])
+    variance = (initial ** 2).sum(axis=1) + shock_var + noise_sd ** 2
+    return mean, np.sqrt(variance)
+
+
+def _first(mask: np.ndarray) -> Optional[int]:
+    steps = np.flatnonzero(mask)
+    return int(steps[0]) if len(steps) else None
+
+
+def time_to_threshold(results, crop: str, nutrient: str, threshold: float, last_time, last_value: float,
+                      horizon: int = DEFAULT_HORIZON, exog: np.ndarray = None) -> Crossing:
+    mean, sd = moments(results, horizon, exog)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chance = ndtr((threshold - mean) / sd)
+
+    def at(step):
+        return None if step is None else last_time + STEP * (step + 1)
+
+    return Crossing(
+        crop=crop,
+        nutrient=nutrient,
+        threshold=threshold,
+        last_time=last_time,
+        last_value=float(last_value),
+        horizon=horizon,
+        expected=at(_first(mean < threshold)),
+        earliest=at(_first(chance >= LOW)),
+        latest=at(_first(chance >= HIGH)),
+        forecast_min=float(mean.min()) if horizon else np.nan,
+    )
@@ -1,69 +1,156 @@
 import streamlit as st
 import pandas as pd
-import pickle
-import plotly.graph_objects as go
 from datetime import timedelta
 import os
-from typing import Optional
-from statsmodels.tsa.statespace.sarimax import SARIMAXResultsWrapper
-
-# Crop data
-crop_name = [
-    ('Coffee', 'coffee', 'assets/coffee.png'),
-    ('BlackPepper', 'blackpepper', 'assets/black_pepper.png'),
-    ('Durian', 'durian', 'assets/durian.png')
-]
-
-nutrients = ['N', 'P', 'K']
-env_features = ['Temperature', 'pH', 'Moisture (%)']
-
-thresholds = {
-    'coffee': {'N': 35, 'P': 50, 'K': 45},
-    'durian': {'N': 55, 'P': 28, 'K': 45},
-    'blackpepper': {'N': 33, 'P': 51, 'K': 39},
+from alerts import BREACHED, DEFAULT_HORIZON as alert_horizon, PREDICTED, read_alert_state
+from config import crop_name, env_features, nutrients, thresholds
+from downsample import downsample, threshold_segment
+from forecast_cache import ForecastCache
+from model_registry import ModelRegistry
+from model_state import ModelStateStore
+from service import ForecastService
+from styles import apply_page_style
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from timeseries import TimeSeriesStore
+from tracing import count, recorder, set_session, span, start_http_server, write_prometheus
+
+# Forecast steps of 15 minutes
+forecast_horizons = {
+    '3 hours': 12,
+    '1 day': 96,
+    '7 days': 672,
 }
 
-@st.cache_data
+history_ranges = {
+    '1 hour': timedelta(hours=1),
+    '24 hours': timedelta(days=1),
+    '7 days': timedelta(days=7),
+    '30 days': timedelta(days=30),
+}
+
+# Points sent per chart trace; about one per pixel of a dashboard column
+chart_width_px = 600
+
+# Seconds between refreshes of each dashboard unit in live mode
+live_refresh_seconds = int(os.environ.get("PCS_LIVE_INTERVAL", "10"))
+
+@st.cache_resource
+def get_service() -> ForecastService:
+    # Data, models and forecasts shared by every session; the HTTP API (api.py) uses the same layer
+    return ForecastService()
+
 def load_crop_data(crop):
-    path = f"data/{crop}.csv"
-    df = pd.read_csv(path, parse_dates=['Timestamp'])
-    df = df.sort_values('Timestamp')
-    return df
+    return get_service().load(crop)
+
+def get_time_series_store() -> TimeSeriesStore:
+    return get_service().series
+
+def get_model_registry() -> ModelRegistry:
+    return get_service().registry
 
 @st.cache_resource
-def load_sarima_model(crop: str, nutrient: str) -> Optional[SARIMAXResultsWrapper]:
-    model_path = f"model/best_sarima_model_{crop}_{nutrient.upper()}.pkl"
-    if not os.path.exists(model_path):
+def get_live_ingest():
+    # PCS_INGEST_PORT runs the socket ingest inside the app, so charts see readings before they are flushed
+    port = os.environ.get("PCS_INGEST_PORT")
+    if not port:
         return None
-    try:
-        with open(model_path, "rb") as f:
-            model = pickle.load(f)
-        return model
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
+    from live_ingest import start_ingest_server
+    return start_ingest_server(int(port))
+
+def recent_window(crop, duration) -> pd.DataFrame:
+    """Readings within `duration` of the newest, from the live buffers when they reach back that far"""
+    live = get_live_ingest()
+    if live is not None:
+        window = live.store.window_frame(crop, duration)
+        if window is not None:
+            return window
+    return get_time_series_store().last(crop, duration)
+
+def latest_reading(crop) -> pd.Series:
+    latest = get_time_series_store().latest(crop)
+    live = get_live_ingest()
+    buffered = live.store.latest(crop) if live is not None else None
+    if buffered is not None and buffered['Timestamp'] > latest['Timestamp']:
+        return buffered
+    return latest
+
+@st.cache_data(max_entries=512)
+def chart_trace(crop, feature, range_label, width, high_water, threshold=None):
+    # high_water is part of the cache key so new readings invalidate the trace
+    df_window = recent_window(crop, history_ranges[range_label])
+    return downsample(df_window['Timestamp'].to_numpy(), df_window[feature].to_numpy(), width, threshold=threshold)
+
+@st.cache_resource
+def get_alert_evaluator():
+    # Shares this process's forecasts; set PCS_ALERT_EVALUATOR=0 when alerts.py runs as its own process
+    if os.environ.get("PCS_ALERT_EVALUATOR", "1") == "0":
+        return None
+    from alerts import AlertEvaluator
+    evaluator = AlertEvaluator(get_service()).start()
+    live = get_live_ingest()
+    if live is not None:
+        # Evaluate as soon as new readings reach disk rather than at the next interval
+        live.store.flush_listeners.append(evaluator.notify)
+    return evaluator
+
+def alert_state(crop_key):
+    """{nutrient: alert_state row} for a crop, as last committed by the alert evaluator.
+
+    None while the evaluator's first pass after a start is still running.
+    """
+    evaluator = get_alert_evaluator()
+    if evaluator is not None and not evaluator.ready.is_set():
         return None
+    state = read_alert_state(crop=crop_key)
+    return {row.nutrient: row for row in state.itertuples()}
+
+def horizon_label_for(steps: int) -> str:
+    labels = {v: k for k, v in forecast_horizons.items()}
+    return labels.get(steps, f"{steps * 15 // 60} hours")
+
+def get_forecast_cache() -> ForecastCache:
+    return get_service().forecasts
 
-def build_next_exog(df_env: pd.DataFrame, exog_names: list) -> pd.DataFrame:
-    exog_dict = {}
-    latest = df_env.iloc[-1]
-
-    for name in exog_names:
-        if name == 'const':
-            exog_dict[name] = 1
-        elif name.endswith('_lag_1'):
-            base_feat = name.replace('_lag_1', '')
-            exog_dict[name] = df_env[base_feat].iloc[-1]
-        elif name.endswith('_lag_12'):
-            base_feat = name.replace('_lag_12', '')
-            if len(df_env) >= 12:
-                exog_dict[name] = df_env[base_feat].iloc[-12]
+@st.cache_resource
+def start_metrics_exporter():
+    # PCS_METRICS_PORT serves Prometheus text at http://127.0.0.1:<port>/metrics
+    port = os.environ.get("PCS_METRICS_PORT")
+    return start_http_server(int(port)) if port else None
+
+def plot_chart(fig):
+    with span("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+def show_performance_panel():
+    # Hidden unless the page is opened with ?perf=1
+    ctx = get_script_run_ctx()
+    with st.expander("⏱️ Performance", expanded=True):
+        for title, session in (("This session", ctx.session_id if ctx else None), ("All sessions", None)):
+            stats = recorder.summary(session)
+            st.markdown(f"**{title}**")
+            if stats:
+                table = pd.DataFrame(stats).T[["count", "p50", "p90", "p99", "sum"]]
+                table[["p50", "p90", "p99", "sum"]] *= 1000
+                st.dataframe(table.rename(columns=lambda c: c if c == "count" else f"{c} (ms)"), use_container_width=True)
             else:
-                exog_dict[name] = latest[base_feat]
-        else:
-            exog_dict[name] = latest.get(name, 0)
+                st.caption("No spans recorded")
+        counters = recorder.counters()
+        if counters:
+            st.markdown("**Cache lookups**")
+            st.dataframe(pd.Series(counters).unstack(fill_value=0), use_container_width=True)
+
+def get_model_state_store() -> ModelStateStore:
+    return get_service().model_states
+
+def submit_forecast(crop_key: str, df: pd.DataFrame, nutrient: str, horizon: int):
+    return get_service().submit_forecast(crop_key, nutrient, horizon, df)
+
+def submit_depletion(crop_key: str, df: pd.DataFrame, nutrient: str, horizon: int):
+    return get_service().submit_depletion(crop_key, nutrient, horizon, df)
 
-    exog_df = pd.DataFrame([exog_dict])
-    return exog_df
+def submit_forecasts(crop_key: str, df: pd.DataFrame, horizon: int) -> dict:
+    # Starts every nutrient at once so the panels, which render one by one, find their jobs running
+    return get_service().submit_forecasts(crop_key, horizon, df)
 
 def get_crop_image(crop_key):
     crop_images = {
@@ -74,51 +161,26 @@ def get_crop_image(crop_key):
     return crop_images.get(crop_key, None)
 
 def show_dashboard():
-    st.markdown("""
-    <style>
-    .main-header {
-        background: linear-gradient(90deg, #2E8B57, #228B22);
-        padding: 2rem;
-        border-radius: 10px;
-        margin-bottom: 2rem;
-        color: white;
-        text-align: center;
-    }
-    .section-header {
-        background: linear-gradient(90deg, #f8f9fa, #e9ecef);
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 5px solid #28a745;
-        margin: 1rem 0;
-    }
-    .info-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        border: 1px solid #e9ecef;
-        margin: 1rem 0;
-    }
-    .metric-card {
-        background: linear-gradient(135deg, #28a745 0%, #218838 100%);
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        text-align: center;
-        margin: 0.5rem;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    apply_page_style()
 
     if 'selected_crop' not in st.session_state:
         st.session_state['selected_crop'] = None
 
+    bind_tracing_session()
+    start_metrics_exporter()
+
     crop_key = st.session_state.get('selected_crop')
 
     if not crop_key:
         show_crop_selection()
     else:
-        show_crop_dashboard(crop_key)
+        with span("show_crop_dashboard"):
+            show_crop_dashboard(crop_key)
+
+    if os.environ.get("PCS_METRICS_FILE"):
+        write_prometheus(os.environ["PCS_METRICS_FILE"])
+    if st.query_params.get("perf") == "1":
+        show_performance_panel()
 
 def show_crop_selection():
     col1, col2 = st.columns([1, 4])
@@ -128,6 +190,12 @@ def show_crop_selection():
             st.session_state.current_page = "home"
             st.session_state.page = "home"
             st.rerun()
+        if st.button("📊 Compare Crops", key="compare_btn_selection"):
+            st.session_state.current_page = "Comparison"
+            st.rerun()
+        if st.button("⏳ Threshold Outlook", key="fleet_btn_selection"):
+            st.session_state.current_page = "Fleet"
+            st.rerun()
     
     with col2:
         st.markdown("""
@@ -167,12 +235,15 @@ def show_crop_selection():
     """, unsafe_allow_html=True)
 
 def show_crop_dashboard(crop_key):
-    col1, col2 = st.columns([1, 3])
+    col1, col2, col3 = st.columns([1, 3, 1])
     
     with col1:
         if st.button("🔙 Change Crop", key="back_to_selection"):
             st.session_state.selected_crop = None
             st.rerun()
+
+    with col3:
+        st.toggle("🔴 Live", key="live_mode", help=f"Refresh panels with new readings every {live_refresh_seconds}s")
     
     crop_image = get_crop_image(crop_key)
     
@@ -187,51 +258,18 @@ def show_crop_dashboard(crop_key):
         """, unsafe_allow_html=True)
 
     try:
-        df = load_crop_data(crop_key)
-        latest_data = df.iloc[-1]
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>📅 Last Update</h4>
-                <p>{latest_data['Timestamp'].strftime('%Y-%m-%d %H:%M')}</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>🌡️ Temperature</h4>
-                <p>{latest_data['Temperature']:.1f}°C</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>🧪 pH Level</h4>
-                <p>{latest_data['pH']:.2f}</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col4:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>💧 Moisture</h4>
-                <p>{latest_data['Moisture (%)']:.1f}%</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
+        df = get_time_series_store().frame(crop_key)
     except Exception as e:
         st.error(f"❌ Error loading data for {crop_key}: {e}")
         return
 
-    df_env = df[df['Timestamp'] >= df['Timestamp'].max() - timedelta(days=1)]
+    show_unit("metric_cards", show_metric_cards, crop_key)
 
-    st.markdown("""
+    range_label = st.radio("History range", list(history_ranges), index=1, horizontal=True, key="history_range")
+
+    st.markdown(f"""
     <div class="section-header">
-        <h3>🌤 Environmental Conditions (Last 24 Hours)</h3>
+        <h3>🌤 Environmental Conditions (Last {range_label.title()})</h3>
         <p>Monitor key environmental factors affecting crop growth</p>
     </div>
     """, unsafe_allow_html=True)
@@ -239,69 +277,26 @@ def show_crop_dashboard(crop_key):
     env_cols = st.columns(3)
     for i, feature in enumerate(env_features):
         with env_cols[i]:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_env['Timestamp'], y=df_env[feature], mode='lines', name=feature))
-            fig.update_layout(title=f'{feature} (Last 24 Hours)', xaxis_title='Time', yaxis_title=feature)
-            st.plotly_chart(fig, use_container_width=True)
+            show_unit("environment_chart", show_environment_chart, crop_key, feature, range_label)
 
-    st.markdown("""
+    horizon_label = st.radio("Forecast horizon", list(forecast_horizons), horizontal=True, key="forecast_horizon")
+
+    st.markdown(f"""
     <div class="section-header">
-        <h3>🧪 Nutrient Forecast (Last 24h + Next 3 Hours)</h3>
+        <h3>🧪 Nutrient Forecast (Last {range_label.title()} + Next {horizon_label.title()})</h3>
         <p>Predictive analysis for optimal nutrient management</p>
     </div>
     """, unsafe_allow_html=True)
 
     nutrient_cols = st.columns(3)
-    forecast_horizon = 12  # 12 steps of 15 minutes = 3 hours
-    df_nutrient = df[df['Timestamp'] >= df['Timestamp'].max() - timedelta(days=1)]
+    submit_forecasts(crop_key, df, forecast_horizons[horizon_label])
 
     for i, nutrient in enumerate(nutrients):
-        model = load_sarima_model(crop_key, nutrient)
         with nutrient_cols[i]:
-            if model is None:
-                st.warning(f"⚠️ No model for {nutrient}")
-                continue
-
-            try:
-                model_exog_names = getattr(model.model, "exog_names", [])
-                temp_df_env = df_env.copy()
-
-                last_val = df[nutrient].iloc[-1]
-                last_time = df["Timestamp"].iloc[-1]
-                forecast_vals = [last_val]
-                future_times = [last_time]
-
-                for step in range(1, forecast_horizon + 1):
-                    exog = build_next_exog(temp_df_env, model_exog_names) if model_exog_names else None
-                    forecast = model.forecast(steps=1, exog=exog) if exog is not None else model.forecast(steps=1)
-                    val = forecast.iloc[0] if hasattr(forecast, "iloc") else forecast[0]
-                    forecast_vals.append(val)
-                    next_time = last_time + timedelta(minutes=step * 15)
-                    future_times.append(next_time)
-
-                    next_row = temp_df_env.iloc[-1:].copy()
-                    next_row["Timestamp"] = next_time
-                    for feat in env_features:
-                        next_row[feat] = next_row[feat].values[0]
-                    temp_df_env = pd.concat([temp_df_env, next_row], ignore_index=True)
-
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=df_nutrient["Timestamp"], y=df_nutrient[nutrient], mode="lines", name="Historical"))
-                fig.add_trace(go.Scatter(x=future_times, y=forecast_vals, mode="lines", name="Forecast", line=dict(color="red")))
-
-                threshold = thresholds[crop_key][nutrient]
-                fig.add_trace(go.Scatter(x=df_nutrient["Timestamp"], y=[threshold]*len(df_nutrient), mode="lines", name="Threshold", line=dict(color="orange", dash="dot")))
-
-                fig.update_layout(title=nutrient, xaxis_title="Time", yaxis_title=nutrient)
-                st.plotly_chart(fig, use_container_width=True)
-
-                if any(val < threshold for val in forecast_vals[1:]):
-                    st.warning(f"⚠️ {nutrient} levels may drop below threshold in the next 3 hours (12 steps)!")
-                else:
-                    st.success(f"✅ {nutrient} levels are normal - staying above threshold for next 3 hours")
-
-            except Exception as e:
-                st.error(f"❌ Forecast error for {nutrient}: {e}")
+            show_unit("nutrient_panel", show_nutrient_panel, crop_key, nutrient, range_label, horizon_label)
+
+    # One read of the alert table for all three panels, rerun on its own in live mode
+    show_unit("alert_status", show_alert_status, crop_key)
 
     st.markdown("""
     <div style="text-align: center; padding: 2rem; color: #666; border-top: 1px solid #eee; margin-top: 2rem;">
@@ -309,5 +304,162 @@ def show_crop_dashboard(crop_key):
     </div>
     """, unsafe_allow_html=True)
 
-# Run the app
-show_dashboard()
+def bind_tracing_session():
+    ctx = get_script_run_ctx()
+    set_session(ctx.session_id if ctx else None)
+
+def run_unit(name, render, *args):
+    # Fragment reruns skip show_dashboard, so the tracing session is bound here too
+    bind_tracing_session()
+    with span(f"unit.{name}"):
+        render(*args)
+
+def show_unit(name, render, *args):
+    """Render one dashboard unit as a fragment.
+
+    A fragment reruns on its own, without the page's CSS, the other charts or
+    other forecasts. In live mode it also reruns every `live_refresh_seconds`.
+    """
+    run_every = live_refresh_seconds if st.session_state.get("live_mode") else None
+    st.fragment(run_unit, run_every=run_every)(name, render, *args)
+
+def unit_figure(unit: str, signature: tuple, build):
+    """The figure of a unit, rebuilt only when its data signature changed since the last run"""
+    figures = st.session_state.setdefault("unit_figures", {})
+    cached = figures.get(unit)
+    changed = cached is None or cached[0] != signature
+    count("dashboard_unit", hit=not changed)
+    if changed:
+        cached = figures[unit] = (signature, build())
+    return cached[1]
+
+def show_metric_cards(crop_key):
+    latest_data = latest_reading(crop_key)
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>📅 Last Update</h4>
+            <p>{latest_data['Timestamp'].strftime('%Y-%m-%d %H:%M')}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>🌡️ Temperature</h4>
+            <p>{latest_data['Temperature']:.1f}°C</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>🧪 pH Level</h4>
+            <p>{latest_data['pH']:.2f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>💧 Moisture</h4>
+            <p>{latest_data['Moisture (%)']:.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+def show_environment_chart(crop_key, feature, range_label):
+    # Imported here rather than at module level to keep plotly off the cold-start path
+    import plotly.graph_objects as go
+
+    high_water = latest_reading(crop_key)['Timestamp']
+
+    def build():
+        fig = go.Figure()
+        x, y = chart_trace(crop_key, feature, range_label, chart_width_px, high_water)
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name=feature))
+        fig.update_layout(title=f'{feature} (Last {range_label.title()})', xaxis_title='Time', yaxis_title=feature)
+        return fig
+
+    plot_chart(unit_figure(f"environment:{feature}", (crop_key, range_label, high_water), build))
+
+def show_nutrient_panel(crop_key, nutrient, range_label, horizon_label):
+    import plotly.graph_objects as go
+
+    df = get_time_series_store().frame(crop_key)
+    high_water = latest_reading(crop_key)['Timestamp']
+    forecast_horizon = forecast_horizons[horizon_label]
+
+    try:
+        result = submit_forecast(crop_key, df, nutrient, forecast_horizon).result()
+    except Exception as e:
+        st.error(f"❌ Forecast error for {nutrient}: {e}")
+        return
+    if result is None:
+        st.warning(f"⚠️ No model for {nutrient}")
+        return
+
+    threshold = thresholds[crop_key][nutrient]
+    try:
+        outlook = submit_depletion(crop_key, df, nutrient, forecast_horizon).result()
+    except Exception as e:
+        st.error(f"❌ Simulation error for {nutrient}: {e}")
+        outlook = None
+
+    def build():
+        future_times, forecast_vals = result.with_origin()
+        x, y = chart_trace(crop_key, nutrient, range_label, chart_width_px, high_water, threshold)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=x, y=y, mode="lines", name="Historical"))
+        if outlook is not None:
+            # Bands of the simulated paths
+            for low, high, alpha in ((0.05, 0.95, 0.1), (0.25, 0.75, 0.2)):
+                fig.add_trace(go.Scatter(x=outlook.timestamps, y=outlook.quantile(high), mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                fig.add_trace(go.Scatter(x=outlook.timestamps, y=outlook.quantile(low), mode="lines", line=dict(width=0), fill="tonexty", fillcolor=f"rgba(255,0,0,{alpha})", name=f"{high - low:.0%} of paths"))
+        else:
+            fig.add_trace(go.Scatter(x=result.timestamps, y=result.upper, mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scatter(x=result.timestamps, y=result.lower, mode="lines", line=dict(width=0), fill="tonexty", fillcolor="rgba(255,0,0,0.1)", name="95% Interval"))
+        fig.add_trace(go.Scatter(x=future_times, y=forecast_vals, mode="lines", name="Forecast", line=dict(color="red")))
+
+        df_window = recent_window(crop_key, history_ranges[range_label])
+        x, y = threshold_segment(df_window["Timestamp"].to_numpy(), threshold)
+        fig.add_trace(go.Scatter(x=x, y=y, mode="lines", name="Threshold", line=dict(color="orange", dash="dot")))
+
+        fig.update_layout(title=nutrient, xaxis_title="Time", yaxis_title=nutrient)
+        return fig
+
+    version = get_model_registry().version(crop_key, nutrient)
+    try:
+        plot_chart(unit_figure(f"nutrient:{nutrient}", (crop_key, range_label, forecast_horizon, high_water, version, outlook is not None), build))
+    except Exception as e:
+        st.error(f"❌ Forecast error for {nutrient}: {e}")
+        return
+    if outlook is not None:
+        likely = outlook.first_step(0.5)
+        by = f", likely by {outlook.timestamps[likely]:%b %d %H:%M}" if likely is not None else ""
+        st.caption(f"🎲 {outlook.risk:.0%} chance of dropping below {threshold:g} within {horizon_label}{by} ({outlook.paths} simulated paths)")
+
+def show_alert_status(crop_key):
+    # Alert levels are debounced by the background evaluator rather than recomputed per render
+    alerts = alert_state(crop_key)
+    for column, nutrient in zip(st.columns(len(nutrients)), nutrients):
+        with column:
+            if alerts is None:
+                st.info(f"⏳ Alert status for {nutrient} is pending: the first evaluation is still running")
+            elif nutrient not in alerts:
+                st.info(f"⏳ Alert status for {nutrient} is not available yet")
+            else:
+                show_alert(nutrient, alerts[nutrient])
+
+def show_alert(nutrient, alert):
+    # The evaluator checks its own horizon, whichever forecast horizon is selected above
+    alert_window = horizon_label_for(int(alert.horizon) if pd.notna(alert.horizon) else alert_horizon)
+    if alert.level == BREACHED:
+        st.error(f"🚨 {nutrient} is below its threshold ({alert.value:.1f} < {alert.threshold:g}) since the reading at {alert.since}")
+    elif alert.level == PREDICTED:
+        chance = f"have a {alert.breach_probability:.0%} chance to" if pd.notna(alert.breach_probability) else "may"
+        st.warning(f"⚠️ {nutrient} levels {chance} drop below threshold in the next {alert_window} (alert horizon)!")
+    else:
+        st.success(f"✅ {nutrient} levels are normal - staying above threshold for next {alert_window} (alert horizon)")
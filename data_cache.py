@@ -0,0 +1,219 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = "data/.cache"
+CACHE_VERSION = 1
+TIMESTAMP_FORMAT = "%m/%d/%Y %H:%M"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bundle_dir(csv_path: str) -> str:
+    # data/coffee.csv -> data/.cache/coffee; files in subdirectories (partitions) keep their relative path
+    stem = os.path.splitext(csv_path)[0]
+    relative = os.path.relpath(os.path.abspath(stem), os.path.abspath(os.path.dirname(CACHE_DIR)))
+    if relative.startswith(os.pardir):
+        # Outside data/: same-named files in different directories (e.g. YYYY-MM partitions) must not share a bundle
+        where = hashlib.sha256(os.path.dirname(os.path.abspath(stem)).encode()).hexdigest()[:12]
+        relative = f"{os.path.basename(stem)}-{where}"
+    return os.path.join(CACHE_DIR, relative)
+
+
+def read_csv_typed(source, names: list = None) -> pd.DataFrame:
+    """Parse a crop CSV with an explicit timestamp format and float32 sensor columns"""
+    if names is None:
+        df = pd.read_csv(source)
+    else:
+        df = pd.read_csv(source, header=None, names=names)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], format=TIMESTAMP_FORMAT)
+    for col in df.columns.drop("Timestamp"):
+        df[col] = df[col].astype(np.float32)
+    return df
+
+
+def _read_meta(directory: str):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def _write_meta(directory: str, meta: dict):
+    tmp_path = os.path.join(directory, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+
+def read_header(csv_path: str) -> list:
+    with open(csv_path, newline="") as f:
+        return f.readline().rstrip("\r\n").split(",")
+
+
+def prefix_hasher(csv_path: str, end: int):
+    """sha256 of the first `end` bytes, still open so appended bytes can be added with `extend_hasher`"""
+    return extend_hasher(hashlib.sha256(), csv_path, 0, end)
+
+
+def extend_hasher(hasher, csv_path: str, start: int, end: int):
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def read_rows_from(csv_path: str, offset: int, columns: list):
+    """Parse the complete lines after byte `offset`; returns the rows and the new offset"""
+    with open(csv_path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    if end == 0:
+        return read_csv_typed(io.BytesIO(b""), names=columns), offset
+    return read_csv_typed(io.BytesIO(chunk[:end]), names=columns), offset + end
+
+
+def _column_values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col == "Timestamp":
+        return df[col].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return df[col].to_numpy(dtype=np.float32)
+
+
+def convert_csv(csv_path: str) -> dict:
+    """Write the CSV as one .npy file per column and return the bundle metadata"""
+    stat = os.stat(csv_path)
+    df = read_csv_typed(csv_path).sort_values("Timestamp", kind="stable")
+
+    directory = bundle_dir(csv_path)
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        file_name = f"col_{i}.npy"
+        values = _column_values(df, col)
+        np.save(os.path.join(tmp_dir, file_name), values)
+        columns.append({"name": col, "file": file_name, "dtype": str(values.dtype)})
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": csv_path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": prefix_hasher(csv_path, stat.st_size).hexdigest(),
+        "rows": len(df),
+        "columns": columns,
+    }
+    _write_meta(tmp_dir, meta)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    return meta
+
+
+def ensure_bundle(csv_path: str) -> dict:
+    """Return metadata for an up-to-date bundle, rebuilding it if the CSV changed"""
+    directory = bundle_dir(csv_path)
+    meta = _read_meta(directory)
+    if meta is None:
+        return convert_csv(csv_path)
+
+    stat = os.stat(csv_path)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return meta
+    if meta.get("sha256") is None or stat.st_size < meta["size"]:
+        return convert_csv(csv_path)
+
+    # Any change to the bytes the bundle was built from, even one that keeps the size, means a rebuild
+    hasher = prefix_hasher(csv_path, meta["size"])
+    if hasher.hexdigest() != meta["sha256"]:
+        return convert_csv(csv_path)
+
+    if stat.st_size == meta["size"]:
+        # Touched but not modified (checkout, copy): keep the bundle
+        meta["mtime_ns"] = stat.st_mtime_ns
+        _write_meta(directory, meta)
+        return meta
+
+    # Appended rows only: extend the column files instead of re-parsing the CSV
+    return _append_to_bundle(csv_path, directory, meta, hasher)
+
+
+def _append_to_bundle(csv_path: str, directory: str, meta: dict, hasher) -> dict:
+    """Extend the bundle with the rows after meta["size"]; `hasher` holds the digest of the bytes before them"""
+    names = [col["name"] for col in meta["columns"]]
+    tail, offset = read_rows_from(csv_path, meta["size"], names)
+    if tail.empty:
+        return meta
+
+    timestamps = tail["Timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    last_file = next(col["file"] for col in meta["columns"] if col["name"] == "Timestamp")
+    last_seen = np.load(os.path.join(directory, last_file), mmap_mode="r")
+    if (np.diff(timestamps) < 0).any() or (len(last_seen) and timestamps[0] < last_seen[-1]):
+        return convert_csv(csv_path)
+
+    for col in meta["columns"]:
+        path = os.path.join(directory, col["file"])
+        values = np.concatenate([np.load(path), _column_values(tail, col["name"])])
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+
+    meta.update(
+        size=offset,
+        mtime_ns=os.stat(csv_path).st_mtime_ns,
+        sha256=extend_hasher(hasher, csv_path, meta["size"], offset).hexdigest(),
+        rows=meta["rows"] + len(tail),
+    )
+    _write_meta(directory, meta)
+    return meta
+
+
+def load_bundle(csv_path: str, mmap: bool = True) -> pd.DataFrame:
+    """Load a crop CSV through its binary bundle, memory-mapping the column files"""
+    return load_bundle_with_meta(csv_path, mmap)[0]
+
+
+def load_bundle_with_meta(csv_path: str, mmap: bool = True):
+    meta = ensure_bundle(csv_path)
+    directory = bundle_dir(csv_path)
+    mmap_mode = "r" if mmap else None
+
+    data = {}
+    for col in meta["columns"]:
+        values = np.load(os.path.join(directory, col["file"]), mmap_mode=mmap_mode)
+        if col["name"] == "Timestamp":
+            values = values.view("datetime64[ns]")
+        data[col["name"]] = values
+    return pd.DataFrame(data, copy=False), meta
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(
+        os.path.join("data", name) for name in os.listdir("data") if name.endswith(".csv")
+    )
+    for path in paths:
+        meta = ensure_bundle(path)
+        print(f"{path}: {meta['rows']} rows -> {bundle_dir(path)}")
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Spare room allocated on each growth, as a fraction of the current size
+GROWTH = 0.5
+
+
+class Column:
+    """An append-only array; the filled part is only ever handed out as read-only views"""
+
+    def __init__(self, values: np.ndarray):
+        # Kept as given (e.g. a read-only memory map) until the first append
+        self._data = np.asarray(values)
+        self.size = len(values)
+
+    def append(self, values: np.ndarray):
+        needed = self.size + len(values)
+        if needed > len(self._data) or not self._data.flags.writeable:
+            # Reallocating leaves earlier views pointing at the old, unchanged buffer
+            self._data = _grown(self._data, self.size, max(needed, int(needed * (1 + GROWTH))))
+        self._data[self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        out = self._data[:self.size]
+        if out.flags.writeable:
+            out = out.view()
+            out.flags.writeable = False
+        return out
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+def _grown(data: np.ndarray, size: int, capacity: int) -> np.ndarray:
+    grown = np.empty(capacity, dtype=data.dtype)
+    grown[:size] = data[:size]
+    return grown
+
+
+class Dataset:
+    """The readings of one crop, shared by reference by every session.
+
+    Columns only grow at the end, so a frame handed out earlier is never
+    changed underneath its reader: appends write past the rows it covers,
+    and a reallocation leaves it on the old buffer. Frames are read-only
+    views over the columns, never copies.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._lock = threading.Lock()
+        self._columns = {name: Column(frame[name].to_numpy()) for name in frame.columns}
+        self._frame = None
+
+    def __len__(self):
+        return next(iter(self._columns.values())).size if self._columns else 0
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame({name: col.view() for name, col in self._columns.items()}, copy=False)
+            return self._frame
+
+    def append(self, rows: pd.DataFrame):
+        if rows.empty:
+            return
+        with self._lock:
+            for name, col in self._columns.items():
+                col.append(rows[name].to_numpy(dtype=col.view().dtype))
+            self._frame = None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self._columns.values())
@@ -0,0 +1,165 @@
+"""Monte Carlo depletion probabilities for nutrient forecasts.
+
+A forecast's point values say nothing about how likely a nutrient is to
+drop below its threshold. Here thousands of future paths are drawn from the
+model's state-space form around the `get_forecast` mean, all at once: each
+path is the mean plus the response to a draw of the current state
+uncertainty, the future state shocks and the measurement noise. Because the
+system is linear, those responses are a matrix product and a convolution
+with the model's impulse response, so no path or state is stepped in Python.
+
+From the (paths, horizon) block come the probability of being below the
+threshold at each step, the probability of having dropped below it by each
+step, and quantile bands for the charts.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import fft
+
+from forecasting import ForecastResult, system_matrix
+
+DEFAULT_PATHS = 2000
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# The same draws every time, so refreshes of unchanged data don't flicker
+SEED = 0
+
+
+@dataclass(frozen=True)
+class DepletionForecast:
+    """Simulated outlook for one nutrient series against its threshold"""
+    timestamps: pd.DatetimeIndex
+    threshold: float
+    # P(value < threshold) at each step
+    probability: np.ndarray
+    # P(value dropped below threshold at or before each step)
+    cumulative: np.ndarray
+    levels: tuple
+    # One row per level in `levels`, one column per step
+    quantiles: np.ndarray
+    paths: int
+
+    @property
+    def horizon(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def risk(self) -> float:
+        """Probability of dropping below the threshold anywhere in the horizon"""
+        return float(self.cumulative[-1]) if self.horizon else 0.0
+
+    def quantile(self, level: float) -> np.ndarray:
+        return self.quantiles[self.levels.index(level)]
+
+    def first_step(self, probability: float = 0.5):
+        """Index of the first step by which the threshold is crossed with at least `probability`, or None"""
+        steps = np.flatnonzero(self.cumulative >= probability)
+        return int(steps[0]) if len(steps) else None
+
+
+def _factor(cov: np.ndarray) -> np.ndarray:
+    """F with F @ F.T == cov for a positive semi-definite `cov`, without its null directions"""
+    values, vectors = np.linalg.eigh((cov + cov.T) / 2)
+    keep = values > max(values.max(initial=0.0), 0.0) * 1e-12
+    return vectors[:, keep] * np.sqrt(values[keep])
+
+
+def design_loadings(results, horizon: int) -> np.ndarray:
+    """Rows design @ transition^j for j < horizon: how each step's mean loads on the current state.
+
+    Filled by doubling, one matrix product per power of two, so weeks of
+    15-minute steps cost a dozen products rather than a loop over steps.
+    """
+    ssm = results.model.ssm
+    design = system_matrix(ssm, "design")[0]
+    power = system_matrix(ssm, "transition")
+    out = np.empty((horizon, len(design)))
+    filled = min(horizon, 1)
+    out[:filled] = design
+    while filled < horizon:
+        take = min(filled, horizon - filled)
+        out[filled:filled + take] = out[:take] @ power
+        filled += take
+        power = power @ power
+    return out
+
+
+def responses(results, horizon: int, loadings: np.ndarray = None):
+    """How each forecast step loads on the model's sources of uncertainty.
+
+    Returns (initial, shocks, noise_sd): `initial` (horizon, r) maps standard
+    normal draws of the state uncertainty at the forecast origin onto each
+    step, `shocks` (horizon, q) is the impulse response of a step to a
+    standard normal state shock one step earlier, and `noise_sd` is the
+    measurement noise. `loadings` are the model's `design_loadings`, if the
+    caller already has them.
+    """
+    ssm = results.model.ssm
+    selection = system_matrix(ssm, "selection")
+    state_cov = system_matrix(ssm, "state_cov")
+    obs_cov = system_matrix(ssm, "obs_cov")
+    if loadings is None:
+        loadings = design_loadings(results, horizon)
+
+    initial = loadings @ _factor(results.predicted_state_cov[:, :, -1])
+    shocks = loadings @ (selection @ _factor(state_cov))
+    return initial, shocks, float(np.sqrt(max(obs_cov[0, 0], 0.0)))
+
+
+def simulate_paths(results, mean: np.ndarray, paths: int = DEFAULT_PATHS, seed: int = SEED,
+                   dtype=np.float32) -> np.ndarray:
+    """(paths, horizon) draws of the series around `mean`, its forecast from `results`.
+
+    float32 is plenty for probabilities and bands and halves the FFT and sort work.
+    """
+    horizon = len(mean)
+    if not horizon:
+        return np.empty((paths, 0), dtype=dtype)
+    initial, shocks, noise_sd = responses(results, horizon)
+    rng = np.random.default_rng(seed)
+
+    out = rng.standard_normal((paths, initial.shape[1]), dtype=dtype) @ initial.T.astype(dtype)
+    # A shock drawn at step i moves steps i + 1 onwards: a causal convolution, done in the frequency domain
+    size = fft.next_fast_len(2 * horizon - 1, real=True)
+    for k in range(shocks.shape[1]):
+        kernel = np.concatenate([[0.0], shocks[:-1, k]]).astype(dtype)
+        draws = rng.standard_normal((paths, horizon), dtype=dtype)
+        out += fft.irfft(fft.rfft(draws, size) * fft.rfft(kernel, size), size)[:, :horizon]
+    if noise_sd:
+        out += rng.standard_normal((paths, horizon), dtype=dtype) * dtype(noise_sd)
+    out += mean.astype(dtype)
+    return out
+
+
+def _quantiles(simulated: np.ndarray, levels: tuple) -> np.ndarray:
+    # np.quantile's linear interpolation, with one sort per step for all levels
+    ordered = np.sort(simulated, axis=0)
+    position = np.asarray(levels) * (len(ordered) - 1)
+    lo = np.floor(position).astype(int)
+    hi = np.minimum(lo + 1, len(ordered) - 1)
+    weight = (position - lo)[:, None]
+    return ordered[lo] * (1 - weight) + ordered[hi] * weight
+
+
+def depletion(results, forecast: ForecastResult, threshold: float, paths: int = DEFAULT_PATHS,
+              levels: tuple = QUANTILES, seed: int = SEED) -> DepletionForecast:
+    """Threshold-crossing probabilities and quantile bands for `forecast`.
+
+    `results` is the model the forecast was made from, filtered up to the
+    same reading, so its last predicted state covariance is the uncertainty
+    at the forecast origin.
+    """
+    simulated = simulate_paths(results, forecast.values, paths, seed)
+    below = simulated < threshold
+    crossed = np.logical_or.accumulate(below, axis=1)
+    quantiles = _quantiles(simulated, levels) if forecast.horizon else np.empty((len(levels), 0))
+    return DepletionForecast(
+        timestamps=forecast.timestamps,
+        threshold=threshold,
+        probability=below.mean(axis=0),
+        cumulative=crossed.mean(axis=0),
+        levels=tuple(levels),
+        quantiles=quantiles,
+        paths=paths,
+    )
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+def _numeric(x: np.ndarray) -> np.ndarray:
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').view(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int, extremes: bool = True) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of at most `n_out` points that keep the visual shape.
+
+    The triangle pick can skip a spike narrower than its bucket, so with
+    `extremes` each bucket's min and max are kept as well, in a third as
+    many buckets.
+    """
+    n = len(y)
+    n_buckets = (n_out - 2) // 3 if extremes else n_out - 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    x = _numeric(x)
+    y = np.asarray(y, dtype=float)
+    # First and last points are fixed; the rest are split into n_buckets
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(int)
+    selected = [0]
+
+    prev = 0
+    for i in range(n_buckets):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        areas = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(areas))
+        selected.append(prev)
+        if extremes:
+            selected += [lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))]
+
+    selected.append(n - 1)
+    return np.unique(selected)
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min and max of each of n_out // 2 buckets, so no peak or trough is dropped"""
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    starts = np.linspace(0, n, n_buckets + 1).astype(int)[:-1]
+    lengths = np.diff(np.append(starts, n))
+    bucket_of = np.repeat(np.arange(n_buckets), lengths)
+
+    # Sort positions by (bucket, value) to find each bucket's extremes in one pass
+    order = np.lexsort((y, bucket_of))
+    first = np.cumsum(lengths) - lengths
+    last = first + lengths - 1
+    return np.unique(np.concatenate([order[first], order[last], [0, n - 1]]))
+
+
+def crossing_indices(y: np.ndarray, threshold: float, n_buckets: int = None) -> np.ndarray:
+    """Points on either side of each crossing of `threshold`.
+
+    With `n_buckets`, only the first crossing per bucket is kept so a noisy
+    series hovering at the threshold cannot blow the point budget.
+    """
+    above = np.asarray(y, dtype=float) >= threshold
+    changes = np.flatnonzero(above[1:] != above[:-1])
+    if n_buckets is not None and len(changes):
+        _, first = np.unique(changes * n_buckets // len(above), return_index=True)
+        changes = changes[first]
+    return np.unique(np.concatenate([changes, changes + 1]))
+
+
+def downsample(x, y, n_out: int, method: str = 'lttb', threshold: float = None):
+    """Reduce a trace to about `n_out` points, keeping threshold crossings exact"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= n_out:
+        return x, y
+
+    if method == 'lttb':
+        indices = lttb_indices(x, y, n_out)
+    elif method == 'minmax':
+        indices = minmax_indices(y, n_out)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    if threshold is not None:
+        indices = np.union1d(indices, crossing_indices(y, threshold, n_out // 2))
+    return x[indices], y[indices]
+
+
+def threshold_segment(x, threshold: float):
+    """A horizontal threshold line as a 2-point trace spanning `x`"""
+    x = np.asarray(x)
+    if not len(x):
+        return x, np.array([])
+    return np.array([x[0], x[-1]]), np.array([threshold, threshold])
@@ -0,0 +1,198 @@
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from datasets import Column
+
+# <feature>_lag_<k>: the reading k steps back
+# <feature>_rollmean_<k> / <feature>_rollsum_<k>: mean / sum of the k readings before the current one
+_FEATURE_PATTERN = re.compile(r"^(?P<base>.+)_(?P<kind>lag|rollmean|rollsum)_(?P<k>\d+)$")
+
+
+def parse_feature(name: str):
+    """(base column, kind, k) for an exog name; kind is 'const', 'raw', 'lag', 'rollmean' or 'rollsum'"""
+    if name == "const":
+        return None, "const", 0
+    match = _FEATURE_PATTERN.match(name)
+    if match is None:
+        return name, "raw", 0
+    k = int(match.group("k"))
+    if match.group("kind") != "lag" and k < 1:
+        raise ValueError(f"Rolling window must be at least 1 reading: {name}")
+    return match.group("base"), match.group("kind"), k
+
+
+def feature_window(names: list) -> int:
+    """How many readings back the given features reach"""
+    return max((parse_feature(name)[2] for name in names), default=0)
+
+
+def _feature_values(values: np.ndarray, kind: str, k: int) -> np.ndarray:
+    """A feature at every position of `values`.
+
+    Positions before the start of the series fall back to its first reading,
+    so `values` must either start at the first reading or at least `k` rows
+    before the first position that is used.
+    """
+    if kind == "raw":
+        return values
+    positions = np.arange(len(values))
+    if kind == "lag":
+        return values[np.maximum(positions - k, 0)]
+
+    previous = np.concatenate([values[:1], values[:-1]])
+    cumsum = np.concatenate([[0.0], np.cumsum(previous)])
+    lo = np.maximum(positions - k + 1, 0)
+    sums = cumsum[positions + 1] - cumsum[lo]
+    if kind == "rollsum":
+        return sums
+    return sums / (positions + 1 - lo)
+
+
+def compute_features(df: pd.DataFrame, names: list, start: int = 0, stop: int = None) -> np.ndarray:
+    """Exog rows for positions [start, stop) of `df`, one column per name.
+
+    Positions past the last row hold the environment at its last reading, so
+    `stop` may run into the forecast horizon. Only the rows the features need
+    are read, which keeps incremental and future blocks cheap.
+    """
+    n = len(df)
+    stop = n if stop is None else stop
+    seg_start = max(0, start - feature_window(names))
+    seg_stop = min(stop, n)
+    out = np.empty((stop - start, len(names)))
+
+    for j, name in enumerate(names):
+        base, kind, k = parse_feature(name)
+        if kind == "const":
+            out[:, j] = 1.0
+            continue
+        if base not in df:
+            out[:, j] = 0.0
+            continue
+
+        values = df[base].to_numpy()
+        segment = values[seg_start:seg_stop].astype(float)
+        if stop > n:
+            segment = np.concatenate([segment, np.full(stop - max(n, seg_start), float(values[-1]))])
+        out[:, j] = _feature_values(segment, kind, k)[start - seg_start:]
+    return out
+
+
+def held_features(df: pd.DataFrame, names: list, origins: np.ndarray, horizon: int) -> np.ndarray:
+    """Future exog for many forecast origins at once, shaped (origins, horizon, names).
+
+    Row [i, j] is what `compute_features(df.iloc[:t + 1], names, t + 1, t + 2 + j)`
+    gives for t = origins[i]: readings after the origin are held at its value.
+    """
+    origins = np.asarray(origins)
+    t = origins[:, None]
+    positions = t + np.arange(1, horizon + 1)
+    out = np.empty((len(origins), horizon, len(names)))
+
+    for j, name in enumerate(names):
+        base, kind, k = parse_feature(name)
+        if kind == "const":
+            out[:, :, j] = 1.0
+            continue
+        if base not in df:
+            out[:, :, j] = 0.0
+            continue
+
+        values = df[base].to_numpy(dtype=float)
+        if kind == "raw":
+            out[:, :, j] = values[t]
+        elif kind == "lag":
+            out[:, :, j] = values[np.minimum(np.maximum(positions - k, 0), t)]
+        else:
+            # Same windows as _feature_values: reading q - 1 for q in (p - k, p], clipped to the origin
+            window = positions[:, :, None] - k + 1 + np.arange(k)
+            covered = window >= 0
+            previous = values[np.minimum(np.maximum(window - 1, 0), t[:, :, None])]
+            sums = np.where(covered, previous, 0.0).sum(axis=2)
+            out[:, :, j] = sums if kind == "rollsum" else sums / covered.sum(axis=2)
+    return out
+
+
+class _CropFeatures:
+    def __init__(self):
+        self.rows = 0
+        self.first_time = None
+        self.last_time = None
+        self.columns = {}
+
+    def continues(self, timestamps: pd.Series) -> bool:
+        """Whether `timestamps` is this series with (possibly) more rows appended"""
+        if self.rows == 0:
+            return True
+        return (
+            len(timestamps) >= self.rows
+            and timestamps.iloc[0] == self.first_time
+            and timestamps.iloc[self.rows - 1] == self.last_time
+        )
+
+
+class FeatureStore:
+    """Exog features per crop, computed once over the whole series and extended as rows arrive.
+
+    Columns are derived the first time a model asks for them. When the frame
+    passed in is the cached one with rows appended, only the new rows are
+    computed; any other change to the data rebuilds the crop.
+    """
+
+    def __init__(self):
+        self._crops = {}
+        self._locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def _crop_lock(self, crop: str):
+        with self._lock:
+            return self._locks[crop]
+
+    def _refresh(self, crop: str, df: pd.DataFrame, names: list) -> _CropFeatures:
+        timestamps = df["Timestamp"]
+        state = self._crops.get(crop)
+        if state is None or not state.continues(timestamps):
+            state = self._crops[crop] = _CropFeatures()
+
+        n = len(df)
+        if state.columns and state.rows < n:
+            existing = list(state.columns)
+            block = compute_features(df, existing, state.rows, n)
+            for j, name in enumerate(existing):
+                state.columns[name].append(block[:, j])
+
+        missing = list(dict.fromkeys(name for name in names if name not in state.columns))
+        if missing:
+            block = compute_features(df, missing)
+            for j, name in enumerate(missing):
+                state.columns[name] = Column(np.ascontiguousarray(block[:, j]))
+
+        state.rows = n
+        if n:
+            state.first_time, state.last_time = timestamps.iloc[0], timestamps.iloc[-1]
+        return state
+
+    def matrix(self, crop: str, df: pd.DataFrame, names: list, start: int = 0, stop: int = None) -> np.ndarray:
+        """Exog rows [start, stop) of `crop`; rows from len(df) on are forecast steps"""
+        n = len(df)
+        stop = n if stop is None else stop
+        observed = max(min(stop, n) - start, 0)
+        out = np.empty((stop - start, len(names)))
+
+        with self._crop_lock(crop):
+            state = self._refresh(crop, df, names)
+            for j, name in enumerate(names):
+                out[:observed, j] = state.columns[name][start:start + observed]
+
+        if stop > n:
+            out[observed:] = compute_features(df, names, max(start, n), stop)
+        return out
+
+    def reset(self, crop: str = None):
+        with self._lock:
+            for key in [k for k in list(self._crops) if crop is None or k == crop]:
+                self._crops.pop(key, None)
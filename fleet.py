@@ -0,0 +1,78 @@
+import streamlit as st
+import pandas as pd
+from config import crop_name
+from crossing import HIGH, LOW
+from dashboard import get_service
+from styles import apply_page_style
+
+horizons = {
+    '3 days': 96 * 3,
+    '7 days': 96 * 7,
+    '14 days': 96 * 14,
+    '28 days': 96 * 28,
+}
+
+status_labels = {
+    'below': '🔴 Below threshold',
+    'crossing': '🟠 Expected to cross',
+    'watch': '🟡 Could cross',
+    'clear': '🟢 Clear',
+}
+
+crop_labels = {key: label for label, key, _ in crop_name}
+
+def show_fleet():
+    apply_page_style()
+    col1, col2 = st.columns([1, 4])
+
+    with col1:
+        if st.button("🏠 Back to Home", key="home_btn_fleet"):
+            st.session_state.current_page = "home"
+            st.session_state.page = "home"
+            st.rerun()
+
+    with col2:
+        st.markdown("""
+        <div class="main-header">
+            <h1>⏳ Threshold Outlook</h1>
+            <p>Which crop and nutrient needs attention first</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    horizon_label = st.radio("Look ahead", list(horizons), index=2, horizontal=True, key="fleet_horizon")
+
+    # Cached per model version and newest reading, so a rerun only recomputes series with new data
+    crossings, errors = get_service().crossings(horizons[horizon_label])
+    for (crop, nutrient), error in errors.items():
+        series = crop_labels.get(crop, crop) + (f" {nutrient}" if nutrient else "")
+        st.warning(f"⚠️ No outlook for {series}: {error}")
+    if not crossings:
+        st.info("No nutrient models available")
+        return
+
+    st.dataframe(fleet_table(crossings), use_container_width=True, hide_index=True)
+    st.caption(f"Expected is when the forecast mean drops below the threshold; the range runs from a "
+               f"{LOW:.0%} to a {HIGH:.0%} chance of being below it. Every 15-minute step over {horizon_label} "
+               f"is checked. Sorted by urgency; click a column to sort by it.")
+
+def fleet_table(crossings):
+    rows = []
+    for c in crossings:
+        rows.append({
+            'Crop': crop_labels.get(c.crop, c.crop),
+            'Nutrient': c.nutrient,
+            'Status': status_labels[c.status],
+            'Hours to crossing': c.hours_until(c.expected),
+            'Expected': c.expected,
+            'Earliest': c.earliest,
+            'Latest': c.latest,
+            'Latest reading': c.last_value,
+            'Forecast min': c.forecast_min,
+            'Threshold': c.threshold,
+            'Reading time': c.last_time,
+        })
+    # Timestamps and hours stay numeric so the columns sort properly; missing ones mean not within the horizon
+    table = pd.DataFrame(rows)
+    for column in ['Expected', 'Earliest', 'Latest', 'Reading time']:
+        table[column] = pd.to_datetime(table[column])
+    return table.round({'Hours to crossing': 1, 'Latest reading': 2, 'Forecast min': 2})
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_ENTRIES = 1024
+# Bounds of the disk tier, enforced by a sweep at most every DISK_SWEEP_INTERVAL seconds
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_DISK_ENTRIES = 4 * DEFAULT_MAX_ENTRIES
+DISK_SWEEP_INTERVAL = 60.0
+
+
+def forecast_key(crop: str, nutrient: str, horizon: int, model_version: str, last_timestamp) -> tuple:
+    """A forecast is fully determined by its model file and the newest reading it saw"""
+    return crop.lower(), nutrient.upper(), int(horizon), model_version, str(last_timestamp)
+
+
+class ForecastCache:
+    """Process-wide forecast results with TTL and LRU size eviction.
+
+    With `disk_dir`, entries are also written there as pickles so they
+    survive restarts; the in-memory tier is checked first. A file's mtime is
+    its last use: expired files are deleted when read or swept, and the
+    sweep then drops the least recently used files beyond the byte and entry caps.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL, disk_dir: str = None,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES, max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.sweep_disk()
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def get(self, key: tuple):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    tracing.count("forecast", hit=True)
+                    return value
+                del self._entries[key]
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                tracing.count("forecast", hit=False)
+                return None
+            self.hits += 1
+            # A hit of the cache as a whole as well as of its disk tier
+            tracing.count("forecast", hit=True)
+            tracing.count("forecast_disk", hit=True)
+            self._insert(key, value, now)
+            return value
+
+    def put(self, key: tuple, value):
+        now = time.time()
+        with self._lock:
+            self._insert(key, value, now)
+        if self.disk_dir:
+            self._write_disk(key, value, now)
+
+    def coalesce(self, key: tuple, start):
+        """The running job for `key`, or a new one from `start()` (which returns a future).
+
+        Concurrent requests for the same forecast share one job; its result is
+        cached when it finishes.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._inflight[key] = start()
+        # Outside the lock: the callback runs right away if the job is already done
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key: tuple, future):
+        # Cancelled or failed jobs are dropped, so the next request for the key starts afresh
+        try:
+            if not future.cancelled() and future.exception() is None and future.result() is not None:
+                self.put(key, future.result())
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    def _insert(self, key: tuple, value, stored_at: float):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: tuple, now: float):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, stored_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        if now - stored_at > self.ttl:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _write_disk(self, key: tuple, value, stored_at: float):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, stored_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        if time.monotonic() - self._last_sweep >= DISK_SWEEP_INTERVAL:
+            self.sweep_disk()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def sweep_disk(self) -> int:
+        """Delete expired disk entries, then the least recently used beyond the caps; returns the number deleted"""
+        if not self.disk_dir or not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_sweep = time.monotonic()
+            now = time.time()
+            files = []
+            for entry in os.scandir(self.disk_dir):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            removed = 0
+            kept = []
+            for mtime, size, path in files:
+                # A file unused for longer than the TTL was also written longer ago than that;
+                # leftover .tmp files from interrupted writes go the same way
+                if now - mtime > self.ttl or (path.endswith(".tmp") and now - mtime > DISK_SWEEP_INTERVAL):
+                    self._remove(path)
+                    removed += 1
+                elif path.endswith(".pkl"):
+                    kept.append((mtime, size, path))
+
+            kept.sort()
+            total, count = sum(size for _, size, _ in kept), len(kept)
+            for _, size, path in kept:
+                if total <= self.max_disk_bytes and count <= self.max_disk_entries:
+                    break
+                self._remove(path)
+                total -= size
+                count -= 1
+                removed += 1
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from forecasting import ForecastResult
+
+STORE_DIR = "forecasts"
+
+_read_cache = {}
+_read_lock = threading.Lock()
+
+
+def store_path(crop: str, store_dir: str = STORE_DIR) -> str:
+    return os.path.join(store_dir, f"{crop.lower()}.npz")
+
+
+def write_crop_forecasts(crop: str, meta: dict, results: dict, store_dir: str = STORE_DIR) -> str:
+    """Write one crop's forecasts as a single .npz: arrays per nutrient plus a JSON meta entry"""
+    os.makedirs(store_dir, exist_ok=True)
+    meta = dict(meta, series={})
+    arrays = {}
+    for nutrient, result in results.items():
+        arrays[f"{nutrient}_values"] = result.values
+        arrays[f"{nutrient}_lower"] = result.lower
+        arrays[f"{nutrient}_upper"] = result.upper
+        arrays[f"{nutrient}_timestamps"] = result.timestamps.asi8
+        meta["series"][nutrient] = {
+            "last_value": result.last_value,
+            "last_time": result.last_time.isoformat(),
+        }
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    path = store_path(crop, store_dir)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_crop_forecasts(crop: str, store_dir: str = STORE_DIR):
+    """(meta, {nutrient: ForecastResult}) for a crop, or None if nothing is stored"""
+    path = store_path(crop, store_dir)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    with _read_lock:
+        cached = _read_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        results = {}
+        for nutrient, series in meta["series"].items():
+            results[nutrient] = ForecastResult(
+                values=data[f"{nutrient}_values"],
+                timestamps=pd.DatetimeIndex(data[f"{nutrient}_timestamps"].astype("datetime64[ns]")),
+                lower=data[f"{nutrient}_lower"],
+                upper=data[f"{nutrient}_upper"],
+                last_value=series["last_value"],
+                last_time=pd.Timestamp(series["last_time"]),
+            )
+
+    with _read_lock:
+        _read_cache[path] = (mtime_ns, (meta, results))
+    return meta, results
+
+
+def stored_forecast(crop: str, nutrient: str, horizon: int, model_version: str, high_water,
+                    store_dir: str = STORE_DIR):
+    """A stored forecast still valid for this model and data, cut to `horizon`, else None"""
+    stored = read_crop_forecasts(crop, store_dir)
+    if stored is None:
+        return None
+    meta, results = stored
+    result = results.get(nutrient)
+    if result is None or result.horizon < horizon:
+        return None
+    if meta["models"].get(nutrient) != model_version or pd.Timestamp(meta["high_water"]) != high_water:
+        return None
+    return result.head(horizon)
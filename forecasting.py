@@ -0,0 +1,112 @@
+from dataclasses import dataclass, replace
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from features import compute_features, feature_window
+
+# Sensor readings arrive every 15 minutes; one forecast step is one reading.
+STEP = timedelta(minutes=15)
+
+
+@dataclass(frozen=True)
+class ForecastResult:
+    """Multi-step forecast for one nutrient series, anchored at its last observation"""
+    values: np.ndarray
+    timestamps: pd.DatetimeIndex
+    lower: np.ndarray
+    upper: np.ndarray
+    last_value: float
+    last_time: pd.Timestamp
+
+    @property
+    def horizon(self) -> int:
+        return len(self.values)
+
+    def with_origin(self):
+        """Times and values prefixed by the last observation, for plotting a continuous line"""
+        times = self.timestamps.insert(0, self.last_time)
+        values = np.concatenate([[self.last_value], self.values])
+        return times, values
+
+    def head(self, steps: int) -> "ForecastResult":
+        return replace(
+            self,
+            values=self.values[:steps],
+            timestamps=self.timestamps[:steps],
+            lower=self.lower[:steps],
+            upper=self.upper[:steps],
+        )
+
+    def below(self, threshold: float) -> bool:
+        return bool(np.any(self.values < threshold))
+
+
+def system_matrix(ssm, name: str) -> np.ndarray:
+    """A time-invariant state-space matrix (e.g. "transition") without its time axis"""
+    value = ssm[name]
+    if value.ndim == 3:
+        if value.shape[2] != 1:
+            raise ValueError(f"Time-varying {name} is not supported")
+        value = value[:, :, 0]
+    return value
+
+
+def system_vector(ssm, name: str) -> np.ndarray:
+    value = ssm[name]
+    if value.ndim == 2:
+        if value.shape[1] != 1:
+            raise ValueError(f"Time-varying {name} is not supported")
+        value = value[:, 0]
+    return value
+
+
+def build_future_exog(df_env: pd.DataFrame, exog_names: list, steps: int) -> pd.DataFrame:
+    """Exog rows for the next `steps` readings, holding the environment at its last value"""
+    n = len(df_env)
+    return pd.DataFrame(compute_features(df_env, exog_names, n, n + steps), columns=list(exog_names))
+
+
+def build_exog_matrix(df: pd.DataFrame, exog_names: list) -> pd.DataFrame:
+    """Exog rows aligned with the observed rows of `df` (row t holds the lags as of t)"""
+    return pd.DataFrame(compute_features(df, exog_names), columns=list(exog_names), index=df.index)
+
+
+def future_timestamps(last_time, steps: int, step: timedelta = STEP) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex([last_time + step * (i + 1) for i in range(steps)])
+
+
+def forecast_context(model, df: pd.DataFrame) -> pd.DataFrame:
+    """The trailing rows a forecast reads, small enough to ship to a worker process"""
+    exog_names = getattr(model.model, "exog_names", None) or []
+    return df.iloc[-max(feature_window(exog_names), 1):]
+
+
+def forecast_nutrient(model, df: pd.DataFrame, nutrient: str, horizon: int = 12,
+                      alpha: float = 0.05, exog: pd.DataFrame = None) -> ForecastResult:
+    """Forecast `horizon` readings ahead with a single `get_forecast` call.
+
+    `exog` is the future exog block if the caller already has it (e.g. from a
+    FeatureStore); otherwise it is derived from the trailing rows of `df`.
+    """
+    exog_names = getattr(model.model, "exog_names", None) or []
+    context = forecast_context(model, df) if exog is None else df.iloc[-1:]
+    if exog is None and exog_names:
+        exog = build_future_exog(context, exog_names, horizon)
+
+    with tracing.span("get_forecast"):
+        forecast = model.get_forecast(steps=horizon, exog=exog)
+    values = np.asarray(forecast.predicted_mean, dtype=float)
+    conf_int = np.asarray(forecast.conf_int(alpha=alpha), dtype=float)
+
+    last_time = context['Timestamp'].iloc[-1]
+    return ForecastResult(
+        values=values,
+        timestamps=future_timestamps(last_time, horizon),
+        lower=conf_int[:, 0],
+        upper=conf_int[:, 1],
+        last_value=float(context[nutrient].iloc[-1]),
+        last_time=last_time,
+    )
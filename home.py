@@ -1,7 +1,5 @@
 import streamlit as st
-import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
 
 def show_home_page():
     """Display the home page of the Predictive Care application"""
@@ -245,6 +243,12 @@ def show_home_page():
         if st.button("🚀 Go to Dashboard", type="primary", use_container_width=True, key="animated_dashboard_btn"):
             st.session_state.current_page = "Dashboard"
             st.rerun()
+        if st.button("📊 Compare Crops", use_container_width=True, key="compare_btn"):
+            st.session_state.current_page = "Comparison"
+            st.rerun()
+        if st.button("⏳ Threshold Outlook", use_container_width=True, key="fleet_btn"):
+            st.session_state.current_page = "Fleet"
+            st.rerun()
     
     # Recent Activity Section
     # st.markdown("## 📋 Recent System Activity")
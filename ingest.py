@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from data_cache import extend_hasher, load_bundle_with_meta, prefix_hasher, read_header, read_rows_from
+from datasets import Dataset
+
+_append_lock = threading.Lock()
+
+
+def format_timestamp(ts: pd.Timestamp) -> str:
+    # Same unpadded layout as the existing files, e.g. 1/1/2024 0:15
+    return f"{ts.month}/{ts.day}/{ts.year} {ts.hour}:{ts.minute:02d}"
+
+
+def append_readings(csv_path: str, readings) -> int:
+    """Append one reading (dict) or a batch (list of dicts / DataFrame) to a crop CSV.
+
+    Rows are written in the file's own column order. Returns the number of rows written.
+    """
+    if isinstance(readings, dict):
+        readings = [readings]
+    batch = pd.DataFrame(readings)
+    if batch.empty:
+        return 0
+
+    columns = read_header(csv_path)
+    missing = set(columns) - set(batch.columns)
+    if missing:
+        raise ValueError(f"Readings are missing columns: {sorted(missing)}")
+
+    batch = batch[columns].copy()
+    batch["Timestamp"] = pd.to_datetime(batch["Timestamp"]).map(format_timestamp)
+    lines = batch.to_csv(header=False, index=False, lineterminator="\n", float_format="%.10g")
+
+    with _append_lock, open(csv_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(lines.encode())
+    return len(batch)
+
+
+class TailReader:
+    """A crop frame that follows its CSV, parsing only bytes appended since the last read"""
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        frame, meta = load_bundle_with_meta(self.csv_path)
+        self.dataset = Dataset(frame)
+        self.columns = list(frame.columns)
+        self.offset = meta["size"]
+        self._mtime = meta["mtime_ns"]
+        # Digest of the first `offset` bytes, to tell appends from in-place edits
+        self._digest = meta["sha256"]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        # A read-only view shared by every caller; appends never change it in place
+        return self.dataset.frame
+
+    @property
+    def high_water(self):
+        frame = self.frame
+        return frame["Timestamp"].iloc[-1] if len(frame) else None
+
+    def unchanged(self) -> bool:
+        """Whether the file still has the size and mtime it had when last read"""
+        stat = os.stat(self.csv_path)
+        return stat.st_size == self.offset and stat.st_mtime_ns == self._mtime
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            stat = os.stat(self.csv_path)
+            if stat.st_size == self.offset and stat.st_mtime_ns == self._mtime:
+                return self.frame
+
+            # Size or mtime changed: only a file whose first `offset` bytes are intact was appended to
+            hasher = prefix_hasher(self.csv_path, self.offset) if stat.st_size >= self.offset else None
+            if hasher is None or hasher.hexdigest() != self._digest:
+                # Truncated or rewritten, possibly in place at the same size
+                self._reload()
+                return self.frame
+
+            high_water = self.high_water
+            start = self.offset
+            tail, self.offset = read_rows_from(self.csv_path, start, self.columns)
+            self._digest = extend_hasher(hasher, self.csv_path, start, self.offset).hexdigest()
+            self._mtime = stat.st_mtime_ns
+            if not tail.empty:
+                if high_water is not None and tail["Timestamp"].min() < high_water:
+                    frame = pd.concat([self.frame, tail], ignore_index=True)
+                    self.dataset = Dataset(frame.sort_values("Timestamp", kind="stable", ignore_index=True))
+                else:
+                    self.dataset.append(tail)
+            return self.frame
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python ingest.py data/<crop>.csv <new_readings.csv>")
+    written = append_readings(sys.argv[1], pd.read_csv(sys.argv[2]))
+    print(f"Appended {written} readings to {sys.argv[1]}")
@@ -0,0 +1,472 @@
+"""Socket ingest of live sensor readings into in-memory ring buffers.
+
+    python live_ingest.py serve [--port 9750] [--flush-interval 5]
+    python live_ingest.py simulate [--speedup 900] [--rows 2880] [--udp] [--flush]
+
+Readings are text lines, one per reading, over TCP or UDP on the same port:
+
+    <crop>,<Timestamp>,<N>,<P>,<K>,<pH>,...
+
+with the values in the column order of data/<crop>.csv and the timestamp in
+its format (ISO 8601 is accepted too). Each crop has a fixed-size ring
+buffer that is seeded with the newest persisted readings. Buffered
+readings are appended to the crop CSV (or its partitions, once migrated) in
+batches, where the dashboard's feed picks them up.
+
+`simulate` replays the crop CSVs through a local server at a speed-up of
+real time (0 = as fast as possible). It reports readings/sec and the
+latency from send to the reading being visible in its buffer.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import crop_name
+from data_cache import TIMESTAMP_FORMAT
+from forecasting import STEP
+from partitions import append_crop_readings, crop_columns, load_crop_frame
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9750
+# About 85 days of 15-minute readings
+DEFAULT_CAPACITY = 8192
+FLUSH_INTERVAL = 5.0
+# Flush early once this many readings of a crop are waiting
+FLUSH_ROWS = 1024
+
+
+class RingBuffer:
+    """The newest `capacity` readings of one crop in preallocated NumPy arrays.
+
+    Every row is written twice, at `i` and `i + capacity`, so any run of up
+    to `capacity` consecutive readings is one contiguous slice and windows
+    are returned as read-only views rather than copies. A view stays valid
+    until `capacity` more readings have arrived.
+    """
+
+    def __init__(self, columns: list, capacity: int = DEFAULT_CAPACITY):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.written = 0
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._received = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = {column: np.zeros(2 * capacity) for column in self.columns}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    @property
+    def newest(self):
+        """Timestamp (ns) of the newest reading, or None while empty"""
+        with self._lock:
+            return self._newest()
+
+    def _newest(self):
+        return int(self._times[(self.written - 1) % self.capacity]) if self.written else None
+
+    def extend(self, times: np.ndarray, values: np.ndarray, received_ns: int = 0) -> int:
+        """Append readings (int64 ns times, one row of `values` per column set).
+
+        Readings not newer than everything before them are dropped, which keeps
+        the buffer sorted. Returns the number accepted.
+        """
+        with self._lock:
+            newest = self._newest()
+            floor = np.maximum.accumulate(np.concatenate([[newest if newest is not None else np.iinfo(np.int64).min], times]))
+            keep = times > floor[:-1]
+            times, values = times[keep], values[keep]
+            if len(times) > self.capacity:
+                times, values = times[-self.capacity:], values[-self.capacity:]
+
+            positions = (self.written + np.arange(len(times))) % self.capacity
+            for offset in (0, self.capacity):
+                self._times[positions + offset] = times
+                self._received[positions + offset] = received_ns
+                for j, column in enumerate(self.columns):
+                    self._values[column][positions + offset] = values[:, j]
+            self.written += len(times)
+            return len(times)
+
+    def _span(self, first: int, last: int) -> slice:
+        start = first % self.capacity
+        return slice(start, start + last - first)
+
+    def rows(self, first: int, last: int) -> dict:
+        """Readings with logical indices [first, last), which must still be buffered"""
+        if last - first > self.capacity or first < self.written - self.capacity:
+            raise IndexError("Readings were overwritten before they were read")
+        span = self._span(first, last)
+        out = {"Timestamp": self._times[span], "received_ns": self._received[span]}
+        out.update({column: values[span] for column, values in self._values.items()})
+        for view in out.values():
+            view.flags.writeable = False
+        return out
+
+    def window(self, start_ns: int = None) -> dict:
+        """Buffered readings with Timestamp >= start_ns, as read-only views"""
+        with self._lock:
+            last = self.written
+        first = last - min(last, self.capacity)
+        if start_ns is not None and last > first:
+            times = self._times[self._span(first, last)]
+            first += int(np.searchsorted(times, start_ns, side="left"))
+        return self.rows(first, last)
+
+
+class LiveStore:
+    """Ring buffers for every crop plus the bookkeeping for batched flushes"""
+
+    def __init__(self, crops: list, capacity: int = DEFAULT_CAPACITY, flush: bool = True):
+        self.capacity = capacity
+        self.flush_enabled = flush
+        self.buffers = {}
+        self._flushed = {}
+        self.stats = {"received": 0, "accepted": 0, "late": 0, "malformed": 0, "flushed": 0, "lost": 0,
+                      "flush_errors": 0}
+        # Called with no arguments after a flush wrote readings, e.g. AlertEvaluator.notify
+        self.flush_listeners = []
+        for crop in crops:
+            self._seed(crop)
+
+    def _seed(self, crop: str):
+        try:
+            columns = [c for c in crop_columns(crop) if c != "Timestamp"]
+            df = load_crop_frame(crop).iloc[-self.capacity:]
+        except OSError as e:
+            print(f"live ingest: skipping {crop}: {e}", file=sys.stderr)
+            return
+        buffer = RingBuffer(columns, self.capacity)
+        times = df["Timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        buffer.extend(times, df[columns].to_numpy(dtype=float))
+        self.buffers[crop] = buffer
+        # Seeded readings are already on disk
+        self._flushed[crop] = buffer.written
+
+    def ingest(self, crop: str, times: np.ndarray, values: np.ndarray, received_ns: int) -> int:
+        accepted = self.buffers[crop].extend(times, values, received_ns)
+        self.stats["received"] += len(times)
+        self.stats["accepted"] += accepted
+        self.stats["late"] += len(times) - accepted
+        return accepted
+
+    def pending(self, crop: str) -> int:
+        return self.buffers[crop].written - self._flushed[crop]
+
+    def latest(self, crop: str):
+        """Newest buffered reading as a Series, or None"""
+        buffer = self.buffers.get(crop)
+        if buffer is None or not len(buffer):
+            return None
+        row = buffer.rows(buffer.written - 1, buffer.written)
+        out = {column: row[column][0] for column in buffer.columns}
+        return pd.Series({"Timestamp": pd.Timestamp(int(row["Timestamp"][0])), **out})
+
+    def window_frame(self, crop: str, duration) -> pd.DataFrame:
+        """Readings within `duration` of the newest one, or None if the buffer does not reach that far back"""
+        buffer = self.buffers.get(crop)
+        newest = buffer.newest if buffer is not None else None
+        if newest is None:
+            return None
+        start_ns = newest - pd.Timedelta(duration).value
+        if buffer.window()["Timestamp"][0] > start_ns:
+            return None
+        window = buffer.window(start_ns)
+        frame = {"Timestamp": window["Timestamp"].view("datetime64[ns]")}
+        frame.update({column: window[column] for column in buffer.columns})
+        return pd.DataFrame(frame, copy=False)
+
+    def flush(self, crop: str = None) -> int:
+        """Append unflushed readings to the crop CSVs; returns the number written"""
+        if not self.flush_enabled:
+            return 0
+        written = 0
+        for key in [crop] if crop else list(self.buffers):
+            buffer = self.buffers[key]
+            last = buffer.written
+            first = max(self._flushed[key], last - buffer.capacity)
+            self.stats["lost"] += first - self._flushed[key]
+            if first >= last:
+                continue
+            rows = buffer.rows(first, last)
+            batch = pd.DataFrame({"Timestamp": pd.to_datetime(rows["Timestamp"])})
+            for column in buffer.columns:
+                batch[column] = rows[column]
+            written += append_crop_readings(key, batch)
+            self._flushed[key] = last
+        self.stats["flushed"] += written
+        if written:
+            for listener in self.flush_listeners:
+                listener()
+        return written
+
+
+def parse_timestamp(text: str) -> int:
+    try:
+        moment = datetime.strptime(text, TIMESTAMP_FORMAT)
+    except ValueError:
+        moment = datetime.fromisoformat(text)
+    return np.datetime64(moment, "ns").astype(np.int64)
+
+
+def format_line(crop: str, timestamp: pd.Timestamp, values) -> str:
+    fields = [crop, f"{timestamp.month}/{timestamp.day}/{timestamp.year} {timestamp.hour}:{timestamp.minute:02d}"]
+    fields += [f"{value:.10g}" for value in values]
+    return ",".join(fields) + "\n"
+
+
+class IngestServer:
+    """TCP and UDP listeners feeding a LiveStore, with a periodic flush"""
+
+    def __init__(self, store: LiveStore, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.ready = threading.Event()
+        self._loop = None
+        self._stopping = None
+
+    def handle_lines(self, lines):
+        """Parse and buffer raw lines (bytes); undecodable or malformed ones are counted and skipped"""
+        received_ns = time.perf_counter_ns()
+        parsed = {}
+        for line in lines:
+            try:
+                fields = line.decode().strip().split(",")
+            except UnicodeDecodeError:
+                self.store.stats["malformed"] += 1
+                continue
+            if not fields[0]:
+                continue
+            buffer = self.store.buffers.get(fields[0])
+            try:
+                if buffer is None or len(fields) != len(buffer.columns) + 2:
+                    raise ValueError(line)
+                row = (parse_timestamp(fields[1]), [float(value) for value in fields[2:]])
+            except ValueError:
+                self.store.stats["malformed"] += 1
+                continue
+            parsed.setdefault(fields[0], []).append(row)
+
+        for crop, rows in parsed.items():
+            times = np.fromiter((t for t, _ in rows), dtype=np.int64, count=len(rows))
+            values = np.array([v for _, v in rows], dtype=float)
+            self.store.ingest(crop, times, values, received_ns)
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        remainder = b""
+        try:
+            while chunk := await reader.read(65536):
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop()
+                self.handle_lines(lines)
+            if remainder:
+                self.handle_lines([remainder])
+        finally:
+            writer.close()
+
+    async def _flush_periodically(self):
+        loop = asyncio.get_running_loop()
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(min(self.flush_interval, 0.5))
+            elapsed += min(self.flush_interval, 0.5)
+            due = elapsed >= self.flush_interval
+            if due or any(self.store.pending(crop) >= FLUSH_ROWS for crop in self.store.buffers):
+                elapsed = 0.0
+                try:
+                    # File appends block, so keep them off the event loop
+                    await loop.run_in_executor(None, self.store.flush)
+                except Exception as e:
+                    # Unflushed readings stay buffered and are retried on the next pass
+                    self.store.stats["flush_errors"] += 1
+                    print(f"live ingest: flush failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def serve(self):
+        server = self
+
+        class Datagrams(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                server.handle_lines(data.splitlines())
+
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._stopping = asyncio.Event()
+        tcp = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        udp, _ = await loop.create_datagram_endpoint(Datagrams, local_addr=(self.host, self.port))
+        flusher = asyncio.create_task(self._flush_periodically())
+        self.ready.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            flusher.cancel()
+            udp.close()
+            tcp.close()
+            await tcp.wait_closed()
+            await loop.run_in_executor(None, self.store.flush)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def start_in_thread(self) -> "IngestServer":
+        """Serve from a daemon thread (e.g. inside the Streamlit process)"""
+        threading.Thread(target=asyncio.run, args=(self.serve(),), name="live-ingest", daemon=True).start()
+        if not self.ready.wait(10):
+            raise RuntimeError(f"Live ingest did not start on {self.host}:{self.port}")
+        return self
+
+
+def start_ingest_server(port: int = DEFAULT_PORT, host: str = DEFAULT_HOST, flush_interval: float = FLUSH_INTERVAL,
+                        capacity: int = DEFAULT_CAPACITY) -> IngestServer:
+    store = LiveStore([key for _, key, _ in crop_name], capacity)
+    return IngestServer(store, host, port, flush_interval).start_in_thread()
+
+
+async def _replay_crop(server: IngestServer, crop: str, rows: int, speedup: float, udp: bool):
+    """Send `rows` readings of the crop CSV, rebased after its newest buffered one.
+
+    Returns the first replayed timestamp and the send time of every reading (ns).
+    """
+    buffer = server.store.buffers[crop]
+    df = load_crop_frame(crop)
+    source = df.iloc[np.arange(rows) % len(df)]
+    # Consecutive 15-minute readings continuing from the buffer, whatever the source timestamps
+    start = pd.Timestamp(buffer.newest) + STEP
+    timestamps = pd.date_range(start, periods=rows, freq=STEP)
+    values = source[buffer.columns].to_numpy(dtype=float)
+    interval = STEP.total_seconds() / speedup if speedup else 0.0
+
+    loop = asyncio.get_running_loop()
+    if udp:
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(server.host, server.port))
+        send = lambda data: transport.sendto(data)  # noqa: E731
+    else:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        send = writer.write
+
+    sent = np.empty(rows, dtype=np.int64)
+    began = time.perf_counter()
+    for i in range(rows):
+        if interval:
+            delay = began + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        sent[i] = time.perf_counter_ns()
+        send(format_line(crop, timestamps[i], values[i]).encode())
+        if not udp and i % 256 == 255:
+            await writer.drain()
+        elif udp and not interval and i % 16 == 15:
+            # Give the receiving side a chance to drain the socket buffer
+            await asyncio.sleep(0)
+
+    if udp:
+        transport.close()
+    else:
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    return start.value, sent
+
+
+async def simulate(crops: list, rows: int, speedup: float, udp: bool = False, flush: bool = False,
+                   port: int = 0) -> dict:
+    """Replay crop CSVs through a local server and measure throughput and latency"""
+    store = LiveStore(crops, flush=flush)
+    crops = [crop for crop in crops if crop in store.buffers]
+    server = IngestServer(store, port=port or _free_port())
+    serving = asyncio.create_task(server.serve())
+    while not server.ready.is_set():
+        await asyncio.sleep(0.01)
+
+    began = time.perf_counter()
+    replays = dict(zip(crops, await asyncio.gather(*(_replay_crop(server, crop, rows, speedup, udp) for crop in crops))))
+    # Wait for readings still in flight, until none have arrived for a moment (UDP may drop some)
+    seen, quiet_since = -1, time.perf_counter()
+    while store.stats["received"] + store.stats["malformed"] < rows * len(crops):
+        if store.stats["received"] != seen:
+            seen, quiet_since = store.stats["received"], time.perf_counter()
+        elif time.perf_counter() - quiet_since > 0.2:
+            break
+        await asyncio.sleep(0.01)
+
+    latencies, last_received = [], 0
+    for crop, (start_ns, sent) in replays.items():
+        window = store.buffers[crop].window(start_ns)
+        # Match readings to their send times by timestamp, since datagrams can be lost
+        index = (window["Timestamp"] - start_ns) // int(STEP.total_seconds() * 1e9)
+        latencies.append(window["received_ns"] - sent[index])
+        if len(index):
+            last_received = max(last_received, int(window["received_ns"][-1]))
+    elapsed = (last_received / 1e9 - began) if last_received else time.perf_counter() - began
+
+    server.stop()
+    await serving
+    latencies = np.concatenate(latencies) / 1e6 if latencies else np.empty(0)
+    return {
+        "protocol": "udp" if udp else "tcp",
+        "crops": crops,
+        "speedup": speedup,
+        "sent": rows * len(crops),
+        **store.stats,
+        "dropped": rows * len(crops) - store.stats["received"] - store.stats["malformed"],
+        "seconds": round(elapsed, 3),
+        "readings_per_sec": round(store.stats["accepted"] / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            f"p{q}": round(float(np.percentile(latencies, q)), 3) for q in (50, 90, 99)
+        } if len(latencies) else None,
+    }
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind((DEFAULT_HOST, 0))
+        return s.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live sensor ingest over TCP/UDP")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="accept readings and flush them to the crop CSVs")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL, help="seconds")
+    serve.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="readings buffered per crop")
+
+    sim = commands.add_parser("simulate", help="replay the crop CSVs through a local server")
+    sim.add_argument("--crops", nargs="*", default=[key for _, key, _ in crop_name])
+    sim.add_argument("--rows", type=int, default=2880, help="readings per crop")
+    sim.add_argument("--speedup", type=float, default=0.0, help="multiple of real time; 0 = unpaced")
+    sim.add_argument("--udp", action="store_true", help="send datagrams instead of a TCP stream")
+    sim.add_argument("--flush", action="store_true", help="also append the replayed readings to the crop CSVs")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        store = LiveStore([key for _, key, _ in crop_name], args.capacity)
+        server = IngestServer(store, args.host, args.port, args.flush_interval)
+        print(f"Listening for readings on {args.host}:{args.port} (tcp+udp)", file=sys.stderr)
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    report = asyncio.run(simulate(args.crops, args.rows, args.speedup, args.udp, args.flush))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,15 @@
+import importlib
+
 import streamlit as st
-from home import show_home_page  # Import your home page function
-from dashboard import show_dashboard  # Import your dashboard function
+
+# Page name -> (module, render function). A page's module is imported the
+# first time it is shown, so the home page never loads the dashboard's stack.
+PAGES = {
+    "Home": ("home", "show_home_page"),
+    "Dashboard": ("dashboard", "show_dashboard"),
+    "Comparison": ("comparison", "show_comparison"),
+    "Fleet": ("fleet", "show_fleet"),
+}
 
 # Page configuration
 st.set_page_config(
@@ -18,17 +27,22 @@ if 'current_page' not in st.session_state:
 if 'page' not in st.session_state:
     st.session_state.page = "home"
 
+def render_page(name):
+    module_name, function_name = PAGES.get(name, PAGES["Home"])
+    getattr(importlib.import_module(module_name), function_name)()
+
+def current_page_name():
+    """The PAGES entry to show; unknown names (and the lowercase "home" set by Back buttons) go home"""
+    current_page = st.session_state.get('current_page', 'Home')
+    # The older 'page' state still opens the dashboard
+    if st.session_state.get('page', 'home') == "dashboard":
+        return "Dashboard"
+    names = {name.lower(): name for name in PAGES}
+    return names.get(str(current_page).lower(), "Home")
+
 # Navigation logic
 def main():
-    # Check both session state variables for navigation
-    current_page = st.session_state.get('current_page', 'Home')
-    page = st.session_state.get('page', 'home')
-    
-    # Normalize page names and navigate accordingly
-    if current_page == "Dashboard" or page == "dashboard":
-        show_dashboard()
-    else:  # Default to home page
-        show_home_page()
+    render_page(current_page_name())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
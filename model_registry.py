@@ -0,0 +1,281 @@
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from data_cache import file_digest
+
+MODEL_DIR = "model"
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_PICKLE_PATTERN = re.compile(r"^best_sarima_model_(?P<crop>.+)_(?P<nutrient>[A-Za-z]+)\.pkl$")
+
+# SARIMAX constructor arguments that are kept in an artifact's spec
+_SPEC_KEYS = (
+    "order", "seasonal_order", "trend", "measurement_error", "time_varying_regression",
+    "mle_regression", "enforce_stationarity", "enforce_invertibility",
+    "hamilton_representation", "concentrate_scale", "trend_offset",
+)
+
+
+def normalize_key(crop: str, nutrient: str):
+    return crop.lower(), nutrient.upper()
+
+
+def compact_results(results) -> dict:
+    """Parameters, spec and final filter state of a fitted SARIMAX model.
+
+    The state kept is the one-step prediction for the last observation, along
+    with that observation. Filtering that single row with the stored
+    parameters reproduces the final state of the full results exactly.
+    """
+    model = results.model
+    init_kwds = model._get_init_kwds()
+    if init_kwds.get("simple_differencing") or init_kwds.get("concentrate_scale"):
+        raise ValueError("Only models without simple differencing or a concentrated scale can be compacted")
+
+    spec = {key: init_kwds[key] for key in _SPEC_KEYS}
+    spec["trend_offset"] = init_kwds["trend_offset"] + results.nobs - 1
+    spec["exog_names"] = list(model.exog_names or [])
+    spec["param_names"] = list(model.param_names)
+
+    index = model._index
+    if isinstance(index, pd.DatetimeIndex):
+        spec["last_index"] = {"date": index[-1].isoformat(), "freq": index.freqstr}
+    else:
+        spec["last_index"] = {"position": int(index[-1])}
+
+    return {
+        "version": np.array(ARTIFACT_VERSION),
+        "spec": np.array(json.dumps(spec)),
+        "params": np.asarray(results.params, dtype=float),
+        "state": results.predicted_state[:, -2],
+        "state_cov": results.predicted_state_cov[:, :, -2],
+        "last_endog": np.asarray(model.endog[-1], dtype=float),
+        "last_exog": np.asarray(model.exog[-1], dtype=float) if model.exog is not None else np.empty(0),
+    }
+
+
+def restore_results(artifact):
+    """Rebuild forecast-capable SARIMAX results from a compact artifact"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    spec = json.loads(str(artifact["spec"]))
+    last_index = spec["last_index"]
+    if "date" in last_index:
+        index = pd.DatetimeIndex([pd.Timestamp(last_index["date"])], freq=last_index["freq"])
+    else:
+        index = pd.RangeIndex(last_index["position"], last_index["position"] + 1)
+
+    endog = pd.Series(np.atleast_1d(artifact["last_endog"]), index=index)
+    exog = None
+    if spec["exog_names"]:
+        exog = pd.DataFrame([artifact["last_exog"]], columns=spec["exog_names"], index=index)
+
+    kwargs = {key: spec[key] for key in _SPEC_KEYS}
+    kwargs["order"] = tuple(kwargs["order"])
+    kwargs["seasonal_order"] = tuple(kwargs["seasonal_order"])
+    model = SARIMAX(endog, exog=exog, **kwargs)
+    model.initialize_known(artifact["state"], artifact["state_cov"])
+    return model.filter(pd.Series(artifact["params"], index=spec["param_names"]), cov_type="none")
+
+
+def save_artifact(path: str, results) -> str:
+    """Write a compact artifact and return its sha256"""
+    return write_artifact(path, compact_results(results))
+
+
+def write_artifact(path: str, artifact: dict) -> str:
+    """Write an artifact already made by `compact_results` and return its sha256"""
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **artifact)
+    os.replace(tmp_path, path)
+    return file_digest(path)
+
+
+def load_artifact(path: str):
+    with np.load(path, allow_pickle=False) as data:
+        artifact = {key: data[key] for key in data.files}
+    if int(artifact["version"]) != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported model artifact version in {path}")
+    return restore_results(artifact)
+
+
+def results_nbytes(results) -> int:
+    """Approximate memory held by a results object's arrays"""
+    seen = set()
+    total = 0
+    for owner in (results, results.filter_results, results.model, results.model.ssm):
+        for value in vars(owner).values():
+            if isinstance(value, np.ndarray) and id(value) not in seen:
+                seen.add(id(value))
+                total += value.nbytes
+    return total
+
+
+def scan_pickles(model_dir: str = MODEL_DIR) -> dict:
+    """Legacy best_sarima_model_<crop>_<nutrient>.pkl files, keyed case-insensitively"""
+    found = {}
+    for name in sorted(os.listdir(model_dir)):
+        match = _PICKLE_PATTERN.match(name)
+        if match:
+            found[normalize_key(match.group("crop"), match.group("nutrient"))] = name
+    return found
+
+
+def build_manifest(model_dir: str = MODEL_DIR) -> dict:
+    """Compact every legacy pickle into a versioned artifact and write the manifest"""
+    manifest = read_manifest(model_dir) or {"version": ARTIFACT_VERSION, "models": {}}
+    for (crop, nutrient), name in scan_pickles(model_dir).items():
+        with open(os.path.join(model_dir, name), "rb") as f:
+            results = pickle.load(f)
+        file_name = f"{crop}_{nutrient}.v{ARTIFACT_VERSION}.npz"
+        digest = save_artifact(os.path.join(model_dir, file_name), results)
+        manifest["models"].setdefault(crop, {})[nutrient] = {
+            "file": file_name,
+            "sha256": digest,
+            "source": name,
+        }
+    write_manifest(manifest, model_dir)
+    return manifest
+
+
+def manifest_mtime(model_dir: str = MODEL_DIR):
+    try:
+        return os.stat(os.path.join(model_dir, MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_manifest(model_dir: str = MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest: dict, model_dir: str = MODEL_DIR):
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+class ModelRegistry:
+    """Loads models on demand and keeps the most recently used within a memory budget.
+
+    Names resolve case-insensitively through `model/manifest.json`. Crops not in
+    the manifest fall back to the legacy pickles, which are compacted in
+    memory after loading. A rewritten manifest (e.g. by train.py) is picked
+    up on the next lookup, and models whose file changed are reloaded.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self._loaded = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._manifest_mtime = None
+
+    def entries(self) -> dict:
+        """(crop, nutrient) -> {'file', 'sha256', ...} for every resolvable model"""
+        mtime = manifest_mtime(self.model_dir)
+        if self._entries is None or mtime != self._manifest_mtime:
+            self._manifest_mtime = mtime
+            entries = {}
+            for (crop, nutrient), name in scan_pickles(self.model_dir).items():
+                entries[(crop, nutrient)] = {"file": name, "sha256": None}
+            manifest = read_manifest(self.model_dir) or {"models": {}}
+            for crop, models in manifest["models"].items():
+                for nutrient, entry in models.items():
+                    entries[normalize_key(crop, nutrient)] = entry
+            self._entries = entries
+            self._drop_stale(entries)
+        return self._entries
+
+    def _drop_stale(self, entries: dict):
+        with self._lock:
+            for key, (_, size, file) in list(self._loaded.items()):
+                entry = entries.get(key)
+                if entry is None or entry["file"] != file:
+                    del self._loaded[key]
+                    self._bytes -= size
+
+    def version(self, crop: str, nutrient: str):
+        """Content hash of the model file, or None if there is no model"""
+        entry = self.entries().get(normalize_key(crop, nutrient))
+        if entry is None:
+            return None
+        if entry["sha256"] is None:
+            entry["sha256"] = file_digest(os.path.join(self.model_dir, entry["file"]))
+        return entry["sha256"]
+
+    def get(self, crop: str, nutrient: str):
+        key = normalize_key(crop, nutrient)
+        # Looked up first so a rewritten manifest drops stale models before the cache is checked
+        entry = self.entries().get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                tracing.count("model_registry", hit=True)
+                return self._loaded[key][0]
+
+        tracing.count("model_registry", hit=False)
+        with tracing.span("model_registry.load"):
+            results = self._load(os.path.join(self.model_dir, entry["file"]))
+
+        with self._lock:
+            if key not in self._loaded:
+                size = results_nbytes(results)
+                self._loaded[key] = (results, size, entry["file"])
+                self._bytes += size
+                self._evict()
+            return self._loaded[key][0]
+
+    def _load(self, path: str):
+        if path.endswith(".npz"):
+            return load_artifact(path)
+        with open(path, "rb") as f:
+            results = pickle.load(f)
+        try:
+            return restore_results(compact_results(results))
+        except ValueError:
+            return results
+
+    def _evict(self):
+        # Always keep the entry that was just loaded, even if it alone is over budget
+        while self._bytes > self.max_bytes and len(self._loaded) > 1:
+            _, (_, size, _) = self._loaded.popitem(last=False)
+            self._bytes -= size
+
+    @property
+    def loaded_bytes(self) -> int:
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+            self._bytes = 0
+            self._entries = None
+
+
+if __name__ == "__main__":
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else MODEL_DIR
+    manifest = build_manifest(model_dir)
+    for crop, models in sorted(manifest["models"].items()):
+        for nutrient, entry in sorted(models.items()):
+            print(f"{crop}/{nutrient}: {entry['file']} ({entry['sha256'][:12]})")
@@ -0,0 +1,94 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+import pandas as pd
+
+from features import FeatureStore
+
+
+@dataclass
+class ModelState:
+    base: object
+    results: object
+    last_seen: pd.Timestamp
+    rows_filtered: int = 0
+
+
+def training_end(results, df: pd.DataFrame) -> pd.Timestamp:
+    """Timestamp of the last observation the model was fitted on.
+
+    Date-indexed models carry it directly. Otherwise the model's integer index
+    is taken as row positions in the crop CSV, i.e. a model fitted on the
+    leading `nobs` rows ends at row `nobs - 1`.
+    """
+    index = results.model._index
+    if isinstance(index, pd.DatetimeIndex):
+        return index[-1]
+    position = min(int(index[-1]), len(df) - 1)
+    return df['Timestamp'].iloc[position]
+
+
+def extension_index(results, timestamps: pd.Series) -> pd.Index:
+    """Index continuing the model's own sample, so `extend` keeps exog names and dates"""
+    index = results.model._index
+    if isinstance(index, pd.DatetimeIndex):
+        return pd.DatetimeIndex(timestamps)
+    start = index[-1] + 1 if len(index) else 0
+    return pd.RangeIndex(start, start + len(timestamps))
+
+
+class ModelStateStore:
+    """Keeps each (crop, nutrient) model filtered up to the newest reading it has seen.
+
+    New rows are run through the Kalman filter with the fitted parameters held
+    fixed (`results.extend`), so forecasts start from the latest reading
+    without refitting. Exog rows come from `features`, which can be shared
+    with the forecasting side so each crop's features are computed once.
+    """
+
+    def __init__(self, features: FeatureStore = None):
+        self.features = features or FeatureStore()
+        self._states = {}
+        # One lock per series so different nutrients can be filtered in parallel
+        self._locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks[key]
+
+    def update(self, crop: str, nutrient: str, model, df: pd.DataFrame):
+        key = (crop, nutrient)
+        with self._key_lock(key):
+            state = self._states.get(key)
+            if state is None or state.base is not model:
+                state = ModelState(base=model, results=model, last_seen=training_end(model, df))
+                self._states[key] = state
+
+            timestamps = df['Timestamp']
+            start = int(timestamps.searchsorted(state.last_seen, side='right'))
+            if start >= len(df):
+                return state.results
+
+            index = extension_index(state.results, timestamps.iloc[start:])
+            endog = pd.Series(df[nutrient].iloc[start:].to_numpy(dtype=float), index=index)
+
+            exog_names = getattr(model.model, 'exog_names', None) or []
+            exog = None
+            if exog_names:
+                exog = pd.DataFrame(self.features.matrix(crop, df, exog_names, start), columns=exog_names, index=index)
+
+            state.results = state.results.extend(endog, exog=exog)
+            state.last_seen = timestamps.iloc[-1]
+            state.rows_filtered += len(endog)
+            return state.results
+
+    def get(self, crop: str, nutrient: str):
+        state = self._states.get((crop, nutrient))
+        return state.results if state else None
+
+    def reset(self, crop: str = None):
+        for key in [k for k in list(self._states) if crop is None or k[0] == crop]:
+            with self._key_lock(key):
+                self._states.pop(key, None)
@@ -0,0 +1,440 @@
+"""Crop readings partitioned by crop, sensor plot and month, with a catalog.
+
+    python partitions.py migrate [coffee durian ...] [--plot main] [--force]
+    python partitions.py import <crop> <plot> <readings.csv>
+    python partitions.py scan                  # rebuild the catalog from the files
+    python partitions.py list [crop]
+
+Readings live in data/store/<crop>/<plot>/<YYYY-MM>.csv, each partition in
+the same CSV format as the original one-file-per-crop data and cached as a
+column bundle like any other crop CSV. data/store/catalog.json records every
+partition's row count and min/max timestamp, so a query for a time window or
+a set of plots only opens the partitions that can hold matching readings.
+
+`migrate` splits the existing data/<crop>.csv files into partitions of the
+default plot, copying their lines unchanged, and leaves the originals in
+place. Once a crop is in the catalog, the dashboard, API, ingest and batch
+jobs read and append through the store; crops that are not are still served
+from their single CSV.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import crop_data_path, crop_name
+from data_cache import TIMESTAMP_FORMAT, ensure_bundle, load_bundle, read_header
+from datasets import Dataset
+from ingest import TailReader, append_readings
+
+STORE_DIR = "data/store"
+CATALOG_VERSION = 1
+# The plot that migrated single-file data, and the dashboard's models, belong to
+DEFAULT_PLOT = "main"
+
+
+def month_of(ts) -> str:
+    return f"{ts.year:04d}-{ts.month:02d}"
+
+
+def _empty_frame(columns: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        name: np.empty(0, dtype="datetime64[ns]" if name == "Timestamp" else np.float32) for name in columns
+    })
+
+
+def _slice(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    # Partitions are cached sorted by Timestamp, so a window is two binary searches
+    if start is None and end is None:
+        return df
+    times = df["Timestamp"].to_numpy(dtype="datetime64[ns]")
+    lo = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start).to_datetime64(), side="left"))
+    hi = len(times) if end is None else int(np.searchsorted(times, pd.Timestamp(end).to_datetime64(), side="right"))
+    return df.iloc[lo:hi]
+
+
+class PartitionStore:
+    """The partition files under `root` and their catalog.
+
+    The catalog is re-read whenever its file changes, so readers in other
+    processes see new partitions and stats after the next write. Appends
+    are serialized within a process; like the crop CSVs, a store expects one
+    writing process.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.catalog_path = os.path.join(root, "catalog.json")
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._crops = {}
+        self._partitions = {}
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.catalog_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        catalog = {}
+        if mtime is not None:
+            with open(self.catalog_path) as f:
+                catalog = json.load(f)
+            if catalog.get("version") != CATALOG_VERSION:
+                raise ValueError(f"Unsupported catalog version in {self.catalog_path}")
+        self._crops = catalog.get("crops", {})
+        self._partitions = {}
+        for entry in catalog.get("partitions", []):
+            entry = dict(entry, min_time=pd.Timestamp(entry["min_time"]), max_time=pd.Timestamp(entry["max_time"]))
+            self._partitions[(entry["crop"], entry["plot"], entry["month"])] = entry
+        self._mtime = mtime
+
+    def _save(self):
+        partitions = [
+            dict(entry, min_time=entry["min_time"].isoformat(), max_time=entry["max_time"].isoformat())
+            for _, entry in sorted(self._partitions.items())
+        ]
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.catalog_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "crops": self._crops, "partitions": partitions}, f, indent=1)
+        os.replace(tmp_path, self.catalog_path)
+        self._mtime = os.stat(self.catalog_path).st_mtime_ns
+
+    def path(self, entry: dict) -> str:
+        return os.path.join(self.root, entry["file"])
+
+    def crops(self) -> list:
+        with self._lock:
+            self._load()
+            return sorted(self._crops)
+
+    def has(self, crop: str) -> bool:
+        with self._lock:
+            self._load()
+            return crop in self._crops
+
+    def columns(self, crop: str) -> list:
+        with self._lock:
+            self._load()
+            return list(self._crops[crop]["columns"])
+
+    def plots(self, crop: str) -> list:
+        with self._lock:
+            self._load()
+            return sorted({plot for c, plot, _ in self._partitions if c == crop})
+
+    def partitions(self, crop: str, plots: list = None, start=None, end=None) -> list:
+        """Catalog entries of `crop` that can hold readings in [start, end], by plot and month"""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        with self._lock:
+            self._load()
+            return [
+                entry for (c, plot, _), entry in sorted(self._partitions.items())
+                if c == crop and (plots is None or plot in plots) and entry["rows"]
+                and (start is None or entry["max_time"] >= start) and (end is None or entry["min_time"] <= end)
+            ]
+
+    def read(self, crop: str, start=None, end=None, plots: list = None) -> pd.DataFrame:
+        """Readings of `crop` with start <= Timestamp <= end, sorted by time.
+
+        Only the partitions whose stats overlap the window are loaded. When
+        more than one plot is read, a Plot column says which each row is from.
+        """
+        entries = self.partitions(crop, plots, start, end)
+        multi_plot = len({entry["plot"] for entry in entries}) > 1 or (plots is not None and len(plots) > 1)
+        frames = []
+        for entry in entries:
+            df = _slice(load_bundle(self.path(entry)), start, end)
+            if multi_plot:
+                df = df.assign(Plot=entry["plot"])
+            frames.append(df)
+        if not frames:
+            columns = self.columns(crop) if self.has(crop) else ["Timestamp"]
+            df = _empty_frame(columns)
+            return df.assign(Plot=pd.Series(dtype=object)) if multi_plot else df
+        df = pd.concat(frames, ignore_index=True)
+        if multi_plot:
+            df = df.sort_values("Timestamp", kind="stable", ignore_index=True)
+        return df
+
+    def last(self, crop: str, duration, plots: list = None) -> pd.DataFrame:
+        """Readings within `duration` of the newest one of the selected plots"""
+        entries = self.partitions(crop, plots)
+        if not entries:
+            return self.read(crop, plots=plots)
+        end = max(entry["max_time"] for entry in entries)
+        return self.read(crop, end - pd.Timedelta(duration), end, plots)
+
+    def _record(self, crop: str, plot: str, month: str, path: str, times: pd.Series, rows: int = None):
+        key = (crop, plot, month)
+        entry = self._partitions.get(key)
+        low, high = times.min(), times.max()
+        if entry is None:
+            entry = self._partitions[key] = {
+                "crop": crop, "plot": plot, "month": month,
+                "file": os.path.relpath(path, self.root), "rows": 0, "min_time": low, "max_time": high,
+            }
+        entry["rows"] = entry["rows"] + len(times) if rows is None else rows
+        entry["min_time"] = min(entry["min_time"], low)
+        entry["max_time"] = max(entry["max_time"], high)
+        entry["bytes"] = os.path.getsize(path)
+
+    def _new_partition(self, crop: str, plot: str, month: str, columns: list) -> str:
+        path = os.path.join(self.root, crop, plot, f"{month}.csv")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(",".join(columns) + "\n")
+        return path
+
+    def append(self, crop: str, readings, plot: str = DEFAULT_PLOT) -> int:
+        """Append readings (dict, list of dicts or DataFrame) to the month partitions they fall in"""
+        if isinstance(readings, dict):
+            readings = [readings]
+        batch = pd.DataFrame(readings)
+        if batch.empty:
+            return 0
+        batch["Timestamp"] = pd.to_datetime(batch["Timestamp"])
+        months = batch["Timestamp"].map(month_of)
+
+        written = 0
+        with self._lock:
+            self._load()
+            if crop not in self._crops:
+                self._crops[crop] = {"columns": ["Timestamp"] + [c for c in batch.columns if c != "Timestamp"]}
+            columns = self._crops[crop]["columns"]
+            for month, rows in batch.groupby(months.to_numpy(), sort=True):
+                path = self._new_partition(crop, plot, month, columns)
+                written += append_readings(path, rows)
+                self._record(crop, plot, month, path, rows["Timestamp"])
+            self._save()
+        return written
+
+    def migrate(self, crop: str, source: str, plot: str = DEFAULT_PLOT, force: bool = False) -> list:
+        """Split a single crop CSV into month partitions of `plot`, copying its lines unchanged"""
+        with self._lock:
+            self._load()
+            existing = [key for key in self._partitions if key[:2] == (crop, plot)]
+            if existing and not force:
+                raise ValueError(f"{crop}/{plot} already has {len(existing)} partitions; use --force to replace them")
+
+            with open(source, "rb") as f:
+                header = f.readline()
+                lines = np.array([line if line.endswith(b"\n") else line + b"\n" for line in f if line.strip()],
+                                 dtype=object)
+            columns = header.decode().rstrip("\r\n").split(",")
+            stamps = [line.split(b",", 1)[0].decode() for line in lines]
+            times = pd.Series(pd.to_datetime(stamps, format=TIMESTAMP_FORMAT))
+            months = times.map(month_of).to_numpy()
+
+            for key in existing:
+                os.remove(self.path(self._partitions.pop(key)))
+            self._crops[crop] = {"columns": columns}
+            for month in np.unique(months):
+                picked = months == month
+                path = os.path.join(self.root, crop, plot, f"{month}.csv")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(header)
+                    f.writelines(lines[picked])
+                os.replace(tmp_path, path)
+                self._record(crop, plot, month, path, times[picked], rows=int(picked.sum()))
+            self._save()
+            return self.partitions(crop, [plot])
+
+    def scan(self) -> int:
+        """Rebuild the catalog from the partition files on disk; returns the number found"""
+        with self._lock:
+            self._load()
+            self._crops, self._partitions = {}, {}
+            crops = sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+            for crop in [c for c in crops if os.path.isdir(os.path.join(self.root, c))]:
+                for plot in sorted(os.listdir(os.path.join(self.root, crop))):
+                    directory = os.path.join(self.root, crop, plot)
+                    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+                        if not name.endswith(".csv"):
+                            continue
+                        path = os.path.join(directory, name)
+                        self._crops.setdefault(crop, {"columns": read_header(path)})
+                        times = load_bundle(path)["Timestamp"]
+                        if len(times):
+                            self._record(crop, plot, name[:-len(".csv")], path, times)
+            self._save()
+            return len(self._partitions)
+
+
+class PartitionFeed:
+    """One plot of a crop as a single frame that follows its partitions, like TailReader does a CSV.
+
+    Each partition has its own TailReader. Rows appended to the newest
+    partition, and new partitions after it, are appended to the shared
+    Dataset; a change to any older partition rebuilds the frame.
+    """
+
+    def __init__(self, store: PartitionStore, crop: str, plot: str = DEFAULT_PLOT):
+        self.store = store
+        self.crop = crop
+        self.plot = plot
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _paths(self) -> list:
+        return [self.store.path(entry) for entry in self.store.partitions(self.crop, [self.plot])]
+
+    def _reload(self):
+        self._readers = {path: TailReader(path) for path in self._paths()}
+        frames = [reader.frame for reader in self._readers.values()]
+        frame = pd.concat(frames, ignore_index=True) if frames else _empty_frame(self.store.columns(self.crop))
+        self.dataset = Dataset(frame)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self.dataset.frame
+
+    @property
+    def high_water(self):
+        frame = self.frame
+        return frame["Timestamp"].iloc[-1] if len(frame) else None
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            paths = self._paths()
+            known = list(self._readers)
+            if paths[:len(known)] != known or any(not self._readers[path].unchanged() for path in known[:-1]):
+                self._reload()
+                return self.frame
+
+            tails = []
+            for path in known[-1:] + paths[len(known):]:
+                reader = self._readers.get(path)
+                if reader is None:
+                    reader = self._readers[path] = TailReader(path)
+                    tails.append(reader.frame)
+                    continue
+                dataset, seen = reader.dataset, len(reader.frame)
+                reader.refresh()
+                if reader.dataset is not dataset:
+                    # Rows arrived out of order and the partition was re-sorted
+                    self._reload()
+                    return self.frame
+                tails.append(reader.frame.iloc[seen:])
+
+            tail = pd.concat(tails, ignore_index=True) if tails else None
+            if tail is not None and len(tail):
+                high_water = self.high_water
+                if high_water is not None and tail["Timestamp"].iloc[0] < high_water:
+                    self._reload()
+                else:
+                    self.dataset.append(tail)
+            return self.frame
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root: str = STORE_DIR) -> PartitionStore:
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = PartitionStore(root)
+        return store
+
+
+def crop_feed(crop: str):
+    """A TailReader-like feed of the crop's default plot, or of its single CSV if it is not partitioned"""
+    store = get_store()
+    if store.has(crop):
+        return PartitionFeed(store, crop)
+    return TailReader(crop_data_path(crop))
+
+
+def load_crop_frame(crop: str, start=None, end=None) -> pd.DataFrame:
+    """The crop's default plot (or single CSV), sorted by Timestamp"""
+    store = get_store()
+    if store.has(crop):
+        return store.read(crop, start, end, [DEFAULT_PLOT])
+    return _slice(load_bundle(crop_data_path(crop)), start, end)
+
+
+def crop_columns(crop: str) -> list:
+    store = get_store()
+    return store.columns(crop) if store.has(crop) else read_header(crop_data_path(crop))
+
+
+def append_crop_readings(crop: str, readings, plot: str = DEFAULT_PLOT) -> int:
+    store = get_store()
+    if store.has(crop):
+        return store.append(crop, readings, plot)
+    if plot != DEFAULT_PLOT:
+        raise ValueError(f"{crop} is not partitioned; run `python partitions.py migrate {crop}` to add plots")
+    return append_readings(crop_data_path(crop), readings)
+
+
+def ensure_crop_bundles(crop: str):
+    """Build the column bundles a crop's reads will use, e.g. before starting worker processes"""
+    store = get_store()
+    if store.has(crop):
+        for entry in store.partitions(crop, [DEFAULT_PLOT]):
+            ensure_bundle(store.path(entry))
+    else:
+        ensure_bundle(crop_data_path(crop))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partitioned crop/plot/month storage")
+    parser.add_argument("--root", default=STORE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="split the single crop CSVs into partitions")
+    migrate.add_argument("crops", nargs="*", default=[key for _, key, _ in crop_name])
+    migrate.add_argument("--plot", default=DEFAULT_PLOT)
+    migrate.add_argument("--force", action="store_true", help="replace the plot's existing partitions")
+
+    imported = commands.add_parser("import", help="append a CSV of readings to one plot")
+    imported.add_argument("crop")
+    imported.add_argument("plot")
+    imported.add_argument("csv")
+
+    commands.add_parser("scan", help="rebuild the catalog from the partition files")
+    listing = commands.add_parser("list", help="show the catalog")
+    listing.add_argument("crop", nargs="?")
+    args = parser.parse_args(argv)
+
+    store = PartitionStore(args.root)
+    if args.command == "migrate":
+        for crop in args.crops:
+            source = crop_data_path(crop)
+            try:
+                entries = store.migrate(crop, source, args.plot, args.force)
+            except (OSError, ValueError) as e:
+                print(f"{crop}: {e}", file=sys.stderr)
+                return 1
+            rows = sum(entry["rows"] for entry in entries)
+            print(f"{crop}: {rows} readings from {source} -> {len(entries)} partitions of {crop}/{args.plot}")
+    elif args.command == "import":
+        if not store.has(args.crop) and os.path.exists(crop_data_path(args.crop)):
+            print(f"{args.crop} still reads from {crop_data_path(args.crop)}; migrate it first", file=sys.stderr)
+            return 1
+        written = store.append(args.crop, pd.read_csv(args.csv), args.plot)
+        print(f"Appended {written} readings to {args.crop}/{args.plot}")
+    elif args.command == "scan":
+        print(f"Catalogued {store.scan()} partitions under {args.root}")
+    else:
+        for crop in [args.crop] if args.crop else store.crops():
+            for entry in store.partitions(crop):
+                print(f"{crop}/{entry['plot']}/{entry['month']}: {entry['rows']:>6} rows "
+                      f"{entry['min_time']:%Y-%m-%d %H:%M} .. {entry['max_time']:%Y-%m-%d %H:%M}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Hourly and daily aggregates of every crop's readings, kept up to date incrementally.
+
+    python rollups.py [coffee durian ...]    # build or refresh the stored rollups
+
+Each bucket holds the row count and the min/mean/max/last of every reading
+column. Rollups are stored per crop and resolution under data/.rollups, and
+an update only recomputes buckets from the last stored one on, after checking
+that the raw rows seen so far are unchanged.
+"""
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import crop_name
+
+ROLLUP_DIR = "data/.rollups"
+ROLLUP_VERSION = 1
+RESOLUTIONS = {
+    "hourly": pd.Timedelta(hours=1).value,
+    "daily": pd.Timedelta(days=1).value,
+}
+AGGREGATES = ("min", "mean", "max", "last")
+
+
+def rollup(df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """Aggregates of `df` (sorted by Timestamp) per bucket; NaN readings are skipped"""
+    step = RESOLUTIONS[resolution]
+    times = df["Timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    columns = [name for name in df.columns if name != "Timestamp"]
+    if not len(times):
+        return pd.DataFrame({"bucket": pd.DatetimeIndex([]), "count": np.empty(0, dtype=np.int64),
+                             **{f"{c}_{a}": np.empty(0) for c in columns for a in AGGREGATES}})
+
+    buckets = times - times % step
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    ends = np.append(starts[1:], len(times))
+    out = {"bucket": buckets[starts].view("datetime64[ns]"), "count": ends - starts}
+    for name in columns:
+        values = df[name].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"{name}_min"] = np.fmin.reduceat(values, starts)
+            out[f"{name}_mean"] = np.add.reduceat(np.where(present, values, 0.0), starts) / counts
+            out[f"{name}_max"] = np.fmax.reduceat(values, starts)
+        # Last non-NaN reading of each bucket
+        last_seen = np.maximum.accumulate(np.where(present, np.arange(len(values)), -1))[ends - 1]
+        out[f"{name}_last"] = np.where(last_seen >= starts, values[np.maximum(last_seen, 0)], np.nan)
+    return pd.DataFrame(out)
+
+
+def rollup_path(crop: str, resolution: str, root: str = ROLLUP_DIR) -> str:
+    return os.path.join(root, crop.lower(), f"{resolution}.npz")
+
+
+def write_rollup(path: str, frame: pd.DataFrame, meta: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {name: frame[name].to_numpy() for name in frame.columns}
+    arrays["bucket"] = arrays["bucket"].astype("datetime64[ns]").view(np.int64)
+    arrays["meta"] = np.array(json.dumps(meta))
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def read_rollup(path: str):
+    """(frame, meta) for a stored rollup, or None if missing or unreadable"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            columns = {name: data[name] for name in data.files if name != "meta"}
+    except (OSError, KeyError, ValueError):
+        return None
+    if meta.get("version") != ROLLUP_VERSION:
+        return None
+    columns["bucket"] = columns["bucket"].view("datetime64[ns]")
+    return pd.DataFrame({"bucket": columns.pop("bucket"), "count": columns.pop("count"), **columns}), meta
+
+
+class RollupStore:
+    """Per-crop rollups at every resolution, refreshed from `loader(crop)` on access.
+
+    The loader returns the crop's current frame, sorted by Timestamp (e.g.
+    `ForecastService.load`). Rollups are rebuilt from scratch only when the
+    raw rows they were built from changed; appended rows just replace the
+    last, partial bucket onwards.
+    """
+
+    def __init__(self, loader, root: str = ROLLUP_DIR):
+        self._loader = loader
+        self.root = root
+        self._rollups = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.updates = 0
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def frame(self, crop: str, resolution: str, start=None, end=None) -> pd.DataFrame:
+        """Buckets of `crop` at `resolution`, optionally limited to start <= bucket <= end"""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        df = self._loader(crop)
+        frame = self._refresh(crop, resolution, df)
+        if start is None and end is None:
+            return frame
+        index = frame["bucket"].to_numpy().view(np.int64)
+        lo = 0 if start is None else int(np.searchsorted(index, pd.Timestamp(start).value, side="left"))
+        hi = len(index) if end is None else int(np.searchsorted(index, pd.Timestamp(end).value, side="right"))
+        return frame.iloc[lo:hi]
+
+    def _refresh(self, crop: str, resolution: str, df: pd.DataFrame) -> pd.DataFrame:
+        key = (crop, resolution)
+        with self._key_lock(key):
+            cached = self._rollups.get(key)
+            if cached is None:
+                cached = read_rollup(rollup_path(crop, resolution, self.root))
+            continues = cached is not None and self._continues(cached[1], df)
+            if continues and cached[1]["rows"] == len(df):
+                self._rollups[key] = cached
+                return cached[0]
+
+            if continues:
+                frame = self._extend(cached[0], df, resolution)
+                self.updates += 1
+            else:
+                frame = rollup(df, resolution)
+                self.rebuilds += 1
+
+            meta = {
+                "version": ROLLUP_VERSION,
+                "rows": len(df),
+                "last_time": df["Timestamp"].iloc[-1].isoformat() if len(df) else None,
+                "columns": list(df.columns),
+            }
+            write_rollup(rollup_path(crop, resolution, self.root), frame, meta)
+            self._rollups[key] = (frame, meta)
+            return frame
+
+    @staticmethod
+    def _continues(meta: dict, df: pd.DataFrame) -> bool:
+        # The row the rollup ended on is still where it was, so rows were only appended after it
+        rows = meta["rows"]
+        if meta["columns"] != list(df.columns) or rows > len(df):
+            return False
+        if rows == 0:
+            return True
+        return df["Timestamp"].iloc[rows - 1] == pd.Timestamp(meta["last_time"])
+
+    @staticmethod
+    def _extend(frame: pd.DataFrame, df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+        if not len(frame):
+            return rollup(df, resolution)
+        # The last stored bucket may have been partial, so it is recomputed along with the new ones
+        last_bucket = frame["bucket"].iloc[-1]
+        times = df["Timestamp"].to_numpy(dtype="datetime64[ns]")
+        lo = int(np.searchsorted(times, last_bucket.to_datetime64(), side="left"))
+        fresh = rollup(df.iloc[lo:], resolution)
+        return pd.concat([frame.iloc[:-1], fresh], ignore_index=True)
+
+
+if __name__ == "__main__":
+    from partitions import load_crop_frame
+
+    crops = sys.argv[1:] or [key for _, key, _ in crop_name]
+    store = RollupStore(load_crop_frame)
+    for crop in crops:
+        for resolution in RESOLUTIONS:
+            frame = store.frame(crop, resolution)
+            print(f"{crop}/{resolution}: {len(frame)} buckets")
+    print(f"{store.rebuilds} rebuilt, {store.updates} updated")
@@ -0,0 +1,240 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import crop_name, nutrients, thresholds
+from crossing import DEFAULT_HORIZON, attention_order, time_to_threshold
+from depletion import DEFAULT_PATHS, depletion
+from features import FeatureStore
+from forecast_cache import ForecastCache, forecast_key
+from forecast_store import stored_forecast
+from forecasting import ForecastResult, forecast_nutrient
+from model_registry import ModelRegistry
+from model_state import ModelStateStore
+from partitions import crop_feed, get_store
+from rollups import RollupStore
+from timeseries import TimeSeriesStore
+from tracing import span
+from workers import completed, submit, then
+
+
+class UnknownSeries(KeyError):
+    """A crop or nutrient that is not configured"""
+
+
+class ForecastService:
+    """Crop data, models, forecasts and threshold checks, independent of any UI.
+
+    One instance is shared per process: the dashboard keeps it as a cached
+    resource and the HTTP API holds its own. Every method is thread-safe;
+    `submit_forecast` is the non-blocking entry point.
+    """
+
+    def __init__(self, registry: ModelRegistry = None, forecasts: ForecastCache = None):
+        self.registry = registry or ModelRegistry()
+        # Set PCS_FORECAST_CACHE_DIR to keep forecasts across restarts
+        self.forecasts = forecasts or ForecastCache(disk_dir=os.environ.get("PCS_FORECAST_CACHE_DIR"))
+        self.features = FeatureStore()
+        self.model_states = ModelStateStore(self.features)
+        self.series = TimeSeriesStore(self.load)
+        self.rollups = RollupStore(self.load)
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def crops() -> list:
+        return [key for _, key, _ in crop_name]
+
+    def check(self, crop: str, nutrient: str = None):
+        if crop not in thresholds:
+            raise UnknownSeries(f"Unknown crop: {crop}")
+        if nutrient is not None and nutrient not in nutrients:
+            raise UnknownSeries(f"Unknown nutrient: {nutrient}")
+
+    def feed(self, crop: str):
+        """The crop's TailReader, or PartitionFeed once its data is partitioned"""
+        with self._lock:
+            reader = self._feeds.get(crop)
+            if reader is None:
+                reader = self._feeds[crop] = crop_feed(crop)
+            return reader
+
+    def load(self, crop: str) -> pd.DataFrame:
+        # Picks up readings appended since the last call without re-reading the file
+        with span("load_crop_data"):
+            return self.feed(crop).refresh()
+
+    def reset_feeds(self):
+        with self._lock:
+            self._feeds.clear()
+
+    def latest(self, crop: str) -> pd.Series:
+        return self.series.latest(crop)
+
+    def window(self, crop: str, start=None, end=None) -> pd.DataFrame:
+        return self.series.window(crop, start, end)
+
+    def last(self, crop: str, duration) -> pd.DataFrame:
+        return self.series.last(crop, duration)
+
+    def plot_window(self, crop: str, plots: list, start=None, end=None, duration=None) -> pd.DataFrame:
+        """Readings of some of the crop's plots, read only from the partitions the window touches"""
+        store = get_store()
+        if not store.has(crop):
+            raise UnknownSeries(f"{crop} has no plot partitions")
+        unknown = set(plots) - set(store.plots(crop))
+        if unknown:
+            raise UnknownSeries(f"Unknown plots for {crop}: {sorted(unknown)}")
+        if duration is not None:
+            return store.last(crop, duration, plots)
+        return store.read(crop, start, end, plots)
+
+    def rollup(self, crop: str, resolution: str, start=None, end=None) -> pd.DataFrame:
+        return self.rollups.frame(crop, resolution, start, end)
+
+    def prepare_model(self, crop: str, nutrient: str, df: pd.DataFrame):
+        """The nutrient's model, filtered up to the newest reading in `df`; None without a model"""
+        with span("load_sarima_model"):
+            model = self.registry.get(crop, nutrient)
+        if model is None:
+            return None
+        with span("update_model_state"):
+            return self.model_states.update(crop, nutrient, model, df)
+
+    def _start_forecast(self, model, crop: str, nutrient: str, df: pd.DataFrame, horizon: int):
+        # Called with the prepared model; slices the future exog and hands the forecast to the pool
+        if model is None:
+            return completed(None)
+        exog_names = model.model.exog_names or []
+        exog = None
+        if exog_names:
+            with span("future_exog"):
+                # Sliced from the crop's shared features, so workers only receive the rows they need
+                n = len(df)
+                exog = pd.DataFrame(self.features.matrix(crop, df, exog_names, n, n + horizon), columns=exog_names)
+        return submit(forecast_nutrient, model, df.iloc[-1:], nutrient, horizon, exog=exog)
+
+    def submit_forecast(self, crop: str, nutrient: str, horizon: int, df: pd.DataFrame = None):
+        """Future of one nutrient's ForecastResult, or of None when there is no model.
+
+        Served from the forecast cache or store when possible. Otherwise the
+        model is prepared on the thread pool and forecast on the shared worker
+        pool, and concurrent callers asking for the same forecast share that job.
+        """
+        self.check(crop, nutrient)
+        df = self.series.frame(crop) if df is None else df
+        last_timestamp = df['Timestamp'].iloc[-1]
+        version = self.registry.version(crop, nutrient)
+        key = forecast_key(crop, nutrient, horizon, version, last_timestamp)
+
+        cached = self.forecasts.get(key)
+        if cached is None:
+            # Written by batch_forecast.py; only used while model and data are unchanged
+            cached = stored_forecast(crop, nutrient, horizon, version, last_timestamp)
+            if cached is not None:
+                self.forecasts.put(key, cached)
+        if cached is not None:
+            return completed(cached)
+
+        def start():
+            prepared = submit(self.prepare_model, crop, nutrient, df, kind="thread")
+            return then(prepared, self._start_forecast, crop, nutrient, df, horizon)
+        return self.forecasts.coalesce(key, start)
+
+    def submit_forecasts(self, crop: str, horizon: int, df: pd.DataFrame = None) -> dict:
+        df = self.series.frame(crop) if df is None else df
+        return {nutrient: self.submit_forecast(crop, nutrient, horizon, df) for nutrient in nutrients}
+
+    def _start_depletion(self, result, crop: str, nutrient: str, df: pd.DataFrame, paths: int):
+        if result is None:
+            return completed(None)
+        # The prepared model is already filtered up to df's last reading, so this is just the simulation
+        return submit(self._depletion, result, crop, nutrient, df, paths, kind="thread")
+
+    def _depletion(self, result, crop: str, nutrient: str, df: pd.DataFrame, paths: int):
+        with span("depletion"):
+            return depletion(self.prepare_model(crop, nutrient, df), result, thresholds[crop][nutrient], paths)
+
+    def submit_depletion(self, crop: str, nutrient: str, horizon: int, df: pd.DataFrame = None,
+                         paths: int = DEFAULT_PATHS):
+        """Future of the nutrient's DepletionForecast (threshold-crossing probabilities), or of None without a model"""
+        self.check(crop, nutrient)
+        df = self.series.frame(crop) if df is None else df
+        version = self.registry.version(crop, nutrient)
+        key = ("depletion", paths) + forecast_key(crop, nutrient, horizon, version, df['Timestamp'].iloc[-1])
+        cached = self.forecasts.get(key)
+        if cached is not None:
+            return completed(cached)
+
+        # Submitted outside `coalesce`, which holds the cache lock while starting a job
+        forecast = self.submit_forecast(crop, nutrient, horizon, df)
+        return self.forecasts.coalesce(key, lambda: then(forecast, self._start_depletion, crop, nutrient, df, paths))
+
+    def _crossing(self, crop: str, nutrient: str, df: pd.DataFrame, horizon: int):
+        model = self.prepare_model(crop, nutrient, df)
+        if model is None:
+            return None
+        exog = None
+        exog_names = model.model.exog_names or []
+        if exog_names:
+            n = len(df)
+            exog = self.features.matrix(crop, df, exog_names, n, n + horizon)
+        with span("time_to_threshold"):
+            return time_to_threshold(model, crop, nutrient, thresholds[crop][nutrient],
+                                     df['Timestamp'].iloc[-1], df[nutrient].iloc[-1], horizon, exog)
+
+    def submit_crossing(self, crop: str, nutrient: str, horizon: int = DEFAULT_HORIZON, df: pd.DataFrame = None):
+        """Future of the nutrient's Crossing (time until it drops below threshold), or of None without a model"""
+        self.check(crop, nutrient)
+        df = self.series.frame(crop) if df is None else df
+        version = self.registry.version(crop, nutrient)
+        key = ("crossing",) + forecast_key(crop, nutrient, horizon, version, df['Timestamp'].iloc[-1])
+        cached = self.forecasts.get(key)
+        if cached is not None:
+            return completed(cached)
+        return self.forecasts.coalesce(key, lambda: submit(self._crossing, crop, nutrient, df, horizon, kind="thread"))
+
+    def crossings(self, horizon: int = DEFAULT_HORIZON, timeout: float = None):
+        """Every crop's and nutrient's Crossing, most urgent first, and the series that failed by (crop, nutrient)"""
+        jobs, errors = {}, {}
+        for crop in self.crops():
+            try:
+                df = self.series.frame(crop)
+                for nutrient in nutrients:
+                    jobs[crop, nutrient] = self.submit_crossing(crop, nutrient, horizon, df)
+            except Exception as e:
+                errors[crop, None] = e
+        found = []
+        for series, job in jobs.items():
+            try:
+                result = job.result(timeout)
+            except Exception as e:
+                errors[series] = e
+                continue
+            if result is not None:
+                found.append(result)
+        return sorted(found, key=attention_order), errors
+
+    def forecast(self, crop: str, nutrient: str, horizon: int, timeout: float = None):
+        return self.submit_forecast(crop, nutrient, horizon).result(timeout)
+
+    def breach_status(self, crop: str, horizon: int, timeout: float = None) -> dict:
+        """Per nutrient: whether the forecast drops below its threshold, and when first"""
+        self.check(crop)
+        jobs = self.submit_forecasts(crop, horizon)
+        return {nutrient: breach(job.result(timeout), thresholds[crop][nutrient]) for nutrient, job in jobs.items()}
+
+
+def breach(result: ForecastResult, threshold: float) -> dict:
+    if result is None:
+        return {"threshold": threshold, "model": False}
+    below = np.flatnonzero(result.values < threshold)
+    return {
+        "threshold": threshold,
+        "model": True,
+        "breach": bool(len(below)),
+        "first_breach": result.timestamps[below[0]].isoformat() if len(below) else None,
+        "min_forecast": float(result.values.min()) if result.horizon else None,
+    }
@@ -0,0 +1,43 @@
+import streamlit as st
+
+# Classes shared by the page headers, sections and cards of every page
+PAGE_CSS = """
+<style>
+.main-header {
+    background: linear-gradient(90deg, #2E8B57, #228B22);
+    padding: 2rem;
+    border-radius: 10px;
+    margin-bottom: 2rem;
+    color: white;
+    text-align: center;
+}
+.section-header {
+    background: linear-gradient(90deg, #f8f9fa, #e9ecef);
+    padding: 1rem;
+    border-radius: 8px;
+    border-left: 5px solid #28a745;
+    margin: 1rem 0;
+}
+.info-card {
+    background: white;
+    padding: 1.5rem;
+    border-radius: 10px;
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+    border: 1px solid #e9ecef;
+    margin: 1rem 0;
+}
+.metric-card {
+    background: linear-gradient(135deg, #28a745 0%, #218838 100%);
+    color: white;
+    padding: 1rem;
+    border-radius: 8px;
+    text-align: center;
+    margin: 0.5rem;
+}
+</style>
+"""
+
+
+def apply_page_style():
+    """Inject PAGE_CSS; every page calls it, since a rerun keeps only the elements it draws again"""
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
@@ -0,0 +1,38 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+# The modules live at the top of the repo rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "sarimax(seed, drift, horizon): options of the sarimax fixture")
+
+
+@pytest.fixture(scope="module")
+def sarimax(request):
+    """A seasonal SARIMAX with a const and one exog column, filtered with fixed parameters so no fit is needed.
+
+    Returns the results and `horizon` future exog rows. A test module sets
+    the seed, the drift (the const coefficient) and the horizon with
+    `pytestmark = pytest.mark.sarimax(...)`.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    marker = request.node.get_closest_marker("sarimax")
+    options = {"seed": 1, "drift": 0.0, "horizon": 48, **(marker.kwargs if marker else {})}
+    rng = np.random.default_rng(options["seed"])
+    n = 400
+    exog = np.column_stack([np.ones(n), rng.normal(size=n)])
+    endog = 100 + np.cumsum(rng.normal(0, 0.3, n)) + 0.5 * exog[:, 1]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = SARIMAX(endog, exog=exog, order=(1, 1, 1), seasonal_order=(1, 0, 0, 4)).filter(
+            np.array([options["drift"], 0.5, 0.4, -0.3, 0.2, 0.09]))
+    horizon = options["horizon"]
+    future = np.column_stack([np.ones(horizon), np.full(horizon, exog[-1, 1])])
+    return results, future
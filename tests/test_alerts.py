@@ -0,0 +1,140 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import alerts
+from alerts import BREACHED, OK, PREDICTED, AlertEvaluator, read_alert_log, read_alert_state, step
+from workers import completed
+
+
+def series(n=1, known=True):
+    return (np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int32),
+            np.full(n, known))
+
+
+def run(state, values, risks, limit=10.0, **kwargs):
+    """Feed one pass per value; returns the committed level after each"""
+    levels, pending, streaks, known = state
+    out = []
+    for value, risk in zip(values, risks):
+        step(levels, pending, streaks, known, np.array([value]), np.array([risk]), np.array([limit]), **kwargs)
+        out.append(int(levels[0]))
+    return out
+
+
+def test_breach_is_debounced_on_raise_and_clear():
+    state = series()
+    # Raised after two passes below, cleared after three above the hysteresis band
+    assert run(state, [9, 9, 11, 11, 11], [0, 0, 0, 0, 0]) == [OK, BREACHED, BREACHED, BREACHED, OK]
+
+
+def test_breach_clears_only_above_hysteresis_band():
+    state = series()
+    # 10.4 is above the threshold but inside the 5% band, so the alert holds
+    assert run(state, [9, 9, 10.4, 10.4, 10.4, 10.4], [0] * 6) == [OK, BREACHED] + [BREACHED] * 4
+
+
+def test_interrupted_streak_starts_over():
+    state = series()
+    assert run(state, [9, 11, 9, 9], [0] * 4) == [OK, OK, OK, BREACHED]
+
+
+def test_predicted_breach_uses_probability_hysteresis():
+    state = series()
+    risks = [0.6, 0.6, 0.45, 0.45, 0.45, 0.3, 0.3, 0.3]
+    assert run(state, [20] * 8, risks) == [OK, PREDICTED, PREDICTED, PREDICTED, PREDICTED, PREDICTED, PREDICTED, OK]
+
+
+def test_first_level_is_taken_without_debounce():
+    state = series(known=False)
+    assert run(state, [9], [0]) == [BREACHED]
+    assert state[3][0]
+
+
+def test_missing_inputs_keep_state():
+    state = series()
+    assert run(state, [9, np.nan, 9], [0, np.nan, 0]) == [OK, OK, BREACHED]
+
+
+class StubService:
+    """One crop whose readings and forecasts are set by the test"""
+
+    def __init__(self, values, risk):
+        self.frame = pd.DataFrame({
+            "Timestamp": pd.date_range("2024-01-01", periods=len(values), freq="15min"),
+            **{nutrient: values for nutrient in alerts.nutrients},
+        })
+        self.risk = risk
+        self.series = SimpleNamespace(frame=lambda crop: self.frame)
+
+    def crops(self):
+        return ["coffee"]
+
+    def submit_forecasts(self, crop, horizon, df):
+        result = SimpleNamespace(values=np.full(horizon, df["N"].iloc[-1]), horizon=horizon)
+        return {nutrient: completed(result) for nutrient in alerts.nutrients}
+
+    def submit_depletion(self, crop, nutrient, horizon, df):
+        return completed(SimpleNamespace(risk=self.risk))
+
+    def append(self, value):
+        last = self.frame["Timestamp"].iloc[-1]
+        row = {"Timestamp": last + pd.Timedelta(minutes=15), **{n: value for n in alerts.nutrients}}
+        self.frame = pd.concat([self.frame, pd.DataFrame([row])], ignore_index=True)
+
+
+def test_evaluator_records_data_time_and_horizon(tmp_path):
+    db = str(tmp_path / "alerts.db")
+    service = StubService([100.0], risk=0.0)
+    evaluator = AlertEvaluator(service, db_path=db, horizon=12)
+    assert evaluator.evaluate() == []
+    # No new readings: the pass is skipped
+    assert evaluator.evaluate() == []
+
+    service.append(1.0)
+    assert evaluator.evaluate() == []
+    service.append(1.0)
+    transitions = evaluator.evaluate()
+    breach_time = service.frame["Timestamp"].iloc[-1].isoformat()
+    assert {t["level"] for t in transitions} == {"breached"}
+    assert {t["data_time"] for t in transitions} == {breach_time}
+
+    state = read_alert_state(db, "coffee")
+    assert set(state["level_name"]) == {"breached"}
+    assert set(state["since"]) == {breach_time}
+    assert set(state["horizon"]) == {12}
+    log = read_alert_log(db)
+    assert set(log["horizon"]) == {12} and set(log["data_time"]) == {breach_time}
+
+    # A restart resumes from the stored state
+    restored = AlertEvaluator(service, db_path=db, horizon=12)
+    assert list(restored.levels) == [BREACHED] * len(alerts.nutrients)
+    assert restored.since[0] == breach_time
+
+
+def test_failed_series_are_retried_without_new_readings(tmp_path):
+    service = StubService([1.0], risk=0.0)
+    failing = {"P"}
+    submit_depletion = service.submit_depletion
+
+    def flaky_depletion(crop, nutrient, horizon, df):
+        if nutrient in failing:
+            future = Future()
+            future.set_exception(RuntimeError("model store unavailable"))
+            return future
+        return submit_depletion(crop, nutrient, horizon, df)
+
+    service.submit_depletion = flaky_depletion
+    evaluator = AlertEvaluator(service, db_path=str(tmp_path / "alerts.db"), horizon=12)
+    assert {t["nutrient"] for t in evaluator.evaluate()} == set(alerts.nutrients) - failing
+    assert ("coffee", "P") in evaluator.errors
+
+    # Same readings: only the failed series is evaluated again
+    failing.clear()
+    transitions = evaluator.evaluate()
+    assert [t["nutrient"] for t in transitions] == ["P"]
+    assert not evaluator.errors
+    assert list(evaluator.streaks) == [0] * len(alerts.nutrients)
+    assert evaluator.evaluate() == []
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from http import HTTPStatus
+
+import api
+
+
+class StubService:
+    """Hands out one shared forecast job, like the forecast cache does for identical requests"""
+
+    def __init__(self):
+        self.job = Future()
+        self.submit_threads = []
+
+    def check(self, crop, nutrient=None):
+        pass
+
+    def submit_forecast(self, crop, nutrient, horizon):
+        self.submit_threads.append(threading.current_thread())
+        return self.job
+
+
+def test_timeout_leaves_shared_job_running(monkeypatch):
+    monkeypatch.setattr(api, "FORECAST_TIMEOUT", 0.05)
+    service = StubService()
+    server = api.ForecastAPI(service, workers=1)
+
+    async def requests():
+        status, _ = await server.handle("/crops/coffee/forecast/N?horizon=4")
+        assert status == HTTPStatus.GATEWAY_TIMEOUT
+        assert not service.job.cancelled()
+
+        # A later request for the same forecast waits on the job rather than a cancelled future
+        later = asyncio.ensure_future(server.handle("/crops/coffee/forecast/N?horizon=4"))
+        await asyncio.sleep(0.01)
+        service.job.set_result(None)
+        return await later
+
+    status, payload = asyncio.run(requests())
+    assert status == HTTPStatus.NOT_FOUND
+    assert payload == {"error": "No model for coffee/N"}
+    assert threading.main_thread() not in service.submit_threads
+
+
+def test_cancelled_leader_hands_over_to_waiters():
+    service = StubService()
+    server = api.ForecastAPI(service, workers=1)
+    target = "/crops/coffee/forecast/N?horizon=4"
+
+    async def requests():
+        leader = asyncio.ensure_future(server.handle(target))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(server.handle(target))
+        await asyncio.sleep(0.01)
+        assert server.coalesced == 1
+
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        assert leader.cancelled()
+        # The waiter now computes the request itself, on the same shared job
+        assert not waiter.done()
+        service.job.set_result(None)
+        return await asyncio.wait_for(waiter, 1)
+
+    status, payload = asyncio.run(requests())
+    assert status == HTTPStatus.NOT_FOUND
+    assert payload == {"error": "No model for coffee/N"}
+    assert len(service.submit_threads) == 2
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import batch_forecast
+
+
+def test_failed_crop_does_not_abort_the_batch(monkeypatch, tmp_path):
+    frame = pd.DataFrame({"Timestamp": [pd.Timestamp("2024-01-01")]})
+
+    def forecast_crop(crop, horizon):
+        if crop == "durian":
+            raise ValueError("corrupt model")
+        return {"crop": crop, "high_water": frame["Timestamp"].iloc[-1], "results": {}, "errors": {}, "missing": []}
+
+    written = []
+    monkeypatch.setattr(batch_forecast, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch_forecast, "forecast_crop", forecast_crop)
+    monkeypatch.setattr(batch_forecast, "load_crop_frame", lambda crop: frame)
+    monkeypatch.setattr(batch_forecast, "write_crop_forecasts", lambda crop, *args: written.append(crop))
+
+    summary = batch_forecast.run(["coffee", "durian", "blackpepper"], 4, 1, str(tmp_path), force=True)
+    assert sorted(summary["forecast"]) == ["blackpepper", "coffee"]
+    assert sorted(written) == ["blackpepper", "coffee"]
+    assert summary["errors"] == {"durian": "ValueError: corrupt model"}
+
+
+def test_missing_models_are_not_retried_but_errors_are(monkeypatch, tmp_path):
+    frame = pd.DataFrame({"Timestamp": [pd.Timestamp("2024-01-01")]})
+    versions = {("coffee", "N"): "v1", ("durian", "N"): "v1"}
+    calls = []
+
+    def forecast_crop(crop, horizon):
+        calls.append(crop)
+        out = {"crop": crop, "high_water": frame["Timestamp"].iloc[-1], "results": {}, "errors": {}, "missing": []}
+        if crop == "coffee":
+            out["missing"] = [n for n in batch_forecast.nutrients if (crop, n) not in versions]
+        else:
+            out["errors"] = {"N": "forecast timed out"}
+        return out
+
+    class StubRegistry:
+        def version(self, crop, nutrient):
+            return versions.get((crop, nutrient))
+
+    monkeypatch.setattr(batch_forecast, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch_forecast, "forecast_crop", forecast_crop)
+    monkeypatch.setattr(batch_forecast, "load_crop_frame", lambda crop: frame)
+    monkeypatch.setattr(batch_forecast, "ModelRegistry", StubRegistry)
+
+    summary = batch_forecast.run(["coffee", "durian"], 4, 1, str(tmp_path))
+    assert summary["missing"] == {"coffee": ["P", "K"]}
+    assert summary["errors"] == {"durian": {"N": "forecast timed out"}}
+
+    # Same data and models: only the crop with a failed forecast runs again
+    calls.clear()
+    summary = batch_forecast.run(["coffee", "durian"], 4, 1, str(tmp_path))
+    assert calls == ["durian"] and summary["skipped"] == ["coffee"]
+
+    # A model for a missing nutrient shows up
+    calls.clear()
+    versions[("coffee", "P")] = "v1"
+    batch_forecast.run(["coffee"], 4, 1, str(tmp_path))
+    assert calls == ["coffee"]
@@ -0,0 +1,69 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import ndtr
+
+from crossing import HIGH, LOW, Crossing, attention_order, moments, time_to_threshold
+
+HORIZON = 96 * 3
+LAST_TIME = pd.Timestamp("2024-01-01")
+
+# A downward drift so the mean crosses thresholds within the horizon
+pytestmark = pytest.mark.sarimax(seed=2, drift=-0.05, horizon=HORIZON)
+
+
+def test_moments_match_get_forecast(sarimax):
+    results, future = sarimax
+    forecast = results.get_forecast(steps=HORIZON, exog=future)
+    mean, sd = moments(results, HORIZON, future)
+    np.testing.assert_allclose(mean, forecast.predicted_mean, rtol=1e-9)
+    np.testing.assert_allclose(sd, np.sqrt(forecast.var_pred_mean), rtol=1e-9)
+
+
+def test_crossing_times_follow_the_forecast(sarimax):
+    results, future = sarimax
+    mean, sd = moments(results, HORIZON, future)
+    # A threshold the mean reaches half way through the horizon
+    threshold = float(mean[HORIZON // 2])
+    crossing = time_to_threshold(results, "coffee", "N", threshold, LAST_TIME, mean[0] + 5, HORIZON, future)
+
+    def at(mask):
+        steps = np.flatnonzero(mask)
+        return LAST_TIME + pd.Timedelta(minutes=15) * (steps[0] + 1) if len(steps) else None
+
+    chance = ndtr((threshold - mean) / sd)
+    assert crossing.status == "crossing"
+    assert crossing.expected == at(mean < threshold)
+    assert crossing.earliest == at(chance >= LOW)
+    assert crossing.latest == at(chance >= HIGH)
+    assert crossing.earliest <= crossing.expected
+    assert crossing.hours_until(crossing.expected) == (int(np.flatnonzero(mean < threshold)[0]) + 1) / 4
+    assert crossing.forecast_min == pytest.approx(mean.min())
+
+
+def test_status_and_attention_order():
+    def crossing(crop, value, expected=None, earliest=None):
+        at = {h: None if h is None else LAST_TIME + pd.Timedelta(hours=h) for h in (expected, earliest)}
+        return Crossing(crop, "N", 50.0, LAST_TIME, value, 96, at[expected], at[earliest], None, value)
+
+    clear = crossing("clear", 90.0)
+    watch = crossing("watch", 90.0, earliest=10)
+    late = crossing("late", 90.0, expected=48, earliest=20)
+    soon = crossing("soon", 90.0, expected=5, earliest=2)
+    below = crossing("below", 40.0, expected=0.25, earliest=0.25)
+    deeper = crossing("deeper", 20.0, expected=0.25, earliest=0.25)
+    assert [c.status for c in (clear, watch, late, below)] == ["clear", "watch", "crossing", "below"]
+    ordered = sorted([clear, watch, late, soon, below, deeper], key=attention_order)
+    assert [c.crop for c in ordered] == ["deeper", "below", "soon", "late", "watch", "clear"]
+
+
+def test_trend_models_are_rejected():
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = SARIMAX(np.arange(50.0), order=(1, 0, 0), trend="c").filter(np.array([0.1, 0.5, 1.0]))
+    with pytest.raises(ValueError):
+        moments(results, 10)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import ndtr
+
+from depletion import _quantiles, depletion, design_loadings, simulate_paths
+from forecasting import ForecastResult, future_timestamps, system_matrix
+
+HORIZON = 48
+
+pytestmark = pytest.mark.sarimax(seed=1, drift=0.0, horizon=HORIZON)
+
+
+@pytest.fixture(scope="module")
+def model(sarimax):
+    results, future = sarimax
+    return results, results.get_forecast(steps=HORIZON, exog=future)
+
+
+def forecast_result(forecast) -> ForecastResult:
+    values = np.asarray(forecast.predicted_mean)
+    last_time = pd.Timestamp("2024-01-01")
+    return ForecastResult(values=values, timestamps=future_timestamps(last_time, len(values)), lower=values,
+                          upper=values, last_value=float(values[0]), last_time=last_time)
+
+
+def test_design_loadings_match_stepping(model):
+    results, _ = model
+    ssm = results.model.ssm
+    design, transition = system_matrix(ssm, "design"), system_matrix(ssm, "transition")
+    expected = np.empty((HORIZON, transition.shape[0]))
+    row = design[0]
+    for j in range(HORIZON):
+        expected[j] = row
+        row = row @ transition
+    np.testing.assert_allclose(design_loadings(results, HORIZON), expected, rtol=1e-10, atol=1e-12)
+
+
+def test_simulated_moments_match_closed_form(model):
+    results, forecast = model
+    mean = np.asarray(forecast.predicted_mean)
+    sd = np.sqrt(np.asarray(forecast.var_pred_mean))
+    paths = simulate_paths(results, mean, paths=20000, seed=3, dtype=np.float64)
+
+    assert paths.shape == (20000, HORIZON)
+    # Standard errors of the sample mean and sd are sd / sqrt(n) and sd / sqrt(2n)
+    np.testing.assert_array_less(np.abs(paths.mean(axis=0) - mean), 5 * sd / np.sqrt(20000))
+    np.testing.assert_allclose(paths.std(axis=0), sd, rtol=0.03)
+
+
+def test_probabilities_match_normal_forecast(model):
+    results, forecast = model
+    mean = np.asarray(forecast.predicted_mean)
+    sd = np.sqrt(np.asarray(forecast.var_pred_mean))
+    threshold = float(mean[-1] - sd[-1])
+    outlook = depletion(results, forecast_result(forecast), threshold, paths=20000)
+
+    np.testing.assert_allclose(outlook.probability, ndtr((threshold - mean) / sd), atol=0.02)
+    # Having dropped below by a step is at least as likely as being below at it, and never decreases
+    assert np.all(outlook.cumulative >= outlook.probability)
+    assert np.all(np.diff(outlook.cumulative) >= 0)
+    assert outlook.risk == outlook.cumulative[-1]
+    step = outlook.first_step(0.1)
+    assert outlook.cumulative[step] >= 0.1 and (step == 0 or outlook.cumulative[step - 1] < 0.1)
+    assert outlook.first_step(1.01) is None
+
+    median = outlook.quantile(0.5)
+    np.testing.assert_array_less(np.abs(median - mean), 0.05 * sd + 1e-3)
+    assert np.all(np.diff(outlook.quantiles, axis=0) >= 0)
+
+
+def test_same_seed_gives_the_same_outlook(model):
+    results, forecast = model
+    a = depletion(results, forecast_result(forecast), 100.0, paths=500)
+    b = depletion(results, forecast_result(forecast), 100.0, paths=500)
+    np.testing.assert_array_equal(a.quantiles, b.quantiles)
+
+
+def test_quantiles_match_numpy():
+    simulated = np.random.default_rng(0).normal(size=(101, 7))
+    levels = (0.05, 0.25, 0.5, 0.75, 0.95)
+    np.testing.assert_allclose(_quantiles(simulated, levels), np.quantile(simulated, levels, axis=0))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from downsample import downsample, threshold_segment
+
+
+def trace(n=5000, seed=8):
+    rng = np.random.default_rng(seed)
+    x = np.datetime64("2024-01-01T00:00") + np.arange(n) * np.timedelta64(15, "m")
+    y = 40 + np.cumsum(rng.normal(0, 0.5, n))
+    return x, y
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("threshold", [None, 40.0])
+def test_output_is_sorted_and_keeps_endpoints(method, threshold):
+    x, y = trace()
+    out_x, out_y = downsample(x, y, 600, method=method, threshold=threshold)
+
+    assert (np.diff(out_x) > np.timedelta64(0)).all()
+    assert out_x[0] == x[0] and out_x[-1] == x[-1]
+    assert out_y[0] == y[0] and out_y[-1] == y[-1]
+    # Every point is an original reading
+    positions = np.searchsorted(x, out_x)
+    np.testing.assert_array_equal(y[positions], out_y)
+    if threshold is None:
+        assert len(out_x) <= 600
+
+
+def test_short_traces_are_returned_as_is():
+    x, y = trace(n=100)
+    out_x, out_y = downsample(x, y, 600)
+    assert out_x is x and out_y is y
+
+
+def test_threshold_segment_spans_the_trace():
+    x, _ = trace(n=10)
+    seg_x, seg_y = threshold_segment(x, 35.0)
+    np.testing.assert_array_equal(seg_x, [x[0], x[-1]])
+    np.testing.assert_array_equal(seg_y, [35.0, 35.0])
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_global_extremes_are_kept(method):
+    x, y = trace(n=20000, seed=7)
+    # Sensor noise on the drift: the triangle pick alone misses the extremes of this trace
+    y += np.random.default_rng(7).normal(0, 3, len(y))
+    _, out_y = downsample(x, y, 600, method=method)
+    assert out_y.max() == y.max() and out_y.min() == y.min()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from features import FeatureStore, compute_features, held_features
+
+NAMES = ["const", "Temperature", "Humidity_lag_3", "Temperature_rollmean_4", "Humidity_rollsum_2", "Missing"]
+
+
+def frame(n=200, seed=6):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.date_range("2024-01-01", periods=n, freq="15min"),
+        "Temperature": (25 + np.cumsum(rng.normal(0, 0.2, n))).astype(np.float32),
+        "Humidity": (70 + np.cumsum(rng.normal(0, 0.5, n))).astype(np.float32),
+    })
+
+
+def test_store_extends_to_the_same_features():
+    df = frame()
+    store = FeatureStore()
+    store.matrix("coffee", df.iloc[:50], NAMES[:3])
+    # Rows arrive one, then many at a time; a new column is asked for part way through
+    store.matrix("coffee", df.iloc[:51], NAMES[:3])
+    store.matrix("coffee", df.iloc[:120], NAMES)
+    full = store.matrix("coffee", df, NAMES)
+    np.testing.assert_allclose(full, compute_features(df, NAMES))
+
+    # Slices and forecast steps past the last reading
+    np.testing.assert_allclose(store.matrix("coffee", df, NAMES, 150, 230), compute_features(df, NAMES, 150, 230))
+
+
+def test_store_rebuilds_when_the_data_is_not_appended():
+    store = FeatureStore()
+    store.matrix("coffee", frame(seed=6), NAMES)
+    # A different series for the crop, e.g. a reloaded file: nothing cached is reused
+    shifted = frame(n=120, seed=7)
+    shifted["Timestamp"] += pd.Timedelta(days=1)
+    np.testing.assert_allclose(store.matrix("coffee", shifted, NAMES), compute_features(shifted, NAMES))
+
+
+def test_held_features_match_each_origin():
+    df = frame(n=60)
+    origins = np.array([0, 1, 2, 5, 30, 59])
+    horizon = 8
+    held = held_features(df, NAMES, origins, horizon)
+
+    assert held.shape == (len(origins), horizon, len(NAMES))
+    for i, t in enumerate(origins):
+        # What a forecast from t sees: nothing after the origin
+        expected = compute_features(df.iloc[:t + 1], NAMES, t + 1, t + 1 + horizon)
+        np.testing.assert_allclose(held[i], expected, err_msg=f"origin {t}")
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from concurrent.futures import CancelledError, Future
+
+import pytest
+
+from forecast_cache import ForecastCache
+from workers import completed, then
+
+
+@pytest.fixture
+def callback_errors(caplog):
+    # Exceptions raised in done callbacks are only logged by concurrent.futures
+    caplog.set_level(logging.ERROR, logger="concurrent.futures")
+    yield caplog
+    assert not caplog.records
+
+
+def test_concurrent_requests_share_one_job(callback_errors):
+    cache = ForecastCache()
+    started = []
+
+    def start():
+        started.append(Future())
+        return started[-1]
+
+    first = cache.coalesce(("k",), start)
+    assert cache.coalesce(("k",), start) is first
+    first.set_result("value")
+    assert len(started) == 1
+    assert cache.get(("k",)) == "value"
+
+
+def test_cancelled_job_is_recomputed(callback_errors):
+    cache = ForecastCache()
+    started = []
+
+    def start():
+        started.append(Future())
+        return started[-1]
+
+    first = cache.coalesce(("k",), start)
+    assert first.cancel()
+
+    second = cache.coalesce(("k",), start)
+    assert second is not first and not second.cancelled()
+    second.set_result("value")
+    assert len(started) == 2
+    assert cache.get(("k",)) == "value"
+
+
+def test_failed_job_is_not_cached(callback_errors):
+    cache = ForecastCache()
+    failed = Future()
+    failed.set_exception(ValueError("no data"))
+    assert cache.coalesce(("k",), lambda: failed) is failed
+    assert cache.get(("k",)) is None
+    assert cache.coalesce(("k",), lambda: completed("value")).result() == "value"
+
+
+def test_cancelled_chain_is_recomputed(callback_errors):
+    cache = ForecastCache()
+    upstream = []
+    calls = []
+
+    def start():
+        upstream.append(Future())
+        return then(upstream[-1], lambda value: calls.append(value) or completed(value * 2))
+
+    first = cache.coalesce(("k",), start)
+    assert first.cancel()
+    # The upstream job finishing later neither runs the continuation nor resolves the cancelled chain
+    upstream[0].set_result(1)
+    assert calls == []
+
+    second = cache.coalesce(("k",), start)
+    upstream[1].set_result(2)
+    assert second.result(timeout=1) == 4
+    assert cache.get(("k",)) == 4
+
+
+def test_then_passes_on_cancellation_and_errors(callback_errors):
+    inner = Future()
+    out = then(completed(1), lambda value: inner)
+    inner.cancel()
+    with pytest.raises(CancelledError):
+        out.result(timeout=1)
+
+    failed = Future()
+    failed.set_exception(ValueError("boom"))
+    with pytest.raises(ValueError):
+        then(failed, lambda value: completed(value)).result(timeout=1)
+    with pytest.raises(ZeroDivisionError):
+        then(completed(0), lambda value: completed(1 / value)).result(timeout=1)
+
+
+def test_then_ignores_results_after_cancellation(callback_errors):
+    inner = Future()
+    out = then(completed(1), lambda value: inner)
+    assert out.cancel()
+    inner.set_result("late")
+    assert out.cancelled()
+
+
+def disk_files(path):
+    return sorted(p.name for p in path.iterdir())
+
+
+def test_disk_tier_survives_restart_and_counts_hits(tmp_path, monkeypatch):
+    counts = []
+    monkeypatch.setattr("tracing.count", lambda cache, hit: counts.append((cache, hit)))
+    ForecastCache(disk_dir=str(tmp_path)).put(("k",), "value")
+
+    restarted = ForecastCache(disk_dir=str(tmp_path))
+    assert restarted.get(("k",)) == "value"
+    assert ("forecast", True) in counts and ("forecast_disk", True) in counts
+
+
+def test_expired_disk_entries_are_deleted(tmp_path, monkeypatch):
+    cache = ForecastCache(disk_dir=str(tmp_path), ttl=60)
+    cache.put(("old",), 1)
+    cache.put(("other",), 2)
+    assert len(disk_files(tmp_path)) == 2
+
+    later = time.time() + 120
+    monkeypatch.setattr("forecast_cache.time.time", lambda: later)
+    cache.clear()
+    # Read: the expired file is removed rather than skipped
+    assert cache.get(("old",)) is None
+    assert len(disk_files(tmp_path)) == 1
+
+    # Sweep: files unused for longer than the TTL go too
+    for path in tmp_path.iterdir():
+        os.utime(path, (later - 120, later - 120))
+    assert cache.sweep_disk() == 1
+    assert disk_files(tmp_path) == []
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ForecastCache(disk_dir=str(tmp_path), max_disk_entries=2)
+    now = time.time()
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put((key,), key)
+        os.utime(cache._disk_path((key,)), (now - 30 + i, now - 30 + i))
+    # Reading "a" makes it the most recently used file
+    cache.clear()
+    assert cache.get(("a",)) == "a"
+
+    assert cache.sweep_disk() == 1
+    assert not os.path.exists(cache._disk_path(("b",)))
+    assert os.path.exists(cache._disk_path(("a",))) and os.path.exists(cache._disk_path(("c",)))
+
+    small = ForecastCache(disk_dir=str(tmp_path), max_disk_bytes=os.path.getsize(cache._disk_path(("a",))))
+    assert len(disk_files(tmp_path)) == 1
+    assert small.get(("a",)) == "a"
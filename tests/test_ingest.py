@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data_cache import load_bundle
+from ingest import TailReader, append_readings
+
+HEADER = "Timestamp,N,P,K\n"
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    # Distinct mtimes, however coarse the file system's clock
+    bump = getattr(write, "bump", 0) + 1
+    write.bump = bump
+    os.utime(path, ns=(1_700_000_000_000_000_000 + bump * 10 ** 9,) * 2)
+
+
+def rows(start, count, n=115):
+    times = pd.date_range(start, periods=count, freq="15min")
+    return "".join(f"{t.month}/{t.day}/{t.year} {t.hour}:{t.minute:02d},{n + i},80,200\n" for i, t in enumerate(times))
+
+
+@pytest.fixture
+def csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    write("data/coffee.csv", HEADER + rows("2024-01-01", 2000))
+    return "data/coffee.csv"
+
+
+def test_same_size_edit_is_picked_up(csv):
+    reader = TailReader(csv)
+    assert reader.frame["N"].iloc[0] == 115
+    with open(csv) as f:
+        text = f.read()
+    write(csv, text.replace("0:00,115,", "0:00,116,", 1))
+
+    assert reader.refresh()["N"].iloc[0] == 116
+    assert load_bundle(csv)["N"].iloc[0] == 116
+
+
+def test_early_edit_with_append_reloads(csv):
+    reader = TailReader(csv)
+    with open(csv) as f:
+        text = f.read()
+    # The last 64 KiB are unchanged and the file grew, but it was not only appended to
+    write(csv, text.replace("0:00,115,", "0:00,116,", 1) + rows("2024-02-01", 2))
+
+    frame = reader.refresh()
+    assert frame["N"].iloc[0] == 116 and len(frame) == 2002
+    assert load_bundle(csv)["N"].iloc[0] == 116
+
+
+def test_appends_extend_in_place(csv):
+    reader = TailReader(csv)
+    dataset = reader.dataset
+    append_readings(csv, {"Timestamp": "2024-02-01 00:00", "N": 1.0, "P": 2.0, "K": 3.0})
+    frame = reader.refresh()
+    assert len(frame) == 2001 and frame["N"].iloc[-1] == 1
+    assert reader.dataset is dataset
+    # Nothing changed since, so the next refresh is a stat
+    assert reader.unchanged()
+
+    bundle = load_bundle(csv)
+    assert len(bundle) == 2001 and bundle["N"].iloc[-1] == 1
+    # The bundle's digest covers the appended bytes too, so a later same-size edit is still caught
+    with open(csv) as f:
+        text = f.read()
+    write(csv, text.replace("0:00,115,", "0:00,116,", 1))
+    assert load_bundle(csv)["N"].iloc[0] == 116
+    assert reader.refresh()["N"].iloc[0] == 116
+
+
+def test_truncation_reloads(csv):
+    reader = TailReader(csv)
+    write(csv, HEADER + rows("2024-01-01", 10, n=300))
+    frame = reader.refresh()
+    assert len(frame) == 10 and frame["N"].iloc[0] == 300
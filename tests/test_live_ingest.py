@@ -0,0 +1,64 @@
+import asyncio
+
+from live_ingest import IngestServer, LiveStore, RingBuffer
+
+
+def make_store():
+    store = LiveStore([], capacity=16)
+    store.buffers["coffee"] = RingBuffer(["N", "P", "K"], 16)
+    store._flushed["coffee"] = 0
+    return store
+
+
+def test_bad_lines_are_counted_not_fatal():
+    store = make_store()
+    server = IngestServer(store)
+    server.handle_lines([
+        b"coffee,2024-01-01T00:00:00,1,2,3",
+        b"coffee,2024-01-01T00:15:00,\xff\xfe,2,3",
+        b"coffee,not a time,1,2,3",
+        b"unknown,2024-01-01T00:15:00,1,2,3",
+        b"coffee,1/1/2024 0:30,4,5,6",
+    ])
+    assert store.stats["accepted"] == 2
+    assert store.stats["malformed"] == 3
+    assert store.latest("coffee")["N"] == 4
+
+
+def test_failed_flush_keeps_the_flusher_running(capsys):
+    store = make_store()
+    server = IngestServer(store, flush_interval=0.01)
+    calls = []
+
+    def flush():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return 0
+
+    store.flush = flush
+
+    async def run():
+        task = asyncio.ensure_future(server._flush_periodically())
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(calls) > 1
+    assert store.stats["flush_errors"] == 1
+    assert "disk full" in capsys.readouterr().err
+
+
+def test_flush_notifies_listeners(monkeypatch):
+    store = make_store()
+    appended = []
+    monkeypatch.setattr("live_ingest.append_crop_readings", lambda crop, batch: appended.append(batch) or len(batch))
+    calls = []
+    store.flush_listeners.append(lambda: calls.append(1))
+
+    assert store.flush() == 0
+    assert calls == []
+    IngestServer(store).handle_lines([b"coffee,2024-01-01T00:00:00,1,2,3"])
+    assert store.flush() == 1
+    assert calls == [1] and len(appended) == 1
@@ -0,0 +1,60 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import compact_results, load_artifact, restore_results, write_artifact
+
+HORIZON = 24
+
+pytestmark = pytest.mark.sarimax(seed=5, drift=0.02, horizon=HORIZON)
+
+
+def assert_same_forecast(original, restored, future):
+    expected = original.get_forecast(steps=HORIZON, exog=future)
+    actual = restored.get_forecast(steps=HORIZON, exog=future)
+    np.testing.assert_allclose(actual.predicted_mean, expected.predicted_mean, rtol=1e-9)
+    np.testing.assert_allclose(actual.var_pred_mean, expected.var_pred_mean, rtol=1e-9)
+
+
+def test_artifact_round_trip_keeps_the_forecast(sarimax, tmp_path):
+    results, future = sarimax
+    path = str(tmp_path / "coffee_N.npz")
+    write_artifact(path, compact_results(results))
+    restored = load_artifact(path)
+
+    assert restored.nobs == 1
+    assert list(restored.model.exog_names) == list(results.model.exog_names)
+    np.testing.assert_array_equal(restored.params, results.params)
+    np.testing.assert_allclose(restored.predicted_state[:, -1], results.predicted_state[:, -1], rtol=1e-9)
+    assert_same_forecast(results, restored, future)
+
+    # New readings filter on from the restored state as they would from the full results
+    new = np.column_stack([np.ones(8), np.linspace(-1, 1, 8)])
+    endog = results.forecast(steps=8, exog=new) + 0.1
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        index = pd.RangeIndex(results.nobs, results.nobs + 8)
+        extended = restored.extend(pd.Series(np.asarray(endog), index=index), exog=pd.DataFrame(new, index=index))
+        appended = results.append(np.asarray(endog), exog=new)
+    np.testing.assert_allclose(extended.predicted_state[:, -1], appended.predicted_state[:, -1], rtol=1e-8)
+
+
+def test_date_indexed_round_trip(sarimax):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    results, future = sarimax
+    index = pd.date_range("2024-01-01", periods=results.nobs, freq="15min")
+    exog = pd.DataFrame(results.model.exog, columns=["const", "Temperature"], index=index)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = SARIMAX(pd.Series(results.model.endog[:, 0], index=index), exog=exog, order=(1, 1, 1),
+                        seasonal_order=(1, 0, 0, 4))
+        dated = model.filter(np.asarray(results.params))
+    restored = restore_results(compact_results(dated))
+
+    assert restored.model._index[-1] == index[-1]
+    future = pd.DataFrame(future, columns=exog.columns)
+    assert_same_forecast(dated, restored, future)
+    assert restored.get_forecast(steps=HORIZON, exog=future).predicted_mean.index[0] == index[-1] + index.freq
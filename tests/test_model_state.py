@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from features import compute_features
+from model_state import ModelStateStore
+
+NAMES = ["const", "Temperature", "Temperature_lag_2", "Temperature_rollmean_4"]
+TRAIN = 300
+
+
+def frame(n=400):
+    rng = np.random.default_rng(4)
+    temperature = 25 + np.cumsum(rng.normal(0, 0.2, n))
+    return pd.DataFrame({
+        "Timestamp": pd.date_range("2024-01-01", periods=n, freq="15min"),
+        "Temperature": temperature.astype(np.float32),
+        "N": (100 + np.cumsum(rng.normal(0, 0.3, n)) + 0.5 * temperature).astype(np.float32),
+    })
+
+
+def fitted(df):
+    """A model on the leading TRAIN rows, filtered with fixed parameters like a loaded artifact"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    train = df.iloc[:TRAIN]
+    exog = pd.DataFrame(compute_features(train, NAMES), columns=NAMES)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = SARIMAX(train["N"].to_numpy(dtype=float), exog=exog, order=(1, 1, 1), seasonal_order=(1, 0, 0, 4))
+        return model.filter(np.array([0.0, 0.5, 0.1, -0.05, 0.5, 0.4, -0.3, 0.09]))
+
+
+def test_extending_in_steps_matches_append():
+    df = frame()
+    model = fitted(df)
+    store = ModelStateStore()
+    # New readings arrive in two batches
+    store.update("coffee", "N", model, df.iloc[:350])
+    extended = store.update("coffee", "N", model, df)
+
+    exog = pd.DataFrame(compute_features(df, NAMES, TRAIN), columns=NAMES, index=pd.RangeIndex(TRAIN, len(df)))
+    endog = pd.Series(df["N"].iloc[TRAIN:].to_numpy(dtype=float), index=exog.index)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        appended = model.append(endog, exog=exog)
+
+    # extend keeps only the new rows, continuing the model's own index
+    assert extended.model._index[-1] == appended.model._index[-1] == len(df) - 1
+    np.testing.assert_allclose(extended.predicted_state[:, -1], appended.predicted_state[:, -1], rtol=1e-8)
+    np.testing.assert_allclose(extended.predicted_state_cov[:, :, -1], appended.predicted_state_cov[:, :, -1],
+                               rtol=1e-8)
+    # Nothing new: the cached state is returned as is
+    assert store.update("coffee", "N", model, df) is extended
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import read_csv_typed
+from partitions import PartitionFeed, PartitionStore
+
+COLUMNS = ["Timestamp", "N", "P", "K"]
+
+
+def write_crop_csv(path, start, rows):
+    times = pd.date_range(start, periods=rows, freq="15min")
+    values = np.round(np.random.default_rng(0).uniform(10, 200, (rows, 3)), 4)
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for ts, row in zip(times, values):
+            stamp = f"{ts.month}/{ts.day}/{ts.year} {ts.hour}:{ts.minute:02d}"
+            f.write(stamp + "," + ",".join(f"{v:g}" for v in row) + "\n")
+
+
+def readings(start, rows, plot_offset=0.0):
+    times = pd.date_range(start, periods=rows, freq="15min")
+    return pd.DataFrame({
+        "Timestamp": times,
+        "N": np.arange(rows) + 50.0 + plot_offset,
+        "P": np.full(rows, 60.0),
+        "K": np.full(rows, 70.0),
+    })
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Column bundles are cached under ./data/.cache, so keep them inside the test directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    write_crop_csv("data/coffee.csv", "2024-01-30 12:00", 400)
+    return PartitionStore("data/store")
+
+
+def test_migrate_copies_lines_by_month(store):
+    entries = store.migrate("coffee", "data/coffee.csv")
+    assert [e["month"] for e in entries] == ["2024-01", "2024-02"]
+
+    with open("data/coffee.csv", "rb") as f:
+        source = f.read().splitlines(keepends=True)
+    copied = []
+    for entry in entries:
+        with open(store.path(entry), "rb") as f:
+            header, *lines = f.read().splitlines(keepends=True)
+        assert header == source[0]
+        copied += lines
+    assert copied == source[1:]
+
+    expected = read_csv_typed("data/coffee.csv")
+    # Bundles keep nanosecond timestamps whatever the CSV parser's default unit
+    expected["Timestamp"] = expected["Timestamp"].astype("datetime64[ns]")
+    pd.testing.assert_frame_equal(store.read("coffee"), expected)
+    assert sum(e["rows"] for e in entries) == len(expected)
+    assert entries[0]["max_time"] == pd.Timestamp("2024-01-31 23:45")
+
+    with pytest.raises(ValueError):
+        store.migrate("coffee", "data/coffee.csv")
+
+
+def test_append_round_trip_and_catalog(store):
+    store.migrate("coffee", "data/coffee.csv")
+    last = store.read("coffee")["Timestamp"].iloc[-1]
+    # Runs into a month with no partition yet
+    new = readings(last + pd.Timedelta(minutes=15), 3000)
+    assert store.append("coffee", new) == len(new)
+
+    df = store.read("coffee")
+    assert len(df) == 400 + len(new)
+    pd.testing.assert_series_equal(df["N"].iloc[-len(new):].reset_index(drop=True), new["N"].astype(np.float32))
+    months = [e["month"] for e in store.partitions("coffee")]
+    assert months == ["2024-01", "2024-02", "2024-03"]
+
+    # Another process sees the same catalog, and rebuilding it from the files changes nothing
+    other = PartitionStore("data/store")
+    assert other.partitions("coffee") == store.partitions("coffee")
+    catalog = store.partitions("coffee")
+    assert other.scan() == 3
+    assert [{k: e[k] for k in ("month", "rows", "min_time", "max_time")} for e in other.partitions("coffee")] == \
+        [{k: e[k] for k in ("month", "rows", "min_time", "max_time")} for e in catalog]
+
+
+def test_window_reads_only_overlapping_partitions(store):
+    store.migrate("coffee", "data/coffee.csv")
+    start, end = pd.Timestamp("2024-02-02"), pd.Timestamp("2024-02-03")
+    assert [e["month"] for e in store.partitions("coffee", start=start, end=end)] == ["2024-02"]
+    window = store.read("coffee", start, end)
+    assert window["Timestamp"].iloc[0] == start and window["Timestamp"].iloc[-1] == end
+    assert window["Timestamp"].is_monotonic_increasing
+
+
+def test_plots_are_kept_apart(store):
+    store.migrate("coffee", "data/coffee.csv")
+    store.append("coffee", readings("2024-02-01", 8, plot_offset=1000.0), plot="east")
+    assert store.plots("coffee") == ["east", "main"]
+    assert "Plot" not in store.read("coffee", plots=["main"])
+    east = store.read("coffee", plots=["east"])
+    assert len(east) == 8 and east["N"].min() >= 1000
+    both = store.read("coffee", "2024-02-01", "2024-02-01 01:45", plots=["main", "east"])
+    assert sorted(both["Plot"].unique()) == ["east", "main"]
+    assert both["Timestamp"].is_monotonic_increasing
+
+
+def test_feed_follows_appends(store):
+    store.migrate("coffee", "data/coffee.csv")
+    feed = PartitionFeed(store, "coffee")
+    dataset = feed.dataset
+    assert len(feed.refresh()) == 400
+
+    last = feed.high_water
+    store.append("coffee", readings(last + pd.Timedelta(minutes=15), 4))
+    frame = feed.refresh()
+    assert len(frame) == 404 and feed.dataset is dataset
+
+    # A new month partition is picked up too
+    store.append("coffee", readings("2024-03-01", 2))
+    assert feed.refresh()["Timestamp"].iloc[-1] == pd.Timestamp("2024-03-01 00:15")
+    assert feed.dataset is dataset
+
+
+def test_stores_outside_data_keep_separate_bundles(store, tmp_path):
+    first, second = PartitionStore(str(tmp_path / "a")), PartitionStore(str(tmp_path / "b"))
+    first.append("coffee", readings("2024-01-01", 4))
+    second.append("coffee", readings("2024-01-01", 4, plot_offset=10.0))
+    # Same file name, size and mtime: only the directory tells the partitions apart
+    paths = [s.path(s.partitions("coffee")[0]) for s in (first, second)]
+    assert os.path.getsize(paths[0]) == os.path.getsize(paths[1])
+    for path in paths:
+        os.utime(path, ns=(1_700_000_000_000_000_000,) * 2)
+    assert list(first.read("coffee")["N"]) == [50, 51, 52, 53]
+    assert list(second.read("coffee")["N"]) == [60, 61, 62, 63]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import AGGREGATES, RESOLUTIONS, RollupStore, rollup
+
+FREQ = {"hourly": "1h", "daily": "1D"}
+
+
+def frame(n=3000, seed=9):
+    rng = np.random.default_rng(seed)
+    # Irregular gaps, including whole empty hours, and some missing readings
+    steps = rng.choice([5, 15, 15, 15, 95], size=n)
+    df = pd.DataFrame({
+        "Timestamp": pd.Timestamp("2024-01-01 00:07") + pd.to_timedelta(np.cumsum(steps), unit="min"),
+        "N": rng.normal(40, 5, n).astype(np.float32),
+        "Temperature": rng.normal(25, 2, n).astype(np.float32),
+    })
+    df.loc[rng.choice(n, n // 15, replace=False), "N"] = np.nan
+    return df
+
+
+def resampled(df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """The same buckets from pandas, for comparison"""
+    grouped = df.set_index("Timestamp").astype(float).resample(FREQ[resolution])
+    out = grouped.agg(list(AGGREGATES))
+    out.columns = [f"{column}_{aggregate}" for column, aggregate in out.columns]
+    out.insert(0, "count", grouped.size())
+    out = out[out["count"] > 0]
+    return out.rename_axis("bucket").reset_index()
+
+
+@pytest.mark.parametrize("resolution", list(RESOLUTIONS))
+def test_rollup_matches_resample(resolution):
+    df = frame()
+    pd.testing.assert_frame_equal(rollup(df, resolution), resampled(df, resolution), check_dtype=False)
+
+
+@pytest.mark.parametrize("resolution", list(RESOLUTIONS))
+def test_incremental_updates_match_a_full_rollup(resolution, tmp_path):
+    df = frame()
+    current = {"rows": 100}
+    store = RollupStore(lambda crop: df.iloc[:current["rows"]], root=str(tmp_path))
+
+    # Appends that end inside a bucket, on a new one, and one row at a time
+    for rows in (100, 101, 137, 1500, 1501, 2999, len(df)):
+        current["rows"] = rows
+        store.frame("coffee", resolution)
+    assert store.rebuilds == 1 and store.updates == 6
+    pd.testing.assert_frame_equal(store.frame("coffee", resolution), resampled(df, resolution), check_dtype=False)
+
+    # A new store picks the stored rollup up from disk and keeps extending it
+    grown = pd.concat([df, frame(n=50, seed=10).assign(Timestamp=lambda f: f["Timestamp"] + pd.Timedelta(days=400))],
+                      ignore_index=True)
+    restarted = RollupStore(lambda crop: grown, root=str(tmp_path))
+    pd.testing.assert_frame_equal(restarted.frame("coffee", resolution), resampled(grown, resolution),
+                                  check_dtype=False)
+    assert restarted.rebuilds == 0 and restarted.updates == 1
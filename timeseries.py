@@ -0,0 +1,50 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class TimeSeriesStore:
+    """Window queries over crop frames by binary search on their sorted timestamps.
+
+    `loader(crop)` returns the current frame for a crop (sorted by Timestamp).
+    The int64 timestamp index is rebuilt only when the loader hands back a new
+    frame, and query results are positional slices of that frame, not copies.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._indexed = {}
+        self._lock = threading.Lock()
+
+    def _frame_and_index(self, crop: str):
+        frame = self._loader(crop)
+        with self._lock:
+            cached = self._indexed.get(crop)
+            if cached is None or cached[0] is not frame:
+                index = frame['Timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+                cached = (frame, index)
+                self._indexed[crop] = cached
+        return cached
+
+    def frame(self, crop: str) -> pd.DataFrame:
+        return self._frame_and_index(crop)[0]
+
+    def latest(self, crop: str) -> pd.Series:
+        return self.frame(crop).iloc[-1]
+
+    def window(self, crop: str, start=None, end=None) -> pd.DataFrame:
+        """Rows with start <= Timestamp <= end; either bound may be None"""
+        frame, index = self._frame_and_index(crop)
+        lo = 0 if start is None else int(np.searchsorted(index, pd.Timestamp(start).value, side='left'))
+        hi = len(index) if end is None else int(np.searchsorted(index, pd.Timestamp(end).value, side='right'))
+        return frame.iloc[lo:hi]
+
+    def last(self, crop: str, duration: timedelta) -> pd.DataFrame:
+        """Rows within `duration` of the newest reading, inclusive"""
+        frame, index = self._frame_and_index(crop)
+        if not len(index):
+            return frame
+        lo = int(np.searchsorted(index, index[-1] - pd.Timedelta(duration).value, side='left'))
+        return frame.iloc[lo:]
@@ -0,0 +1,185 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# PCS_TRACING=0 turns every span into a no-op
+ENABLED = os.environ.get("PCS_TRACING", "1") != "0"
+MAX_SAMPLES = 2048
+MAX_SESSIONS = 256
+QUANTILES = (0.5, 0.9, 0.99)
+
+_session = contextvars.ContextVar("tracing_session", default=None)
+
+
+class Recorder:
+    """Span durations (a bounded window of samples per name) and cache hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._sessions = OrderedDict()
+        self._counters = defaultdict(int)
+
+    def record(self, name: str, seconds: float, session=None):
+        with self._lock:
+            self._samples[name].append(seconds)
+            total = self._totals[name]
+            total[0] += 1
+            total[1] += seconds
+            if session is not None:
+                spans = self._sessions.get(session)
+                if spans is None:
+                    spans = self._sessions[session] = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+                    while len(self._sessions) > MAX_SESSIONS:
+                        self._sessions.popitem(last=False)
+                self._sessions.move_to_end(session)
+                spans[name].append(seconds)
+
+    def count(self, cache: str, hit: bool):
+        with self._lock:
+            self._counters[(cache, "hit" if hit else "miss")] += 1
+
+    def summary(self, session=None) -> dict:
+        """{span: {'count', 'sum', 'p50', 'p90', 'p99'}} for all sessions or one"""
+        with self._lock:
+            if session is None:
+                source = {name: list(samples) for name, samples in self._samples.items()}
+                totals = {name: tuple(total) for name, total in self._totals.items()}
+            else:
+                source = {name: list(samples) for name, samples in self._sessions.get(session, {}).items()}
+                totals = {name: (len(samples), sum(samples)) for name, samples in source.items()}
+
+        out = {}
+        for name, samples in sorted(source.items()):
+            if not samples:
+                continue
+            quantiles = np.quantile(samples, QUANTILES)
+            out[name] = {"count": totals[name][0], "sum": totals[name][1]}
+            out[name].update({f"p{int(q * 100)}": value for q, value in zip(QUANTILES, quantiles)})
+        return out
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._sessions.clear()
+            self._counters.clear()
+
+
+recorder = Recorder()
+
+
+def set_session(session_id):
+    _session.set(session_id)
+
+
+@contextmanager
+def _span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(name, time.perf_counter() - start, _session.get())
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """Time a block under `name`: `with span("load_crop_data"): ...`"""
+    return _span(name) if ENABLED else _NULL_SPAN
+
+
+def traced(name: str = None):
+    """Decorator form of `span`"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(cache: str, hit: bool):
+    if ENABLED:
+        recorder.count(cache, hit)
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    lines = [
+        "# HELP pcs_span_seconds Duration of traced spans.",
+        "# TYPE pcs_span_seconds summary",
+    ]
+    for name, stats in recorder.summary().items():
+        for q in QUANTILES:
+            lines.append(f'pcs_span_seconds{{span="{_label(name)}",quantile="{q}"}} {stats[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'pcs_span_seconds_sum{{span="{_label(name)}"}} {stats["sum"]:.6f}')
+        lines.append(f'pcs_span_seconds_count{{span="{_label(name)}"}} {stats["count"]}')
+
+    lines += [
+        "# HELP pcs_cache_requests_total Cache lookups by result.",
+        "# TYPE pcs_cache_requests_total counter",
+    ]
+    for (cache, result), value in sorted(recorder.counters().items()):
+        lines.append(f'pcs_cache_requests_total{{cache="{_label(cache)}",result="{result}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """Write metrics for a node_exporter-style textfile collector"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
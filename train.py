@@ -0,0 +1,312 @@
+"""SARIMAX order search and retraining for every crop and nutrient.
+
+    python train.py [--crops coffee durian] [--workers 8] [--budget 600] [--seasonal-period 96]
+
+For each series, every (p,d,q)(P,D,Q,s) in the grid is first fitted briefly
+on the most recent PRUNE_ROWS readings. Candidates clearly worse than the
+best of that round are dropped, and the survivors are fitted on the full
+training window, starting from their short-fit parameters. All fits of all
+series share one process pool. Once a series is over its wall-clock budget
+no new fits are started for it, but its best surviving candidate is always
+finished.
+
+Exog columns follow the `<feature>_lag_1` / `<feature>_lag_12` scheme the
+forecasting side expects. Winners are written to model/ as versioned compact
+artifacts and recorded in model/manifest.json, which running dashboards
+pick up on their next lookup.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import crop_name, env_features, nutrients
+from features import compute_features
+from model_registry import (
+    ARTIFACT_VERSION, MODEL_DIR, compact_results, normalize_key, read_manifest, write_artifact, write_manifest,
+)
+from partitions import ensure_crop_bundles, load_crop_frame
+
+EXOG_NAMES = ["const"] + [f"{feat}_lag_{lag}" for feat in env_features for lag in (1, 12)]
+# Readings used for fitting; 30 days of 15-minute data
+DEFAULT_WINDOW = 2880
+DEFAULT_BUDGET = 600.0
+DEFAULT_SEASONAL_PERIOD = 96
+# First round: short fits on recent data to rank candidates
+PRUNE_ROWS = 960
+PRUNE_ITER = 15
+# Candidates whose first-round AIC is this far above the best are dropped
+PRUNE_MARGIN = 10.0
+# At most this many candidates per series reach the full fit
+KEEP = 4
+FULL_ITER = 200
+
+# Per worker process: crop frames, read once so every candidate of a series sees the same data
+_frames = {}
+
+
+def order_grid(max_p: int = 2, max_d: int = 1, max_q: int = 2, max_P: int = 1, max_D: int = 0, max_Q: int = 1,
+               seasonal_period: int = DEFAULT_SEASONAL_PERIOD) -> list:
+    """(order, seasonal_order) candidates, cheapest state spaces first"""
+    seasonal = [(0, 0, 0, 0)]
+    if seasonal_period > 1:
+        seasonal += [
+            (P, D, Q, seasonal_period)
+            for P, D, Q in itertools.product(range(max_P + 1), range(max_D + 1), range(max_Q + 1))
+            if P or D or Q
+        ]
+    grid = [
+        ((p, d, q), s)
+        for s in seasonal
+        for p, d, q in itertools.product(range(max_p + 1), range(max_d + 1), range(max_q + 1))
+    ]
+    return sorted(grid, key=lambda c: (c[1][0] + c[1][1] + c[1][2]) * c[1][3] + sum(c[0]))
+
+
+def _series(crop: str, nutrient: str, rows: int):
+    frame = _frames.get(crop)
+    if frame is None:
+        frame = _frames[crop] = load_crop_frame(crop)
+    start = max(len(frame) - rows, 0)
+    df = frame.iloc[start:]
+    # Lags are taken from the full frame, so the first rows of the window see the readings before it,
+    # as the feature store does when the model is served
+    exog = pd.DataFrame(compute_features(frame, EXOG_NAMES, start), columns=EXOG_NAMES, index=df.index)
+    # The frame's own RangeIndex keeps row positions, which is how model_state locates the training end
+    return df[nutrient].astype(float), exog
+
+
+def fit_candidate(crop: str, nutrient: str, order: tuple, seasonal_order: tuple, rows: int, maxiter: int,
+                  known_params: dict = None, artifact: bool = False) -> dict:
+    """Fit one candidate in a worker process; `known_params` seed the start values by name"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    start = time.perf_counter()
+    endog, exog = _series(crop, nutrient, rows)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order)
+        start_params = None
+        if known_params:
+            start_params = np.array([known_params.get(name, value)
+                                     for name, value in zip(model.param_names, model.start_params)])
+        # cov_type="none" skips the Hessian, which the search never uses
+        results = model.fit(start_params=start_params, method="lbfgs", maxiter=maxiter, disp=False, cov_type="none")
+
+    out = {
+        "order": order,
+        "seasonal_order": seasonal_order,
+        "aic": float(results.aic) if np.isfinite(results.aic) else float("inf"),
+        "params": dict(zip(model.param_names, np.asarray(results.params, dtype=float).tolist())),
+        "nobs": int(results.nobs),
+        "seconds": time.perf_counter() - start,
+    }
+    if artifact:
+        out["artifact"] = compact_results(results)
+    return out
+
+
+def previous_params(model_dir: str, crop: str, nutrient: str) -> dict:
+    """Parameters of the model currently in the manifest, to warm-start the search"""
+    manifest = read_manifest(model_dir) or {"models": {}}
+    entry = manifest["models"].get(crop, {}).get(nutrient)
+    if entry is None or not entry["file"].endswith(".npz"):
+        return {}
+    try:
+        with np.load(os.path.join(model_dir, entry["file"]), allow_pickle=False) as data:
+            names = json.loads(str(data["spec"]))["param_names"]
+            return dict(zip(names, data["params"].tolist()))
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+class SeriesSearch:
+    """Search state of one (crop, nutrient): first-round scores, survivors and the winner"""
+
+    def __init__(self, crop: str, nutrient: str, grid: list, budget: float, known_params: dict):
+        self.crop = crop
+        self.nutrient = nutrient
+        self.grid = grid
+        self.deadline = time.monotonic() + budget
+        self.started = time.perf_counter()
+        self.known_params = known_params
+        self.first_round = {}
+        self.full = {}
+        self.skipped = 0
+        self.errors = []
+        self.running = 0
+        self.finalists = None
+
+    def over_budget(self) -> bool:
+        return time.monotonic() > self.deadline
+
+    def warm_start(self, candidate) -> dict:
+        # The candidate's own short fit first, then any shared names from the best short fit and the old model
+        best = min(self.first_round.values(), key=lambda r: r["aic"], default=None)
+        params = dict(self.known_params)
+        if best is not None:
+            params.update(best["params"])
+        params.update(self.first_round[candidate]["params"])
+        return params
+
+    def select_finalists(self) -> list:
+        ranked = sorted(self.first_round.items(), key=lambda item: item[1]["aic"])
+        if not ranked:
+            return []
+        best = ranked[0][1]["aic"]
+        return [candidate for candidate, r in ranked[:KEEP] if r["aic"] <= best + PRUNE_MARGIN]
+
+    def winner(self):
+        if not self.full:
+            return None
+        return min(self.full.values(), key=lambda r: r["aic"])
+
+
+def search(crops: list, grid: list, model_dir: str = MODEL_DIR, workers: int = None, budget: float = DEFAULT_BUDGET,
+           window: int = DEFAULT_WINDOW, nutrient_list: list = None) -> dict:
+    """Run the order search for every crop/nutrient; returns {(crop, nutrient): SeriesSearch}"""
+    searches = {}
+    for crop in crops:
+        try:
+            # Built here once, so workers only ever read the bundles
+            ensure_crop_bundles(crop)
+            data_error = None
+        except (OSError, ValueError) as e:
+            data_error = f"cannot read data: {e}"
+        for nutrient in nutrient_list or nutrients:
+            crop_key, nutrient_key = normalize_key(crop, nutrient)
+            s = searches[(crop, nutrient)] = SeriesSearch(
+                crop, nutrient, grid, budget, previous_params(model_dir, crop_key, nutrient_key),
+            )
+            if data_error:
+                s.errors.append(data_error)
+                s.finalists = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def start(s: SeriesSearch, candidate, stage: str):
+            order, seasonal_order = candidate
+            if stage == "first":
+                future = pool.submit(fit_candidate, s.crop, s.nutrient, order, seasonal_order,
+                                     min(PRUNE_ROWS, window), PRUNE_ITER, s.known_params)
+            else:
+                future = pool.submit(fit_candidate, s.crop, s.nutrient, order, seasonal_order,
+                                     window, FULL_ITER, s.warm_start(candidate), artifact=True)
+            pending[future] = (s, candidate, stage)
+            s.running += 1
+
+        # Interleave series so every one of them gets its cheapest candidates in early
+        for candidate in grid:
+            for s in searches.values():
+                if s.finalists is None:
+                    start(s, candidate, "first")
+
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                s, candidate, stage = pending.pop(future)
+                s.running -= 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    s.errors.append(f"{candidate}: {type(e).__name__}: {e}")
+                    continue
+                (s.first_round if stage == "first" else s.full)[candidate] = result
+
+            for s in searches.values():
+                if s.finalists is None and s.over_budget():
+                    # Drop first-round fits that have not started yet
+                    for future, (owner, _, stage) in list(pending.items()):
+                        if owner is s and stage == "first" and future.cancel():
+                            del pending[future]
+                            s.running -= 1
+                            s.skipped += 1
+                if s.finalists is None and s.running == 0:
+                    s.finalists = s.select_finalists()
+                    if s.over_budget():
+                        # Out of time: only the best candidate is finished
+                        s.skipped += len(s.finalists[1:])
+                        s.finalists = s.finalists[:1]
+                    for candidate in s.finalists:
+                        start(s, candidate, "full")
+    return searches
+
+
+def write_models(searches: dict, model_dir: str = MODEL_DIR) -> dict:
+    """Write each winner as a versioned artifact and point the manifest at it"""
+    os.makedirs(model_dir, exist_ok=True)
+    manifest = read_manifest(model_dir) or {"version": ARTIFACT_VERSION, "models": {}}
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    summary = {}
+    for (crop, nutrient), s in searches.items():
+        crop_key, nutrient_key = normalize_key(crop, nutrient)
+        best = s.winner()
+        info = {
+            "candidates": len(s.grid),
+            "first_round": len(s.first_round),
+            "full_fits": len(s.full),
+            "skipped": s.skipped,
+            "seconds": round(time.perf_counter() - s.started, 1),
+            "errors": s.errors,
+        }
+        if best is None:
+            summary[f"{crop_key}/{nutrient_key}"] = dict(info, written=None)
+            continue
+
+        file_name = f"{crop_key}_{nutrient_key}.v{ARTIFACT_VERSION}.{run_id}.npz"
+        digest = write_artifact(os.path.join(model_dir, file_name), best["artifact"])
+        manifest["models"].setdefault(crop_key, {})[nutrient_key] = {
+            "file": file_name,
+            "sha256": digest,
+            "source": "train.py",
+            "order": list(best["order"]),
+            "seasonal_order": list(best["seasonal_order"]),
+            "aic": best["aic"],
+            "nobs": best["nobs"],
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        summary[f"{crop_key}/{nutrient_key}"] = dict(
+            info, written=file_name, order=best["order"], seasonal_order=best["seasonal_order"], aic=best["aic"],
+        )
+    write_manifest(manifest, model_dir)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search SARIMAX orders and write model artifacts")
+    parser.add_argument("--crops", nargs="*", default=[key for _, key, _ in crop_name])
+    parser.add_argument("--nutrients", nargs="*", default=nutrients)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds per series")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="most recent readings to fit on")
+    parser.add_argument("--seasonal-period", type=int, default=DEFAULT_SEASONAL_PERIOD, help="0 for no seasonal terms")
+    parser.add_argument("--max-p", type=int, default=2)
+    parser.add_argument("--max-d", type=int, default=1)
+    parser.add_argument("--max-q", type=int, default=2)
+    parser.add_argument("--max-P", type=int, default=1)
+    parser.add_argument("--max-D", type=int, default=0)
+    parser.add_argument("--max-Q", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    grid = order_grid(args.max_p, args.max_d, args.max_q, args.max_P, args.max_D, args.max_Q, args.seasonal_period)
+    print(f"Searching {len(grid)} candidates for {len(args.crops) * len(args.nutrients)} series "
+          f"on {args.workers} workers", file=sys.stderr)
+    start = time.perf_counter()
+    searches = search(args.crops, grid, args.model_dir, args.workers, args.budget, args.window, args.nutrients)
+    summary = write_models(searches, args.model_dir)
+    print(json.dumps({"seconds": round(time.perf_counter() - start, 1), "series": summary}, indent=2, default=str))
+    return 1 if any(entry["written"] is None for entry in summary.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import atexit
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+
+# One bounded pool per kind for the whole process, shared by every session
+MAX_WORKERS = int(os.environ.get("PCS_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+DEFAULT_KIND = os.environ.get("PCS_WORKER_POOL", "thread")
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(kind: str = None):
+    """Thread pool (statsmodels' linear algebra releases the GIL) or process pool"""
+    kind = kind or DEFAULT_KIND
+    with _lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            if kind == "thread":
+                executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="forecast")
+            elif kind == "process":
+                executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+            else:
+                raise ValueError(f"Unknown worker pool kind: {kind}")
+            _executors[kind] = executor
+        return executor
+
+
+def submit(fn, *args, kind: str = None, **kwargs):
+    executor = get_executor(kind)
+    if isinstance(executor, ThreadPoolExecutor):
+        # Carry context variables (e.g. the tracing session) into the worker thread
+        return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    return executor.submit(fn, *args, **kwargs)
+
+
+def completed(value) -> Future:
+    """An already-resolved future, for results that did not need the pool"""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _resolve(out: Future, result=None, exception: BaseException = None):
+    # `out` may already be cancelled by a caller that gave up on it
+    try:
+        if exception is not None:
+            out.set_exception(exception)
+        else:
+            out.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _failed(done: Future, out: Future) -> bool:
+    """Pass a cancelled or failed `done` on to `out`; False when it has a result"""
+    if done.cancelled():
+        out.cancel()
+        return True
+    if done.exception() is not None:
+        _resolve(out, exception=done.exception())
+        return True
+    return False
+
+
+def then(future: Future, fn, *args, **kwargs) -> Future:
+    """A future for `fn(future.result(), *args)`, where `fn` itself returns a future.
+
+    `fn` runs in whichever thread completes `future`, under the caller's
+    context variables, so it should only do light work and submit the rest.
+    """
+    out = Future()
+    context = contextvars.copy_context()
+
+    def start(done: Future):
+        if out.done() or _failed(done, out):
+            return
+        try:
+            context.run(fn, done.result(), *args, **kwargs).add_done_callback(relay)
+        except Exception as e:
+            _resolve(out, exception=e)
+
+    def relay(inner: Future):
+        if not _failed(inner, out):
+            _resolve(out, result=inner.result())
+
+    future.add_done_callback(start)
+    return out
+
+
+@atexit.register
+def shutdown():
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()